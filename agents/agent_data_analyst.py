@@ -8,12 +8,13 @@ from llama_index.core.llms import ChatMessage
 from llama_index.core.tools import ToolSelection, FunctionTool
 from llama_index.core.workflow import Event
 from llama_index.llms.anthropic import Anthropic
-from llama_index.core.memory import ChatMemoryBuffer
 from llama_index.core.workflow import Workflow, StartEvent, StopEvent, step, Context
 
 from agents.prompts.prompts import SYSTEM_PROMPT_CODE_GENERATION_DATA_ANALYST, SYSTEM_PROMPT_CODE_REVIEW_DATA_ANALYST
 
 from agents.tools.tool_code_runner import run_python_code, CodeGen
+from agents.conversation_memory import ConversationMemory
+from agents.prompt_cache import enable_prompt_caching, track_prompt_cache
 
 nest_asyncio.apply()  # Allows nested event loops
 
@@ -72,15 +73,15 @@ class DataAnalystAgent(Workflow):
             api_key=os.getenv("ANTHROPIC_API_KEY"),
             system_prompt=SYSTEM_PROMPT_CODE_GENERATION_DATA_ANALYST
         )
+        # the schema-heavy system prompt and the growing tool-call history are re-read from the cache
+        enable_prompt_caching(self.llm, cache_messages=True, name='data_analyst')
 
-        self.memory = ChatMemoryBuffer.from_defaults(llm=self.llm)
+        # bounded: older turns are summarized and long tool outputs clipped
+        self.memory = ConversationMemory(system_prompt=SYSTEM_PROMPT_CODE_GENERATION_DATA_ANALYST)
         self.sources = []
 
-        sys_msg = ChatMessage(role='system', content=SYSTEM_PROMPT_CODE_GENERATION_DATA_ANALYST)
-        self.memory.put(sys_msg)
-
     @step()
-    async def initial_code_generation(self, ev: StartEvent) -> ToolCallEvent | StopEvent:
+    async def initial_code_generation(self, ev: StartEvent, ctx: Context) -> ToolCallEvent | StopEvent:
         # clear sources - seems like may be redundant
         self.sources = []
 
@@ -94,7 +95,10 @@ class DataAnalystAgent(Workflow):
         chat_history = self.memory.get()
 
         # call llm with chat history and tools
-        response = await self.llm.achat_with_tools(self.tools, chat_history=chat_history)
+        # cache usage of this run is kept in the workflow context (the LLM's own stats are shared by all runs)
+        with track_prompt_cache() as prompt_cache:
+            response = await self.llm.achat_with_tools(self.tools, chat_history=chat_history)
+        await ctx.set("prompt_cache", prompt_cache)
 
         # put that new response into memory
         self.memory.put(response.message)
@@ -103,7 +107,8 @@ class DataAnalystAgent(Workflow):
 
         if not tool_calls:
             return StopEvent(
-                result={"response": response} # can access this dict from final output
+                result={"response": response,
+                        "prompt_cache": prompt_cache.snapshot()} # can access this dict from final output
             )
         else:
             return ToolCallEvent(tool_calls=tool_calls)
@@ -138,7 +143,7 @@ class DataAnalystAgent(Workflow):
 
             try:
                 logging.info(f"Executing tool: {tool.metadata.get_name()}")
-                tool_output = tool(**tool_call.tool_kwargs)
+                tool_output = await tool.acall(**tool_call.tool_kwargs)
                 logger.info(f"Tool output: {tool_output}")
                 tool_msgs.append(ChatMessage(
                         role="tool",
@@ -183,8 +188,10 @@ class DataAnalystAgent(Workflow):
         code_review_messages.extend(ev.validation_input)
 
         # this step is where the code review happens
+        prompt_cache = await ctx.get("prompt_cache")
         try:
-            response = await self.llm.achat_with_tools(self.tools, chat_history=code_review_messages)
+            with track_prompt_cache(prompt_cache):
+                response = await self.llm.achat_with_tools(self.tools, chat_history=code_review_messages)
         except Exception as e:
             logging.error(f"Code review failed: {str(e)}", exc_info=True)
             # Handle the error appropriately, e.g., return a StopEvent or raise an error
@@ -197,7 +204,8 @@ class DataAnalystAgent(Workflow):
 
         if not tool_calls:
             return StopEvent(
-                result={"response": response} # can access this dict from final output
+                result={"response": response,
+                        "prompt_cache": prompt_cache.snapshot()} # can access this dict from final output
             )
         else:
             return ToolCallEvent(tool_calls=tool_calls)
@@ -8,9 +8,11 @@ from llama_index.core.tools import ToolSelection, FunctionTool
 from llama_index.core.workflow import Event
 from llama_index.llms.openai import OpenAI
 from llama_index.llms.anthropic import Anthropic
-from llama_index.core.memory import ChatMemoryBuffer
 from llama_index.core.workflow import Workflow, StartEvent, StopEvent, step, Context
 
+from agents.conversation_memory import ConversationMemory
+from agents.prompt_cache import enable_prompt_caching
+from agents.tag_stream import StreamingTagParser, TagEvent, PARTIAL, CLOSE
 from agents.prompts.prompts import SYSTEM_PROMPT_INSULATION_AGENT, USER_PROMPT_INSULATION_AGENT, SYSTEM_PROMPT_CODE_GENERATION_CALCULATION_PLAN, SYSTEM_PROMPT_CODE_GENERATION_REVIEW_CALCULATION_PLAN
 
 from agents.tools.tools_agent_insulation import generate_code, CodeGen
@@ -59,12 +61,24 @@ class AssumptionsEvent(Event):
 class CalculationPlanStreamlitEvent(Event):
     content: str
 
+class SectionDeltaEvent(Event):
+    section: str
+    content: str
+
 class ProgressEvent(Event):
     content: str
 
 class CalculationPlanEvent(Event):
     calculation_plan: str
 
+# response sections streamed to the UI, by tag name
+SECTION_EVENTS = {
+    "calculation_plan": CalculationPlanStreamlitEvent,
+    "parameters_provided": ProvidedParametersEvent,
+    "parameters_required": RequiredParametersEvent,
+    "assumptions": AssumptionsEvent,
+}
+
 class ValidationEvent(Event):
     validation_input: list[ChatMessage]
 
@@ -120,6 +134,8 @@ class InsulationAgent(Workflow):
             api_key=os.getenv("ANTHROPIC_API_KEY"),
             system_prompt=SYSTEM_PROMPT_CODE_GENERATION_CALCULATION_PLAN
         )
+        # the calculation plan prompt (with the datasheet) is resent on every generate/review iteration
+        enable_prompt_caching(self.llm_code_generation, cache_messages=True, name='insulation_code_generation')
 
         model = 'claude-3-5-sonnet-latest'
         self.llm_code_generation_review = Anthropic(
@@ -128,6 +144,7 @@ class InsulationAgent(Workflow):
             api_key=os.getenv("ANTHROPIC_API_KEY"),
             system_prompt=SYSTEM_PROMPT_CODE_GENERATION_REVIEW_CALCULATION_PLAN
         )
+        enable_prompt_caching(self.llm_code_generation_review, cache_messages=True, name='insulation_code_review')
 
         # initialize the tools
         self.tools = [
@@ -135,7 +152,7 @@ class InsulationAgent(Workflow):
         ]
 
         # initialize the memory
-        self.memory = ChatMemoryBuffer.from_defaults(llm=self.llm)
+        self.memory = ConversationMemory()
 
         # # initialize the system message
         # message_system_prompt = ChatMessage(role='system', content=SYSTEM_PROMPT_INSULATION_AGENT)
@@ -145,6 +162,14 @@ class InsulationAgent(Workflow):
         # self.system_prompt_code_generation = SYSTEM_PROMPT_CODE_GENERATION
         
 
+    @staticmethod
+    def _write_section_event(ctx: Context, event: TagEvent) -> None:
+        if event.kind == PARTIAL:
+            ctx.write_event_to_stream(SectionDeltaEvent(section=event.section, content=event.content))
+        elif event.kind == CLOSE:
+            logger.debug(f"Completed section: {event.section}")
+            ctx.write_event_to_stream(SECTION_EVENTS[event.section](content=event.content.strip()))
+
     @step()
     async def agent_director(self, ev: StartEvent, ctx: Context) -> CalculationPlanEvent:
         logger.info("Starting agent director workflow")
@@ -165,58 +190,24 @@ class InsulationAgent(Workflow):
 
         logger.debug(f"Processing user input: {design_parameters}")
 
-        # Stream LLM response
-        full_response = ""  # Keep track of complete response
-        section_response = ""  # For section processing
-        current_section = None
-        
+        # Stream LLM response; sections are parsed incrementally as the deltas arrive
+        response_parts = []
+        parser = StreamingTagParser(SECTION_EVENTS)
+
         logger.info("Starting Calculation Plan generation")
         try:
             async for response_chunk in await self.llm.astream_complete(prompt=user_prompt):
                 delta = response_chunk.delta
-                full_response += delta  # Add to complete response
-                # section_response += delta  # Add to section processing
-
-                # Check for section starts
-                if current_section is None:
-                    for section in ["calculation_plan", "parameters_provided", "parameters_required", "assumptions"]:
-                        start_tag = f"<{section}>"
-                        if start_tag in section_response and section_response.find(start_tag) == section_response.rfind(start_tag):
-                            current_section = section
-                            # Find the start position after the tag
-                            start_pos = section_response.find(start_tag) + len(start_tag)
-                            # Reset the section content to what we have after the tag
-                            section_content = section_response[start_pos:]
-                            break
-                
-                # If we're in a section, check for end tag
-                if current_section:
-                    end_tag = f"</{current_section}>"
-                    if end_tag in section_response:
-                        # Find where the end tag starts
-                        end_pos = section_response.find(end_tag)
-                        # Get the content up to the end tag
-                        section_content = section_response[section_response.find(f"<{current_section}>") + len(f"<{current_section}>"):end_pos]
-                        
-                        # Emit the appropriate event
-                        event_map = {
-                            "calculation_plan": CalculationPlanStreamlitEvent,
-                            "parameters_provided": ProvidedParametersEvent,
-                            "parameters_required": RequiredParametersEvent,
-                            "assumptions": AssumptionsEvent
-                        }
-                        
-                        if current_section in event_map:
-                            ctx.write_event_to_stream(event_map[current_section](content=section_content.strip()))
-                        
-                        # Remove the processed section from section_response to avoid duplicate processing
-                        section_with_tags = section_response[section_response.find(f"<{current_section}>"):end_pos + len(end_tag)]
-                        section_response = section_response.replace(section_with_tags, "")
-                        current_section = None
-                
+                response_parts.append(delta)
+                for event in parser.feed(delta):
+                    self._write_section_event(ctx, event)
+
                 # Always stream progress
                 ctx.write_event_to_stream(ProgressEvent(content=delta))
-                logger.debug(f"Processing section: {current_section}" if current_section else "Processing response chunk")
+
+            for event in parser.close():
+                self._write_section_event(ctx, event)
+            full_response = "".join(response_parts)
 
             # Store final response in memory
             assistant_msg = ChatMessage(role='assistant', content=full_response)
@@ -296,7 +287,7 @@ class InsulationAgent(Workflow):
 
             try:
                 logging.info(f"Executing tool: {tool.metadata.get_name()}")
-                tool_output = tool(**tool_call.tool_kwargs)
+                tool_output = await tool.acall(**tool_call.tool_kwargs)
                 logger.info(f"Tool output: {tool_output}")
                 tool_msgs.append(ChatMessage(
                         role="tool",
@@ -1,23 +1,26 @@
 import nest_asyncio
 from typing import Any
 import boto3
-import json
 import asyncio
 import os
 
 from llama_index.core.llms import ChatMessage
-from llama_index.core import SimpleDirectoryReader
 from llama_index.core.tools import ToolSelection, ToolOutput
 from llama_index.core.workflow import Event
 from llama_index.core.tools import FunctionTool
 from llama_index.multi_modal_llms.anthropic import AnthropicMultiModal
-from llama_index.core.memory import ChatMemoryBuffer
 from llama_index.core.tools.types import BaseTool
 from llama_index.core.workflow import Workflow, StartEvent, StopEvent, step, Context
 
-from retrievers.retriever_baseline import retrieve_pages
+from retrievers.retriever_baseline import get_retrieval_engine
 
 from agents.prompts.prompts import SYSTEM_PROMPT_MANUAL_QA_AGENT, USER_PROMPT_MANUAL_MULTIMODAL_QA_AGENT
+from agents.answer_cache import answer_cache
+from agents.image_store import image_store
+from agents.image_selection import image_candidates, select_images
+from agents.context_builder import context_builder
+from agents.conversation_memory import ConversationMemory
+from agents.prompt_cache import enable_prompt_caching, track_prompt_cache
 
 # from prompts.prompts import SYSTEM_PROMPT_SUBSIDY_REPORT_AGENT
 
@@ -42,16 +45,17 @@ class ManualQueryAgent(Workflow):
                                           max_tokens=4096,
                                           api_key=os.getenv("ANTHROPIC_API_KEY"),
                                           system_prompt=SYSTEM_PROMPT_MANUAL_QA_AGENT)
+        # the system prompt is cached; the retrieved extract changes with every question
+        enable_prompt_caching(self.llm_mm, name='manual_qa')
 
 
+        # shared retrieval engine (clients and connection pools are process-wide)
+        self.retrieval_engine = get_retrieval_engine()
+
         # initialize the memory
-        self.memory = ChatMemoryBuffer.from_defaults(llm=self.llm_mm)
+        self.memory = ConversationMemory(system_prompt=SYSTEM_PROMPT_MANUAL_QA_AGENT)
         self.sources = []
 
-        # initialize the system message
-        sys_msg = ChatMessage(role='system', content=SYSTEM_PROMPT_MANUAL_QA_AGENT)
-        self.memory.put(sys_msg)
-
 
     @step()
     async def agent_director(self, ev: StartEvent) ->  StopEvent:
@@ -62,42 +66,59 @@ class ManualQueryAgent(Workflow):
         if isinstance(ev, StartEvent):
             user_input = ev.input
 
-
-        nodes_reranked, nodes_embed = retrieve_pages(user_input)
-
-        industrial_technical_documentation_extract = "<technical_documentation_extract> \n\n"
-        image_paths = []
-        for node in nodes_reranked:
-            industrial_technical_documentation_extract += f"Page_{node.node.metadata['page_number']}: \n {node.node.text}\n\n"
-            image_paths.extend(node.node.metadata['image_paths'])
-        industrial_technical_documentation_extract += "</technical_documentation_extract>"
+        # serve near-duplicate questions from the semantic answer cache
+        collection_name = self.retrieval_engine.collection_name
+        collection_version = await self.retrieval_engine.acollection_version()
+        query_embedding = await self.retrieval_engine.aembed_query(user_input)
+        cached = answer_cache.lookup(collection_name, query_embedding, version=collection_version)
+        if cached is not None:
+            self.memory.put(ChatMessage(role='user', content=user_input))
+            self.memory.put(ChatMessage(role='assistant', content=cached['answer']))
+            return StopEvent(
+                result={"response": cached['answer'], "cached": True}
+            )
+
+        # page images of the best search hits start loading while the reranker runs
+        nodes_reranked, nodes_embed = await self.retrieval_engine.aretrieve(
+            user_input, on_candidates=image_store.prefetch_candidates)
+
+        # reranked chunks within the token budget, overlaps removed and same-page chunks merged
+        industrial_technical_documentation_extract, context_report = context_builder.build(nodes_reranked)
 
         user_prompt = USER_PROMPT_MANUAL_MULTIMODAL_QA_AGENT.format(
             user_question=user_input,
             industrial_technical_documentation_extract=industrial_technical_documentation_extract
         )
 
-        with open('/Users/delonsaks/Documents/virfold/data/manuals/images_resized/filename_mapping.json', 'r') as f:
-            filename_mapping = json.load(f)
-
-        image_paths = [f'/Users/delonsaks/Documents/virfold/data/manuals/images_resized/{filename_mapping[os.path.basename(path)]}' for path in image_paths]
-
-        image_documents = SimpleDirectoryReader(input_files=image_paths).load_data()
+        # cached, decoded off the event loop; only the most relevant images within the count/size budget
+        candidates = image_candidates(nodes_reranked)
+        payloads = await image_store.aload([candidate.image_path for candidate in candidates])
+        payloads, image_report = select_images(user_input, candidates, payloads)
+        image_documents = image_store.to_image_documents(payloads)
 
         # get chat history
-        user_msg = ChatMessage(role='user', content=user_prompt)
+        # only the question goes into the history, the retrieved extract is rebuilt every turn
+        user_msg = ChatMessage(role='user', content=user_input)
         self.memory.put(user_msg)
         chat_history = self.memory.get()
 
         # call llm with chat history and tools
-        response = await self.llm_mm.acomplete(prompt=user_prompt, 
-                                              image_documents=image_documents)
+        # (cache usage of this call only; the LLM's own stats are shared by concurrent runs)
+        with track_prompt_cache() as prompt_cache:
+            response = await self.llm_mm.acomplete(prompt=user_prompt,
+                                                  image_documents=image_documents)
 
         # put that new response into memory
-        self.memory.put(response.text)
+        self.memory.put(ChatMessage(role='assistant', content=response.text))
+
+        answer_cache.store(collection_name, user_input, query_embedding, response.text, version=collection_version)
 
         return StopEvent(
             result={"response": response.text, 
+                    "cached": False,
+                    "images": image_report,
+                    "context": context_report,
+                    "prompt_cache": prompt_cache.last,
                     # "sources": [*self.sources]
                     } # can access this dict from final output
         )
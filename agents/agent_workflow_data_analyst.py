@@ -18,6 +18,7 @@ from llama_index.core.agent.workflow import (
 from agents.prompts.prompts import SYSTEM_PROMPT_CODE_GENERATION_DATA_ANALYST, SYSTEM_PROMPT_CODE_REVIEW_DATA_ANALYST, SYSTEM_PROMPT_REPORT_WRITER
 
 from agents.tools.tool_code_runner import run_python_code, CodeGen
+from agents.prompt_cache import enable_prompt_caching
 
 # Add Phoenix
 # OpenTelemetry and instrumentation setup
@@ -68,7 +69,7 @@ data_analyst_agent = FunctionAgent(
     tools=[
         FunctionTool.from_defaults(fn=run_python_code, fn_schema=CodeGen),
     ],
-    llm=Anthropic(model="claude-3-5-sonnet-latest"),
+    llm=enable_prompt_caching(Anthropic(model="claude-3-5-sonnet-latest"), cache_messages=True),
     can_handoff_to=['CodeReviewer'],
 )
 
@@ -81,7 +82,7 @@ code_review_agent = FunctionAgent(
     tools=[
         FunctionTool.from_defaults(fn=run_python_code, fn_schema=CodeGen),
     ],
-    llm=Anthropic(model="claude-3-5-sonnet-latest"),
+    llm=enable_prompt_caching(Anthropic(model="claude-3-5-sonnet-latest"), cache_messages=True),
     can_handoff_to=['CodeReviewer', 'ReportWriter'],
 )
 
@@ -90,7 +91,7 @@ report_writer_agent = FunctionAgent(
     description="""This agent is a specialized report writer that writes a report based on the 
     conversation and it's results.""",
     system_prompt=SYSTEM_PROMPT_REPORT_WRITER,
-    llm=Anthropic(model="claude-3-5-sonnet-latest"),
+    llm=enable_prompt_caching(Anthropic(model="claude-3-5-sonnet-latest"), cache_messages=True),
 )
 
 workflow_data_analyst = AgentWorkflow(
@@ -0,0 +1,195 @@
+import re
+import time
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+class _CollectionAnswers:
+    """Answers cached for one collection, with a lazily rebuilt embedding matrix."""
+
+    def __init__(self) -> None:
+        self.entries = OrderedDict()  # question -> {'embedding', 'answer', 'version', 'created_at'}
+        self._matrix = None
+        self._keys = []
+
+    def invalidate_matrix(self) -> None:
+        self._matrix = None
+
+    def matrix(self):
+        if self._matrix is None and self.entries:
+            self._keys = list(self.entries.keys())
+            self._matrix = np.stack([self.entries[key]['embedding'] for key in self._keys])
+        return self._keys, self._matrix
+
+
+class SemanticAnswerCache:
+    """
+    Cache of final answers looked up by embedding similarity of the question.
+
+    Answers are partitioned by collection name (e.g. `danfos_service_manual_2024_v1`)
+    and stamped with the collection's version (the ingestion marker of
+    embed.collection_version, see `RetrievalEngine.collection_version`). A lookup
+    with a newer version drops the answers grounded in the old content, so a
+    collection re-ingested in place, even by another process, never serves stale
+    answers. The cache is bounded by an LRU on the total number of answers, and
+    expired answers are purged when their collection is looked up.
+    """
+
+    def __init__(self,
+                 similarity_threshold: float = 0.95,
+                 max_entries: int = 1024,
+                 ttl_seconds: float = 24 * 3600) -> None:
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+        self._collections = {}
+        self._lru = OrderedDict()  # (collection_name, question) -> None
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'outdated': 0,
+                          'invalidations': 0}
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _purge(self, collection_name: str, answers: _CollectionAnswers, now: float, version: str | None) -> None:
+        """Drop the answers that expired or were grounded in another version of the collection."""
+        expired, outdated = [], []
+        for question, entry in answers.entries.items():
+            if entry['version'] != version:
+                outdated.append(question)
+            elif now - entry['created_at'] > self.ttl_seconds:
+                expired.append(question)
+        if not expired and not outdated:
+            return
+        for question in expired + outdated:
+            del answers.entries[question]
+            self._lru.pop((collection_name, question), None)
+        answers.invalidate_matrix()
+        if not answers.entries:
+            del self._collections[collection_name]
+        self._counters['expirations'] += len(expired)
+        self._counters['outdated'] += len(outdated)
+
+    def lookup(self, collection_name: str, query_embedding, version: str | None = None) -> dict | None:
+        """
+        Find the cached answer closest to the query, if it clears the threshold.
+
+        Args:
+            collection_name (str): Collection the answer must have been produced from
+            query_embedding (list[float]): Embedding of the new question
+            version (str | None): Current version of the collection; answers stored
+                with another version are dropped
+
+        Returns:
+            dict | None: {'question', 'answer', 'similarity'} or None on a miss
+        """
+        query = self._normalize(query_embedding)
+        now = time.time()
+
+        with self._lock:
+            answers = self._collections.get(collection_name)
+            if answers:
+                # an expired or outdated answer must not shadow a valid one that is slightly less similar
+                self._purge(collection_name, answers, now, version)
+            keys, matrix = answers.matrix() if answers and answers.entries else ([], None)
+            if matrix is None:
+                self._counters['misses'] += 1
+                return None
+
+            similarities = matrix @ query
+            best = int(np.argmax(similarities))
+            similarity = float(similarities[best])
+            question = keys[best]
+            entry = answers.entries[question]
+
+            if similarity < self.similarity_threshold:
+                self._counters['misses'] += 1
+                return None
+
+            self._lru.move_to_end((collection_name, question))
+            self._counters['hits'] += 1
+            return {'question': question, 'answer': entry['answer'], 'similarity': similarity}
+
+    def store(self, collection_name: str, question: str, query_embedding, answer: str,
+              version: str | None = None) -> None:
+        """
+        Cache an answer for a question asked against a collection.
+
+        Args:
+            collection_name (str): Collection the answer was grounded in
+            question (str): The user's question
+            query_embedding (list[float]): Embedding of the question
+            answer (str): Final answer text
+            version (str | None): Version of the collection the answer was grounded in
+        """
+        with self._lock:
+            answers = self._collections.setdefault(collection_name, _CollectionAnswers())
+            answers.entries[question] = {
+                'embedding': self._normalize(query_embedding),
+                'answer': answer,
+                'version': version,
+                'created_at': time.time(),
+            }
+            answers.invalidate_matrix()
+
+            self._lru[(collection_name, question)] = None
+            self._lru.move_to_end((collection_name, question))
+            while len(self._lru) > self.max_entries:
+                (evicted_collection, evicted_question), _ = self._lru.popitem(last=False)
+                evicted = self._collections[evicted_collection]
+                evicted.entries.pop(evicted_question, None)
+                evicted.invalidate_matrix()
+                if not evicted.entries:
+                    del self._collections[evicted_collection]
+                self._counters['evictions'] += 1
+
+    def invalidate(self, collection_name: str) -> int:
+        """
+        Drop every answer cached for a collection (re-ingestion is caught by the version check).
+
+        Args:
+            collection_name (str): Collection to invalidate
+
+        Returns:
+            int: Number of answers dropped
+        """
+        with self._lock:
+            answers = self._collections.pop(collection_name, None)
+            if answers is None:
+                return 0
+            for question in answers.entries:
+                self._lru.pop((collection_name, question), None)
+            self._counters['invalidations'] += 1
+            return len(answers.entries)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._counters)
+            stats['size'] = len(self._lru)
+        return stats
+
+
+def replay_chunks(text: str, words_per_chunk: int = 4):
+    """
+    Split a cached answer into word-sized chunks so it can be streamed like a live response.
+
+    Args:
+        text (str): The cached answer
+        words_per_chunk (int): Words per emitted chunk
+
+    Returns:
+        generator: Chunks that concatenate back to `text`
+    """
+    tokens = re.findall(r"\s*\S+\s*|\s+", text)
+    for i in range(0, len(tokens), words_per_chunk):
+        yield "".join(tokens[i:i + words_per_chunk])
+
+
+# Shared by every agent instance in the process
+answer_cache = SemanticAnswerCache()
@@ -0,0 +1,218 @@
+import os
+import logging
+from dataclasses import dataclass, field
+
+import tiktoken
+
+from llama_index.core.utils import get_tokenizer
+
+logger = logging.getLogger(__name__)
+
+# token budget for the documentation extract in USER_PROMPT_MANUAL_MULTIMODAL_QA_AGENT
+CONTEXT_TOKEN_BUDGET = int(os.getenv('CONTEXT_TOKEN_BUDGET', 12000))
+
+# a chunk that does not fit is truncated to the remaining budget only if at least this much is left
+MIN_TRUNCATED_TOKENS = 200
+
+# longest prefix/suffix compared when chunks carry no character offsets (~512 overlap tokens)
+MAX_OVERLAP_CHARS = 4096
+
+GAP_MARKER = "\n[...]\n"
+
+
+@dataclass
+class _Piece:
+    start: int | None
+    text: str
+
+
+@dataclass
+class _PageSection:
+    page_number: int | None
+    pieces: list[_Piece] = field(default_factory=list)
+
+    def render(self) -> str:
+        pieces = sorted(self.pieces, key=lambda piece: piece.start if piece.start is not None else float('inf'))
+        parts = []
+        end = None
+        for piece in pieces:
+            if parts:
+                contiguous = end is not None and piece.start is not None and piece.start <= end
+                parts.append("" if contiguous else GAP_MARKER)
+            parts.append(piece.text)
+            end = piece.start + len(piece.text) if piece.start is not None else None
+        return "".join(parts)
+
+
+def _uncovered(start: int, end: int, pieces: list[_Piece]) -> list[tuple[int, int]]:
+    """Parts of [start, end) not covered by pieces that have offsets."""
+    spans = sorted((piece.start, piece.start + len(piece.text)) for piece in pieces if piece.start is not None)
+    gaps, cursor = [], start
+    for span_start, span_end in spans:
+        if span_end <= cursor or span_start >= end:
+            continue
+        if span_start > cursor:
+            gaps.append((cursor, span_start))
+        cursor = max(cursor, span_end)
+    if cursor < end:
+        gaps.append((cursor, end))
+    return gaps
+
+
+def _overlap(head: str, tail: str) -> int:
+    """Length of the longest suffix of `head` that is a prefix of `tail` (at least 32 chars, else 0)."""
+    head = head[-MAX_OVERLAP_CHARS:]
+    probe = tail[:32]
+    if len(probe) < 32:
+        return 0
+    index = head.find(probe)
+    while index != -1:
+        if tail.startswith(head[index:]):
+            return len(head) - index
+        index = head.find(probe, index + 1)
+    return 0
+
+
+def _merge_without_offsets(text: str, pieces: list[_Piece]) -> tuple[_Piece | None, str, bool]:
+    """
+    Place a chunk without character offsets against a page's pieces by text overlap.
+
+    Returns:
+        tuple: (piece it continues or precedes, or None; the text not already included;
+                whether that text goes before the piece)
+    """
+    for piece in pieces:
+        if text in piece.text:
+            return piece, "", False
+        size = _overlap(piece.text, text)
+        if size:
+            return piece, text[size:], False
+        size = _overlap(text, piece.text)
+        if size:
+            return piece, text[:-size], True
+    return None, text, False
+
+
+def _coalesce(target: _Piece, pieces: list[_Piece]) -> None:
+    """Merge pieces that now overlap an extended piece (a chunk bridging two included ones)."""
+    for piece in list(pieces):
+        if piece is target:
+            continue
+        size = _overlap(target.text, piece.text)
+        if size:
+            target.text += piece.text[size:]
+            pieces.remove(piece)
+        elif _overlap(piece.text, target.text):
+            target.text = piece.text[:-_overlap(piece.text, target.text)] + target.text
+            pieces.remove(piece)
+
+
+class ContextBuilder:
+    """
+    Assemble the documentation extract for the multimodal Q&A prompt.
+
+    Reranked chunks are taken in rerank order until the token budget is spent.
+    Chunks of the same page are merged: the chunk overlap (512 tokens) is only
+    included once, using the chunks' character offsets in the page, and adjacent
+    chunks are rendered as one contiguous passage. The last chunk that does not fit
+    is truncated to the remaining budget. Pages are emitted in the order of their
+    best chunk and the string is built with a single join.
+    """
+
+    def __init__(self, max_tokens: int = CONTEXT_TOKEN_BUDGET) -> None:
+        self.max_tokens = max_tokens
+        self._tokenizer = None
+
+    @property
+    def tokenizer(self) -> tiktoken.Encoding:
+        # Claude's tokenizer is not public; cl100k counts are close enough for a budget.
+        # get_tokenizer() loads it from the copy bundled with llama_index, so this works offline.
+        if self._tokenizer is None:
+            get_tokenizer()
+            self._tokenizer = tiktoken.get_encoding("cl100k_base")
+        return self._tokenizer
+
+    def count_tokens(self, text: str) -> int:
+        return len(self.tokenizer.encode(text, disallowed_special=()))
+
+    def _truncate(self, text: str, max_tokens: int, keep_end: bool = False) -> str:
+        tokens = self.tokenizer.encode(text, disallowed_special=())
+        return self.tokenizer.decode(tokens[-max_tokens:] if keep_end else tokens[:max_tokens])
+
+    def build(self, nodes_reranked) -> tuple[str, dict]:
+        """
+        Args:
+            nodes_reranked (list[NodeWithScore]): Reranked chunks, best first
+
+        Returns:
+            tuple: (the <technical_documentation_extract> string, report with token usage and what was dropped)
+        """
+        sections = {}  # page key -> _PageSection, in order of first appearance
+        used_tokens = 0
+        report = {'chunks': len(nodes_reranked), 'included': 0, 'truncated': 0, 'dropped': [],
+                  'deduped_tokens': 0, 'budget': self.max_tokens}
+
+        for node in nodes_reranked:
+            text = node.node.get_content()
+            metadata = node.node.metadata
+            key = node.node.ref_doc_id or (metadata.get('manual_id'), metadata.get('page_number'))
+            section = sections.get(key) or _PageSection(page_number=metadata.get('page_number'))
+
+            start = node.node.start_char_idx
+            target, before = None, False
+            if start is not None and all(piece.start is not None for piece in section.pieces):
+                new_pieces = [_Piece(gap_start, text[gap_start - start:gap_end - start])
+                              for gap_start, gap_end in _uncovered(start, start + len(text), section.pieces)]
+            else:
+                target, remainder, before = _merge_without_offsets(text, section.pieces)
+                new_pieces = [_Piece(None, remainder)]
+            new_pieces = [piece for piece in new_pieces if piece.text.strip()]
+
+            new_tokens = sum(self.count_tokens(piece.text) for piece in new_pieces)
+            report['deduped_tokens'] += max(0, self.count_tokens(text) - new_tokens)
+            if not new_pieces:
+                continue
+
+            remaining = self.max_tokens - used_tokens
+            if new_tokens > remaining:
+                if remaining < MIN_TRUNCATED_TOKENS:
+                    report['dropped'].append({'page_number': metadata.get('page_number'), 'tokens': new_tokens})
+                    continue
+                truncated, budget = [], remaining
+                for piece in new_pieces:
+                    piece_tokens = self.count_tokens(piece.text)
+                    if piece_tokens > budget:
+                        if budget > 0:
+                            # text that goes before an included piece keeps its end, so the two stay adjacent
+                            truncated.append(_Piece(piece.start, self._truncate(piece.text, budget, keep_end=before)))
+                        break
+                    truncated.append(piece)
+                    budget -= piece_tokens
+                new_pieces = truncated
+                new_tokens = sum(self.count_tokens(piece.text) for piece in new_pieces)
+                report['truncated'] += 1
+
+            if target is not None and new_pieces:
+                # continuation of a chunk already included: extend it so the page reads contiguously
+                target.text = new_pieces[0].text + target.text if before else target.text + new_pieces[0].text
+                _coalesce(target, section.pieces)
+            else:
+                section.pieces.extend(new_pieces)
+            sections[key] = section
+            used_tokens += new_tokens
+            report['included'] += 1
+
+        extract = "".join([
+            "<technical_documentation_extract> \n\n",
+            *(f"Page_{section.page_number}: \n {section.render()}\n\n" for section in sections.values()),
+            "</technical_documentation_extract>",
+        ])
+        report['pages'] = len(sections)
+        report['tokens'] = used_tokens
+        if report['dropped']:
+            logger.info(f"Context budget of {self.max_tokens} tokens reached, dropped {len(report['dropped'])} chunk(s)")
+        return extract, report
+
+
+# Shared by the agents (the tokenizer is loaded once, on first use)
+context_builder = ContextBuilder()
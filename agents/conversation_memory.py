@@ -0,0 +1,243 @@
+import os
+import asyncio
+import logging
+
+from llama_index.core.llms import LLM, ChatMessage, MessageRole
+from llama_index.core.utils import get_tokenizer
+
+logger = logging.getLogger(__name__)
+
+# per-session ceiling for everything the memory returns (system prompt + summary + recent turns)
+CONVERSATION_TOKEN_LIMIT = int(os.getenv('CONVERSATION_TOKEN_LIMIT', 8000))
+
+# tool outputs (e.g. dataframes printed by the code runner) are clipped to this many tokens
+MAX_TOOL_OUTPUT_TOKENS = int(os.getenv('MAX_TOOL_OUTPUT_TOKENS', 2000))
+
+SUMMARY_MAX_TOKENS = 600
+
+# cheap model used to summarize evicted turns
+SUMMARY_MODEL = os.getenv('MEMORY_SUMMARY_MODEL', 'claude-3-5-haiku-latest')
+
+SUMMARY_PROMPT = """Update the running summary of a conversation between a user and a technical assistant.
+Keep facts, figures, equipment and file names, decisions and open questions; drop pleasantries and
+raw tool output. Reply with the updated summary only, at most {max_words} words.
+
+<current_summary>
+{summary}
+</current_summary>
+
+<new_messages>
+{messages}
+</new_messages>"""
+
+_summary_llm = None
+
+
+def summary_llm() -> LLM:
+    """Shared LLM for memory summaries (created on first use)."""
+    global _summary_llm
+    if _summary_llm is None:
+        from llama_index.llms.anthropic import Anthropic
+        _summary_llm = Anthropic(model=SUMMARY_MODEL, max_tokens=SUMMARY_MAX_TOKENS,
+                                 api_key=os.getenv("ANTHROPIC_API_KEY"))
+    return _summary_llm
+
+
+class ConversationMemory:
+    """
+    Bounded chat history for one agent session.
+
+    Drop-in for ChatMemoryBuffer's put/get in the agents. Messages are grouped into
+    turns (a user message and everything up to the next one) and, within a turn,
+    into steps (an assistant message and the tool results that answer its calls).
+    When the history exceeds the token ceiling the oldest turns are evicted, then
+    the oldest steps of the current turn, so a long tool loop on one question stays
+    bounded too; tool calls and their results are always evicted together. Evicted
+    messages are folded into a running summary by a background task on the event
+    loop, which `get()` never waits for.
+
+    `get()` returns system messages, the summary as a user/assistant exchange (after
+    the system prompt, so updating it keeps the prompt cache), then the recent
+    messages. That is at most `token_limit` tokens unless the current question and
+    its latest step alone exceed it; those are never evicted.
+
+    Callers should store what the conversation needs later (the user's question,
+    the answer) and keep per-turn retrieved context out of the memory.
+    """
+
+    def __init__(self,
+                 system_prompt: str | None = None,
+                 token_limit: int = CONVERSATION_TOKEN_LIMIT,
+                 max_tool_output_tokens: int = MAX_TOOL_OUTPUT_TOKENS,
+                 llm: LLM | None = None,
+                 summarize: bool = True) -> None:
+        self.token_limit = token_limit
+        self.max_tool_output_tokens = max_tool_output_tokens
+        self.summarize = summarize
+        self._llm = llm
+        self._tokenizer = get_tokenizer()
+
+        self._system = []  # [(message, tokens)]
+        self._turns = []  # [[(message, tokens), ...], ...]
+        self._pending = []  # evicted messages not yet summarized
+        self.summary = ""
+        self._summary_tokens = 0
+        self._summary_task = None
+        self._counters = {'evicted_messages': 0, 'summaries': 0, 'summary_errors': 0, 'clipped_tool_outputs': 0}
+
+        if system_prompt:
+            self.put(ChatMessage(role=MessageRole.SYSTEM, content=system_prompt))
+
+    def _count(self, message: ChatMessage) -> int:
+        return len(self._tokenizer(message.content or "")) + 4  # role/formatting overhead
+
+    def _clip_tool_output(self, message: ChatMessage) -> ChatMessage:
+        tokens = self._tokenizer(message.content or "")
+        if len(tokens) <= self.max_tool_output_tokens:
+            return message
+        # keep the beginning and the end, where errors and results usually are
+        content = message.content
+        keep = len(content) * self.max_tool_output_tokens // (2 * len(tokens))
+        head, tail = content[:keep], content[len(content) - keep:]
+        self._counters['clipped_tool_outputs'] += 1
+        return ChatMessage(role=message.role, content=f"{head}\n[... output clipped ...]\n{tail}",
+                           additional_kwargs=message.additional_kwargs)
+
+    def put(self, message: ChatMessage | str) -> None:
+        """
+        Args:
+            message (ChatMessage | str): A message; a bare string is stored as an assistant message
+        """
+        if isinstance(message, str):
+            message = ChatMessage(role=MessageRole.ASSISTANT, content=message)
+        if message.role == MessageRole.TOOL:
+            message = self._clip_tool_output(message)
+
+        entry = (message, self._count(message))
+        if message.role == MessageRole.SYSTEM and not self._turns:
+            self._system.append(entry)
+        elif message.role == MessageRole.USER or not self._turns:
+            self._turns.append([entry])
+        else:
+            self._turns[-1].append(entry)
+        self._enforce_limit()
+
+    def put_messages(self, messages: list[ChatMessage]) -> None:
+        for message in messages:
+            self.put(message)
+
+    def _budget(self) -> int:
+        """Tokens available for recent turns."""
+        return self.token_limit - sum(tokens for _, tokens in self._system) - self._summary_tokens
+
+    def _turn_tokens(self) -> int:
+        return sum(tokens for turn in self._turns for _, tokens in turn)
+
+    @staticmethod
+    def _step_starts(turn: list, start: int) -> list[int]:
+        """Indices where the steps of a turn begin: each assistant message opens one, its tool results follow."""
+        return [i for i in range(start, len(turn)) if i == start or turn[i][0].role == MessageRole.ASSISTANT]
+
+    def _evict_entries(self, entries: list) -> int:
+        self._pending.extend(message for message, _ in entries)
+        self._counters['evicted_messages'] += len(entries)
+        return sum(tokens for _, tokens in entries)
+
+    def _evict(self) -> None:
+        """
+        Move messages to the summary queue until the rest fits: whole turns first, then the
+        oldest steps of the current turn (its question and latest step are always kept).
+        """
+        total = self._turn_tokens()
+        while len(self._turns) > 1 and total > self._budget():
+            total -= self._evict_entries(self._turns.pop(0))
+        if not self._turns:
+            return
+
+        turn = self._turns[-1]
+        start = 1 if turn[0][0].role == MessageRole.USER else 0
+        while total > self._budget():
+            starts = self._step_starts(turn, start)
+            if len(starts) < 2:
+                break
+            total -= self._evict_entries(turn[start:starts[1]])
+            del turn[start:starts[1]]
+
+    def _enforce_limit(self) -> None:
+        self._evict()
+        if self._pending:
+            self._schedule_summary()
+
+    def _schedule_summary(self) -> None:
+        if not self.summarize:
+            self._pending.clear()
+            return
+        if self._summary_task is not None and not self._summary_task.done():
+            return  # the running task picks up the new messages when it finishes
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # summarized on the next put from async code
+        self._summary_task = loop.create_task(self._summarize())
+
+    async def _summarize(self) -> None:
+        while self._pending:
+            messages, self._pending = self._pending, []
+            transcript = "\n".join(f"{message.role.value}: {message.content}" for message in messages if message.content)
+            prompt = SUMMARY_PROMPT.format(max_words=SUMMARY_MAX_TOKENS * 3 // 4,
+                                           summary=self.summary or "(none)",
+                                           messages=transcript)
+            try:
+                llm = self._llm or summary_llm()
+                response = await llm.achat([ChatMessage(role=MessageRole.USER, content=prompt)])
+            except Exception as e:
+                # the turns stay evicted: the ceiling matters more than the summary
+                self._counters['summary_errors'] += 1
+                logger.warning(f"Conversation summary failed: {e}")
+                continue
+
+            summary = (response.message.content or "").strip()
+            tokens = self._tokenizer(summary)
+            if len(tokens) > SUMMARY_MAX_TOKENS:
+                summary = summary[:len(summary) * SUMMARY_MAX_TOKENS // len(tokens)]
+            self.summary = summary
+            self._summary_tokens = sum(self._count(message) for message in self._summary_messages())
+            self._counters['summaries'] += 1
+            # a longer summary leaves less room for recent turns
+            self._evict()
+
+    def _summary_messages(self) -> list[ChatMessage]:
+        # not a system message: the system prompt is the cached prefix and must not change
+        return [ChatMessage(role=MessageRole.USER, content=f"Summary of the earlier conversation:\n{self.summary}"),
+                ChatMessage(role=MessageRole.ASSISTANT, content="Noted, I will take this into account.")]
+
+    def get(self) -> list[ChatMessage]:
+        """System messages, the summary of evicted messages (if any) and the recent messages, oldest first."""
+        messages = [message for message, _ in self._system]
+        if self.summary:
+            messages.extend(self._summary_messages())
+        messages.extend(message for turn in self._turns for message, _ in turn)
+        return messages
+
+    def get_all(self) -> list[ChatMessage]:
+        return self.get()
+
+    async def aflush(self) -> None:
+        """Wait for pending summarization (e.g. before persisting a session)."""
+        if self._pending and (self._summary_task is None or self._summary_task.done()):
+            self._schedule_summary()
+        if self._summary_task is not None:
+            await self._summary_task
+
+    def reset(self) -> None:
+        if self._summary_task is not None and not self._summary_task.done():
+            self._summary_task.cancel()
+        self._turns, self._pending = [], []
+        self.summary, self._summary_tokens = "", 0
+
+    def stats(self) -> dict:
+        stats = dict(self._counters)
+        stats['turns'] = len(self._turns)
+        stats['tokens'] = sum(tokens for _, tokens in self._system) + self._summary_tokens + self._turn_tokens()
+        stats['pending_messages'] = len(self._pending)
+        return stats
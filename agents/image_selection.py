@@ -0,0 +1,159 @@
+import os
+import re
+import logging
+from dataclasses import dataclass
+
+from agents.image_store import ImagePayload
+
+logger = logging.getLogger(__name__)
+
+# `![alt text](image.jpg)` references LlamaParse leaves in the page markdown
+_IMAGE_REFERENCE = re.compile(r"!\[([^\]]*)\]\(([^)\s]+)[^)]*\)")
+_CAPTION_LINE = re.compile(r"^\s*(fig(ure)?\.?|diagram|table)\s*\d*", re.IGNORECASE)
+_WORD = re.compile(r"[a-z0-9]+")
+
+_STOPWORDS = frozenset("""
+a an and are as at be by can do does for from how i if in is it of on or should the this to what when where
+which why with you your
+""".split())
+
+# Anthropic bills roughly width * height / 750 tokens per image
+PIXELS_PER_IMAGE_TOKEN = 750
+
+
+@dataclass
+class ImageCandidate:
+    image_path: str
+    page_number: int | None
+    page_rank: int
+    page_score: float
+    caption: str = ""
+    caption_similarity: float = 0.0
+    score: float = 0.0
+
+
+def extract_captions(markdown: str) -> dict:
+    """
+    Map image file names to their caption in a page's markdown: the alt text of the
+    image reference plus an adjacent 'Figure ...' line, if any.
+    """
+    lines = markdown.splitlines()
+    captions = {}
+    for i, line in enumerate(lines):
+        for match in _IMAGE_REFERENCE.finditer(line):
+            parts = [match.group(1).strip()]
+            for neighbour in (i - 1, i + 1):
+                if 0 <= neighbour < len(lines) and _CAPTION_LINE.match(lines[neighbour]):
+                    parts.append(lines[neighbour].strip())
+            captions[os.path.basename(match.group(2))] = " ".join(part for part in parts if part)
+    return captions
+
+
+def _terms(text: str) -> set[str]:
+    return {word for word in _WORD.findall(text.lower()) if word not in _STOPWORDS}
+
+
+def caption_similarity(question: str, caption: str) -> float:
+    """Share of the question's content words that appear in the caption (0-1)."""
+    question_terms = _terms(question)
+    if not question_terms or not caption:
+        return 0.0
+    return len(question_terms & _terms(caption)) / len(question_terms)
+
+
+def image_candidates(nodes_reranked) -> list[ImageCandidate]:
+    """
+    One candidate per distinct image of the reranked pages, attributed to the best
+    page it appears on (its caption may come from any of those pages).
+    """
+    candidates = {}
+    for rank, node in enumerate(nodes_reranked):
+        captions = None
+        for image_path in node.node.metadata.get('image_paths', []):
+            candidate = candidates.get(image_path)
+            if candidate is not None and candidate.caption:
+                continue
+            if captions is None:
+                captions = extract_captions(node.node.get_content())
+            if candidate is not None:
+                candidate.caption = captions.get(os.path.basename(image_path), "")
+                continue
+            candidates[image_path] = ImageCandidate(
+                image_path=image_path,
+                page_number=node.node.metadata.get('page_number'),
+                page_rank=rank,
+                # rerank relevance is 0-1; fall back to rank if a page has no score
+                page_score=node.score if node.score is not None else 1.0 / (rank + 1),
+                caption=captions.get(os.path.basename(image_path), ""),
+            )
+    return list(candidates.values())
+
+
+def select_images(question: str,
+                  candidates: list[ImageCandidate],
+                  payloads: list[ImagePayload],
+                  max_images: int = 8,
+                  max_total_bytes: int = 8 * 2**20,
+                  max_total_pixels: int = 6_000_000,
+                  caption_weight: float = 0.3) -> tuple[list[ImagePayload], dict]:
+    """
+    Pick the images worth attaching to the multimodal prompt.
+
+    Candidates are ranked by a blend of their page's rerank score and the lexical
+    similarity of their caption to the question, then accepted greedily while the
+    image count, total encoded bytes and total pixels stay within budget (an image
+    that does not fit is skipped, smaller ones further down may still fit).
+
+    Args:
+        question (str): The user's question
+        candidates (list[ImageCandidate]): From image_candidates
+        payloads (list[ImagePayload]): Loaded images (candidates that failed to load are dropped)
+        max_images (int): Maximum number of images
+        max_total_bytes (int): Budget for the sum of encoded image sizes
+        max_total_pixels (int): Budget for the sum of width * height
+        caption_weight (float): Weight of caption similarity against page score
+
+    Returns:
+        tuple: (selected payloads in rank order, report with what was kept and dropped and why)
+    """
+    payloads_by_path = {payload.source_path: payload for payload in payloads}
+    for candidate in candidates:
+        candidate.caption_similarity = caption_similarity(question, candidate.caption)
+        candidate.score = (1 - caption_weight) * candidate.page_score + caption_weight * candidate.caption_similarity
+    ranked = sorted(candidates, key=lambda candidate: (-candidate.score, candidate.page_rank))
+
+    selected, dropped = [], []
+    total_bytes = total_pixels = 0
+    for candidate in ranked:
+        payload = payloads_by_path.get(candidate.image_path)
+        reason = None
+        if payload is None:
+            reason = "not loaded"
+        elif len(selected) >= max_images:
+            reason = "count"
+        elif total_bytes + payload.nbytes > max_total_bytes:
+            reason = "bytes"
+        elif total_pixels + payload.width * payload.height > max_total_pixels:
+            reason = "pixels"
+
+        if reason is not None:
+            dropped.append({'image_path': candidate.image_path, 'page_number': candidate.page_number,
+                            'score': round(candidate.score, 4), 'reason': reason})
+            continue
+        selected.append((candidate, payload))
+        total_bytes += payload.nbytes
+        total_pixels += payload.width * payload.height
+
+    report = {
+        'candidates': len(candidates),
+        'selected': [{'image_path': candidate.image_path, 'page_number': candidate.page_number,
+                      'score': round(candidate.score, 4)} for candidate, _ in selected],
+        'dropped': dropped,
+        'bytes': total_bytes,
+        'pixels': total_pixels,
+        'estimated_tokens': total_pixels // PIXELS_PER_IMAGE_TOKEN,
+    }
+    if dropped:
+        logger.info(f"Attaching {len(selected)}/{len(candidates)} images ({total_bytes / 2**20:.1f} MiB); dropped "
+                    + ", ".join(f"{item['image_path']} ({item['reason']})" for item in dropped))
+    return [payload for _, payload in selected], report
@@ -0,0 +1,203 @@
+import io
+import os
+import json
+import base64
+import logging
+import asyncio
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+
+from PIL import Image
+
+from llama_index.core.schema import ImageDocument
+
+logger = logging.getLogger(__name__)
+
+MANUAL_IMAGES_DIR = os.getenv('MANUAL_IMAGES_DIR', '/Users/delonsaks/Documents/virfold/data/manuals/images_resized')
+
+# Anthropic downscales anything with a longer edge than this, so larger uploads are wasted
+MAX_IMAGE_EDGE = 1568
+
+# search hits whose images are loaded while the reranker runs (rerank keeps the top 10)
+PREFETCH_PAGES = 10
+
+
+@dataclass(frozen=True)
+class ImagePayload:
+    """A page image ready to attach to a multimodal prompt."""
+    source_path: str
+    data: str  # base64
+    mimetype: str
+    width: int
+    height: int
+    nbytes: int
+
+
+class ImageStore:
+    """
+    Shared cache of base64-encoded, resized manual page images.
+
+    The parsed manual references images by their original file name;
+    `filename_mapping.json` in `images_dir` maps them to the resized copies. The
+    mapping is read once, images are decoded, downscaled and encoded in a thread
+    pool, and the encoded payloads are kept in an LRU keyed by image path.
+    Concurrent requests for the same image share one load, so `prefetch` can be
+    started as soon as retrieval candidates are known (before rerank finishes)
+    and `aload` later just awaits the same work.
+    """
+
+    def __init__(self,
+                 images_dir: str = MANUAL_IMAGES_DIR,
+                 mapping_file: str = 'filename_mapping.json',
+                 max_entries: int = 256,
+                 max_workers: int = 8,
+                 max_edge: int = MAX_IMAGE_EDGE) -> None:
+        self.images_dir = images_dir
+        self.mapping_path = os.path.join(images_dir, mapping_file)
+        self.max_entries = max_entries
+        self.max_edge = max_edge
+
+        self._mapping = None
+        self._entries = OrderedDict()  # image path -> ImagePayload
+        self._inflight = {}  # image path -> Future
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='image-store')
+        self._counters = {'hits': 0, 'misses': 0, 'evictions': 0, 'errors': 0}
+
+    @property
+    def filename_mapping(self) -> dict:
+        if self._mapping is None:
+            with open(self.mapping_path, 'r') as f:
+                mapping = json.load(f)
+            with self._lock:
+                if self._mapping is None:
+                    self._mapping = mapping
+        return self._mapping
+
+    def resolve(self, image_path: str) -> str:
+        """Path of the resized copy of an image referenced in page metadata."""
+        return os.path.join(self.images_dir, self.filename_mapping[os.path.basename(image_path)])
+
+    def _encode(self, image_path: str) -> ImagePayload:
+        resized_path = self.resolve(image_path)
+        with Image.open(resized_path) as image:
+            image_format = image.format or 'PNG'
+            if max(image.size) > self.max_edge:
+                image.thumbnail((self.max_edge, self.max_edge))
+            else:
+                with open(resized_path, 'rb') as f:
+                    raw = f.read()
+                return self._payload(image_path, raw, image_format, image.size)
+
+            if image_format not in ('PNG', 'JPEG', 'GIF', 'WEBP'):
+                image_format = 'PNG'
+            if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+                image = image.convert('RGB')
+            buffer = io.BytesIO()
+            image.save(buffer, format=image_format)
+            return self._payload(image_path, buffer.getvalue(), image_format, image.size)
+
+    @staticmethod
+    def _payload(image_path: str, raw: bytes, image_format: str, size: tuple) -> ImagePayload:
+        return ImagePayload(
+            source_path=image_path,
+            data=base64.b64encode(raw).decode('utf-8'),
+            mimetype=f"image/{image_format.lower()}",
+            width=size[0],
+            height=size[1],
+            nbytes=len(raw),
+        )
+
+    def _load(self, image_path: str) -> ImagePayload:
+        try:
+            payload = self._encode(image_path)
+        except BaseException:
+            with self._lock:
+                self._inflight.pop(image_path, None)
+            raise
+
+        with self._lock:
+            self._inflight.pop(image_path, None)
+            self._entries[image_path] = payload
+            self._entries.move_to_end(image_path)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters['evictions'] += 1
+        return payload
+
+    def submit(self, image_path: str) -> Future:
+        """Future for an image payload: cached, already loading, or newly scheduled."""
+        with self._lock:
+            payload = self._entries.get(image_path)
+            if payload is not None:
+                self._entries.move_to_end(image_path)
+                self._counters['hits'] += 1
+                future = Future()
+                future.set_result(payload)
+                return future
+
+            future = self._inflight.get(image_path)
+            if future is None:
+                self._counters['misses'] += 1
+                future = self._executor.submit(self._load, image_path)
+                self._inflight[image_path] = future
+            return future
+
+    def prefetch(self, image_paths) -> None:
+        """Start loading images in the background without waiting for them."""
+        for image_path in dict.fromkeys(image_paths):
+            self.submit(image_path)
+
+    def prefetch_candidates(self, nodes, pages: int = PREFETCH_PAGES) -> None:
+        """Prefetch the images of the best `pages` retrieval candidates (a RetrievalEngine on_candidates hook)."""
+        self.prefetch(page_image_paths(nodes[:pages]))
+
+    async def aload(self, image_paths) -> list[ImagePayload]:
+        """
+        Load images without blocking the event loop.
+
+        Args:
+            image_paths (list[str]): Image paths from page metadata (duplicates are dropped)
+
+        Returns:
+            list[ImagePayload]: Payloads in input order; images that fail to load are skipped
+        """
+        image_paths = list(dict.fromkeys(image_paths))
+        futures = [asyncio.wrap_future(self.submit(image_path)) for image_path in image_paths]
+        results = await asyncio.gather(*futures, return_exceptions=True)
+
+        payloads = []
+        for image_path, result in zip(image_paths, results):
+            if isinstance(result, BaseException):
+                with self._lock:
+                    self._counters['errors'] += 1
+                logger.warning(f"Could not load image {image_path}: {result}")
+                continue
+            payloads.append(result)
+        return payloads
+
+    @staticmethod
+    def to_image_documents(payloads: list[ImagePayload]) -> list[ImageDocument]:
+        """ImageDocuments carrying the encoded data, so the LLM client does not re-read the files."""
+        return [ImageDocument(image=payload.data, image_mimetype=payload.mimetype) for payload in payloads]
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._counters)
+            stats['size'] = len(self._entries)
+            stats['inflight'] = len(self._inflight)
+        return stats
+
+
+def page_image_paths(nodes) -> list[str]:
+    """Image paths of retrieved pages, in rank order."""
+    image_paths = []
+    for node in nodes:
+        image_paths.extend(node.node.metadata.get('image_paths', []))
+    return image_paths
+
+
+# Shared by every agent instance in the process
+image_store = ImageStore()
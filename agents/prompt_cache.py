@@ -0,0 +1,222 @@
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any
+
+from llama_index.llms.anthropic import Anthropic
+from llama_index.multi_modal_llms.anthropic import AnthropicMultiModal
+
+logger = logging.getLogger(__name__)
+
+EPHEMERAL = {"type": "ephemeral"}
+
+# Anthropic allows at most four cache breakpoints per request
+MAX_CACHE_BREAKPOINTS = 4
+
+
+def _count_breakpoints(blocks) -> int:
+    return sum(1 for block in blocks if isinstance(block, dict) and "cache_control" in block)
+
+
+def apply_cache_control(request: dict, cache_messages: bool = False) -> dict:
+    """
+    Mark the stable prefix of a Messages API request as cacheable.
+
+    The cache prefix is tools -> system -> messages, so one breakpoint at the end of
+    the system prompt covers the tool definitions and the static instructions. With
+    `cache_messages`, the last content block of the conversation is marked too: the
+    next call of a generate/validate loop re-sends the same history plus a few new
+    messages and reads everything up to here from the cache. Prefixes shorter than
+    the model's minimum (1024 tokens for Sonnet) are simply not cached.
+
+    Args:
+        request (dict): Keyword arguments for `client.messages.create`
+        cache_messages (bool): Also cache the conversation so far
+
+    Returns:
+        dict: The request with cache_control markers added
+    """
+    request = dict(request)
+    used = 0
+    for message in request.get("messages") or []:
+        if isinstance(message.get("content"), list):
+            used += _count_breakpoints(message["content"])
+
+    system = request.get("system")
+    if isinstance(system, str) and system.strip():
+        request["system"] = [{"type": "text", "text": system, "cache_control": EPHEMERAL}]
+        used += 1
+    elif request.get("tools") and used < MAX_CACHE_BREAKPOINTS:
+        tools = [dict(tool) for tool in request["tools"]]
+        tools[-1]["cache_control"] = EPHEMERAL
+        request["tools"] = tools
+        used += 1
+
+    messages = request.get("messages")
+    if cache_messages and messages and used < MAX_CACHE_BREAKPOINTS:
+        last = dict(messages[-1])
+        content = last.get("content")
+        if isinstance(content, str):
+            content = [{"type": "text", "text": content}]
+        if content and "cache_control" not in content[-1]:
+            content = [*content[:-1], {**content[-1], "cache_control": EPHEMERAL}]
+            last["content"] = content
+            request["messages"] = [*messages[:-1], last]
+    return request
+
+
+class PromptCacheStats:
+    """
+    Per-call and cumulative prompt cache usage, of one LLM or of the calls made
+    inside `track_prompt_cache` blocks.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.last = None
+        self.totals = {'calls': 0, 'hits': 0, 'input_tokens': 0, 'cache_read_input_tokens': 0,
+                       'cache_creation_input_tokens': 0}
+        self._lock = threading.Lock()
+
+    def record(self, usage) -> dict:
+        """Record the `usage` of one response; returns the per-call report."""
+        report = {
+            'input_tokens': getattr(usage, 'input_tokens', 0) or 0,
+            'cache_read_input_tokens': getattr(usage, 'cache_read_input_tokens', 0) or 0,
+            'cache_creation_input_tokens': getattr(usage, 'cache_creation_input_tokens', 0) or 0,
+        }
+        report['hit'] = report['cache_read_input_tokens'] > 0
+        self.add(report)
+        tracked = _tracked_usage.get()
+        if tracked is not None and tracked is not self:
+            tracked.add(report)
+        logger.info(f"Prompt cache [{self.name}]: {'hit' if report['hit'] else 'miss'}, "
+                    f"{report['cache_read_input_tokens']} read, {report['cache_creation_input_tokens']} written, "
+                    f"{report['input_tokens']} uncached input tokens")
+        return report
+
+    def add(self, report: dict) -> None:
+        with self._lock:
+            self.last = report
+            self.totals['calls'] += 1
+            self.totals['hits'] += int(report['hit'])
+            for key in ('input_tokens', 'cache_read_input_tokens', 'cache_creation_input_tokens'):
+                self.totals[key] += report[key]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            totals = dict(self.totals)
+        prompt_tokens = totals['input_tokens'] + totals['cache_read_input_tokens'] + totals['cache_creation_input_tokens']
+        totals['cached_fraction'] = totals['cache_read_input_tokens'] / prompt_tokens if prompt_tokens else 0.0
+        totals['last'] = self.last
+        return totals
+
+
+# collector of the innermost track_prompt_cache block; context variables are
+# per task, so concurrent workflow runs never see each other's calls
+_tracked_usage: ContextVar[PromptCacheStats | None] = ContextVar('tracked_prompt_cache_usage', default=None)
+
+
+@contextmanager
+def track_prompt_cache(stats: PromptCacheStats | None = None):
+    """
+    Collect the prompt cache usage of the LLM calls made inside the block.
+
+    The LLM's own `prompt_cache_stats` is shared by every run using that LLM; this
+    is the per-run view. Pass the same collector again (e.g. kept in the workflow
+    Context) to accumulate the calls of several steps.
+
+    Args:
+        stats (PromptCacheStats | None): Collector to add to (a new one by default)
+
+    Returns:
+        PromptCacheStats: The collector; `last` is the latest call, `snapshot()` the totals
+    """
+    stats = stats if stats is not None else PromptCacheStats('run')
+    token = _tracked_usage.set(stats)
+    try:
+        yield stats
+    finally:
+        _tracked_usage.reset(token)
+
+
+class _CachingMessages:
+    """Stands in for `client.messages`: adds cache breakpoints and records cache usage."""
+
+    def __init__(self, messages, stats: PromptCacheStats, cache_messages: bool, is_async: bool) -> None:
+        self._messages = messages
+        self._stats = stats
+        self._cache_messages = cache_messages
+        self._is_async = is_async
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._messages, name)
+
+    def _record_event(self, event) -> None:
+        # streaming: prompt usage arrives with the message_start event
+        if getattr(event, 'type', None) == 'message_start':
+            self._stats.record(event.message.usage)
+
+    def create(self, **kwargs: Any) -> Any:
+        kwargs = apply_cache_control(kwargs, cache_messages=self._cache_messages)
+        if self._is_async:
+            return self._acreate(**kwargs)
+
+        response = self._messages.create(**kwargs)
+        if not kwargs.get("stream"):
+            self._stats.record(response.usage)
+            return response
+
+        def events():
+            for event in response:
+                self._record_event(event)
+                yield event
+        return events()
+
+    async def _acreate(self, **kwargs: Any) -> Any:
+        response = await self._messages.create(**kwargs)
+        if not kwargs.get("stream"):
+            self._stats.record(response.usage)
+            return response
+
+        async def events():
+            async for event in response:
+                self._record_event(event)
+                yield event
+        return events()
+
+
+class _CachingClient:
+    """Anthropic SDK client whose `messages` resource applies prompt caching."""
+
+    def __init__(self, client, stats: PromptCacheStats, cache_messages: bool, is_async: bool) -> None:
+        self._client = client
+        self.messages = _CachingMessages(client.messages, stats, cache_messages, is_async)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._client, name)
+
+
+def enable_prompt_caching(llm, cache_messages: bool = False, name: str | None = None):
+    """
+    Make an Anthropic LLM cache its stable prompt prefix.
+
+    Args:
+        llm (Anthropic | AnthropicMultiModal): The LLM, modified in place
+        cache_messages (bool): Also cache the conversation (for tool/review loops that
+            resend a growing history); one-shot prompts should only cache the system prompt
+        name (str | None): Label for the cache log lines (defaults to the model name)
+
+    Returns:
+        The same LLM; its cache usage across all callers is available as
+        `llm.prompt_cache_stats`, a single run's with `track_prompt_cache`
+    """
+    if not isinstance(llm, (Anthropic, AnthropicMultiModal)):
+        raise TypeError(f"Prompt caching is only supported for Anthropic LLMs, got {type(llm).__name__}")
+
+    stats = PromptCacheStats(name or llm.model)
+    llm._client = _CachingClient(llm._client, stats, cache_messages, is_async=False)
+    llm._aclient = _CachingClient(llm._aclient, stats, cache_messages, is_async=True)
+    object.__setattr__(llm, 'prompt_cache_stats', stats)
+    return llm
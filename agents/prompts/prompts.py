@@ -137,11 +137,7 @@ ISO 12241 is the standard to use for the calculation.
 """
 
 USER_PROMPT_INSULATION_AGENT = """
-First, carefully review the provided design parameters and the insulation manufacturer's datasheet:
-
-<design_parameters>
-{design_parameters}
-</design_parameters>
+First, carefully review the insulation manufacturer's datasheet and the provided design parameters:
 
 <insulation_manufacturer_datasheet>
 === Page 1 ===
@@ -452,6 +448,10 @@ Iron, PVC, IPS
 114 4" 4-1/2"  4" 117.0- 122.0 3504- 025114 -041 3504- 030114 -041 
 </insulation_manufacturer_datasheet>
 
+<design_parameters>
+{design_parameters}
+</design_parameters>
+
 Now, provide your detailed plan to calculate the required insulation thickness. In the calculation steps, include the formulas and equations in LaTeX and describe how they will be applied.
 
 Structure your response as follows:
@@ -493,6 +493,7 @@ When you receive user input, follow these steps:
 Remember:
 - You can only use the standard Python libraries, scipy, and pandas. DO NOT USE ANY OTHER LIBRARIES. DO NOT use seaborn, matplotlib, or any other plotting libraries.
 - Do not invent or assume the existence of equations or formulas.
+- Report results with `from agent_results import emit`: `emit("name", value, description="...", unit="...")` for numbers and short values, and `emit("name", dataframe, description="...")` for tables, instead of printing large outputs.
 - Provide a summary of the steps taken to solve the problem, taking into account any assumptions. 
 - Communicate in a professional tone, no need to be overly friendly.
 """
@@ -516,6 +517,7 @@ When you receive user input, follow these steps:
 Remember:
 - You can only use the standard Python libraries, scipy, and pandas. DO NOT USE ANY OTHER LIBRARIES. DO NOT use seaborn, matplotlib, or any other plotting libraries.
 - Do not invent or assume the existence of equations or formulas.
+- Report results with `from agent_results import emit`: `emit("name", value, description="...", unit="...")` for numbers and short values, and `emit("name", dataframe, description="...")` for tables, instead of printing large outputs.
 - Provide a summary of the steps taken to solve the problem, taking into account any assumptions. 
 - Communicate in a professional tone, no need to be overly friendly.
 """
@@ -550,6 +552,7 @@ When you receive user input, follow these steps:
 Remember:
 - You can only use the standard Python libraries, scipy, pandas, and sqlalchemy. DO NOT USE ANY OTHER LIBRARIES. DO NOT use seaborn, matplotlib, or any other plotting libraries.
 - Do not invent or assume the existence of equations or formulas.
+- Report results with `from agent_results import emit`: `emit("name", value, description="...", unit="...")` for numbers and short values, and `emit("name", dataframe, description="...")` for tables. Tables are returned to you as their shape, column types, a few preview rows and column statistics, so DO NOT print whole DataFrames; print only short status messages.
 
 The current database schema is as follows:
 <database_schema>
@@ -614,6 +617,7 @@ When you receive user input, follow these steps:
 Remember:
 - You can only use the standard Python libraries, scipy, pandas, and sqlalchemy. DO NOT USE ANY OTHER LIBRARIES. DO NOT use seaborn, matplotlib, or any other plotting libraries.
 - Do not invent or assume the existence of equations or formulas.
+- Report results with `from agent_results import emit`: `emit("name", value, description="...", unit="...")` for numbers and short values, and `emit("name", dataframe, description="...")` for tables. Tables are returned to you as their shape, column types, a few preview rows and column statistics, so DO NOT print whole DataFrames; print only short status messages.
 
 The current database schema is as follows:
 <database_schema>
@@ -0,0 +1,112 @@
+from dataclasses import dataclass
+from typing import Iterable
+
+OPEN = "open"
+PARTIAL = "partial"
+CLOSE = "close"
+TEXT = "text"
+
+
+@dataclass(frozen=True)
+class TagEvent:
+    """
+    kind: 'open' when a section starts, 'partial' for new text inside a section,
+    'close' when it ends (content is the whole section), 'text' for new text outside
+    any section (section is None).
+    """
+    kind: str
+    section: str | None
+    content: str = ""
+
+
+class StreamingTagParser:
+    """
+    Split a streamed LLM response into named `<section>...</section>` parts.
+
+    Every delta is scanned once: text is emitted as soon as it cannot be part of a
+    tag, and only a possible tag prefix (at most the longest tag) is held back until
+    the next delta, so the cost per delta is proportional to its length however long
+    the response gets. Sections do not nest; other tags are passed through as text.
+
+    Example:
+        parser = StreamingTagParser(["calculation_plan", "assumptions"])
+        for delta in stream:
+            for event in parser.feed(delta):
+                ...
+        for event in parser.close():
+            ...
+    """
+
+    def __init__(self, sections: Iterable[str]) -> None:
+        self.sections = tuple(sections)
+        self._open_tags = {f"<{name}>": name for name in self.sections}
+        self._max_tag = max((len(tag) + 1 for tag in self._open_tags), default=0)
+
+        self.section = None  # section currently open
+        self._close_tag = None
+        self._parts = []  # content of the open section
+        self._pending = ""  # possible start of a tag, waiting for more text
+
+    def _text(self, text: str, events: list) -> None:
+        if not text:
+            return
+        if self.section is None:
+            events.append(TagEvent(TEXT, None, text))
+        else:
+            self._parts.append(text)
+            events.append(TagEvent(PARTIAL, self.section, text))
+
+    def _match(self, buffer: str, start: int) -> tuple[str | None, bool]:
+        """(tag at `start` if complete, whether `buffer[start:]` may still become one)."""
+        candidates = (self._close_tag,) if self.section is not None else self._open_tags
+        rest = buffer[start:start + self._max_tag]
+        for tag in candidates:
+            if rest.startswith(tag):
+                return tag, False
+        return None, any(tag.startswith(rest) for tag in candidates)
+
+    def feed(self, delta: str) -> list[TagEvent]:
+        """
+        Args:
+            delta (str): Next chunk of the response
+
+        Returns:
+            list[TagEvent]: Events for the chunk, in order
+        """
+        events = []
+        buffer = self._pending + delta
+        self._pending = ""
+        position = 0
+        while position < len(buffer):
+            bracket = buffer.find("<", position)
+            if bracket == -1:
+                self._text(buffer[position:], events)
+                break
+            self._text(buffer[position:bracket], events)
+
+            tag, incomplete = self._match(buffer, bracket)
+            if tag is not None:
+                if self.section is None:
+                    self.section, self._close_tag = self._open_tags[tag], f"</{self._open_tags[tag]}>"
+                    events.append(TagEvent(OPEN, self.section))
+                else:
+                    events.append(TagEvent(CLOSE, self.section, "".join(self._parts)))
+                    self.section, self._close_tag, self._parts = None, None, []
+                position = bracket + len(tag)
+            elif incomplete:
+                self._pending = buffer[bracket:]
+                break
+            else:
+                self._text("<", events)
+                position = bracket + 1
+        return events
+
+    def close(self) -> list[TagEvent]:
+        """Flush held-back text at the end of the stream; an unterminated section is closed."""
+        events = []
+        self._text(self._pending, events)
+        self._pending = ""
+        if self.section is not None:
+            events.append(TagEvent(CLOSE, self.section, "".join(self._parts)))
+            self.section, self._close_tag, self._parts = None, None, []
+        return events
@@ -0,0 +1,399 @@
+import io
+import os
+import re
+import json
+import base64
+import time
+import socket
+import struct
+import asyncio
+import tarfile
+import weakref
+import uuid
+
+import docker
+
+# container running docker/base/code_execution/worker_pool.py
+CODE_RUNNER_CONTAINER = os.getenv('CODE_RUNNER_CONTAINER', 'code-runner-dev')
+CODE_RUNNER_PORT = int(os.getenv('CODE_RUNNER_PORT', 8765))
+
+# "host:port" of the worker pool: docker-compose publishes it on the host's loopback; containers
+# on the compose network use the service instead (e.g. code-runner-dev:8765)
+CODE_RUNNER_ADDRESS = os.getenv('CODE_RUNNER_ADDRESS', f'127.0.0.1:{CODE_RUNNER_PORT}')
+
+# per-job limit enforced by the worker pool
+CODE_TIMEOUT = float(os.getenv('CODE_RUNNER_TIMEOUT', 120))
+
+# jobs this process runs at once (match the pool's CODE_RUNNER_WORKERS); more jobs wait in line
+MAX_CONCURRENT_JOBS = int(os.getenv('CODE_RUNNER_MAX_CONCURRENT', 4))
+
+# backpressure: past this many waiting jobs, or after waiting this long, a job is rejected
+MAX_QUEUED_JOBS = int(os.getenv('CODE_RUNNER_MAX_QUEUED', 16))
+QUEUE_TIMEOUT = float(os.getenv('CODE_RUNNER_QUEUE_TIMEOUT', 60))
+
+# jobs run in JOBS_DIR/<job_id> in the container (see CODE_RUNNER_JOBS_DIR in worker_pool.py)
+JOBS_DIR = os.getenv('CODE_RUNNER_JOBS_DIR', '/tmp/jobs')
+SCRIPT_NAME = 'script.py'
+PID_FILE = '.script.pid'  # process group of a `docker exec` job, to kill it on cancellation
+_JOB_ID = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+# results reported by scripts with agent_results.emit (docker/base/code_execution/agent_results.py)
+MANIFEST = 'results/manifest.jsonl'
+
+# stdout/stderr kept in the tool's summary; the full streams stay fetchable from the job
+MAX_OUTPUT_CHARS = int(os.getenv('CODE_RESULT_MAX_OUTPUT_CHARS', 4000))
+MAX_SUMMARY_RESULTS = 20
+
+# after a failed connection, go straight to docker exec for this long
+RETRY_POOL_AFTER = 30.0
+
+
+class CodeRunnerBusy(RuntimeError):
+    """Raised when a job cannot get a slot in the code runner (too many queued jobs, or queue timeout)."""
+
+
+class _JobLimiter:
+    """Bounded concurrency with a bounded wait line, for one event loop."""
+
+    def __init__(self, max_concurrent: int, max_queued: int, queue_timeout: float) -> None:
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self.capacity = max_concurrent + max_queued
+        self.queue_timeout = queue_timeout
+        self.admitted = 0  # running or waiting
+
+    async def __aenter__(self) -> None:
+        if self.admitted >= self.capacity:
+            raise CodeRunnerBusy(f"{self.admitted} code jobs already running or waiting, try again later")
+        self.admitted += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.admitted -= 1
+            raise CodeRunnerBusy(f"No code runner slot became free within {self.queue_timeout:g} seconds") from None
+        except BaseException:
+            self.admitted -= 1
+            raise
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.admitted -= 1
+        self._semaphore.release()
+
+
+class ExistingDockerRunner:
+    """Runs each script with `docker exec` (fallback when the worker pool is unreachable)."""
+
+    def __init__(self, container_name_or_id):
+        self.client = docker.from_env()
+        self.container = self.client.containers.get(container_name_or_id)
+        print(f"Connected to container: {self.container.name} (ID: {self.container.id[:12]})")
+
+    def run(self, code: str, job_id: str, timeout: float = CODE_TIMEOUT) -> dict:
+        """Run a script in its own directory, JOBS_DIR/<job_id>; returns the same bundle as the worker pool."""
+        work_dir = f"{JOBS_DIR}/{job_id}"
+        self.container.exec_run(["mkdir", "-p", work_dir])
+
+        # Write code to a file and copy it to the container
+        with io.BytesIO(code.encode('utf-8')) as file_like_object:
+            tar_buffer = io.BytesIO()
+            with tarfile.open(fileobj=tar_buffer, mode='w') as tar:
+                info = tarfile.TarInfo(name=SCRIPT_NAME)
+                info.size = len(file_like_object.getvalue())
+                tar.addfile(info, file_like_object)
+
+            tar_buffer.seek(0)
+            self.container.put_archive(work_dir, tar_buffer)
+
+        # Execute the Python script; `timeout` runs it in its own process group, recorded for `kill`
+        start = time.perf_counter()
+        command = f'echo $$ > {PID_FILE}; exec timeout -k 5 {timeout:g} python {SCRIPT_NAME}'
+        exit_code, (stdout, stderr) = self.container.exec_run(["sh", "-c", command], workdir=work_dir, demux=True)
+        duration = time.perf_counter() - start
+        stdout, stderr = (stdout or b"").decode('utf-8', 'replace'), (stderr or b"").decode('utf-8', 'replace')
+
+        _, listing = self.container.exec_run(["find", ".", "-type", "f", "!", "-name", SCRIPT_NAME, "!", "-name", PID_FILE,
+                                              "-printf", "%P\t%s\n"], workdir=work_dir)
+        files = [{'path': path, 'size': int(size)}
+                 for path, size in (line.split('\t') for line in listing.decode('utf-8').splitlines() if '\t' in line)]
+
+        results = []
+        if any(f['path'] == MANIFEST for f in files):
+            _, manifest = self.container.exec_run(["cat", MANIFEST], workdir=work_dir)
+            results = [json.loads(line) for line in manifest.decode('utf-8').splitlines() if line.startswith('{')]
+
+        return {'job_id': job_id, 'work_dir': work_dir, 'stdout': stdout, 'stderr': stderr, 'output': stdout + stderr,
+                'exit_code': exit_code, 'timed_out': exit_code == 124 or (exit_code == 137 and duration >= timeout),
+                'files': sorted(files, key=lambda f: f['path']), 'results': results, 'duration': duration}
+
+    def kill(self, job_id: str) -> None:
+        """Kill a running job (`timeout` and the script)."""
+        kill = f"import os, signal; os.killpg(int(open({PID_FILE!r}).read()), signal.SIGKILL)"
+        self.container.exec_run(["python", "-c", kill], workdir=f"{JOBS_DIR}/{job_id}")
+
+    def fetch(self, job_id: str, path: str) -> bytes:
+        stream, _ = self.container.get_archive(f"{JOBS_DIR}/{job_id}/{path}")
+        with tarfile.open(fileobj=io.BytesIO(b"".join(stream))) as tar:
+            member = tar.next()
+            return tar.extractfile(member).read()
+
+
+class CodeRunner:
+    """
+    Client for the warm worker pool in the code execution container.
+
+    Scripts are sent over one short-lived TCP connection per job (length-prefixed
+    JSON, see worker_pool.py) and run in an already-initialised interpreter, so a
+    tool call costs milliseconds instead of a `docker exec` and a cold Python start.
+    If the pool cannot be reached the script is run with `docker exec` as before.
+
+    The async API never blocks the event loop: pool jobs use asyncio streams, the
+    docker fallback runs in a thread, and at most `max_concurrent` jobs per loop run
+    at once with a bounded wait line behind them (`CodeRunnerBusy` past it).
+    Cancelling the awaiting task (e.g. a workflow timeout) closes the connection,
+    and the pool kills the job; a `docker exec` job is killed in the container.
+
+    Every job gets its own id and directory in the container, so concurrent
+    sessions never overwrite each other's script or files.
+    """
+
+    def __init__(self, container_name_or_id: str = CODE_RUNNER_CONTAINER,
+                 address: str = CODE_RUNNER_ADDRESS,
+                 timeout: float = CODE_TIMEOUT,
+                 max_concurrent: int = MAX_CONCURRENT_JOBS,
+                 max_queued: int = MAX_QUEUED_JOBS,
+                 queue_timeout: float = QUEUE_TIMEOUT) -> None:
+        self.container_name_or_id = container_name_or_id
+        self.timeout = timeout
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        # asyncio primitives belong to one loop (Streamlit runs a new loop per query)
+        self._limiters = weakref.WeakKeyDictionary()
+        self.address = self._parse_address(address)
+        self._docker_runner = None
+        self._pool_down_until = 0.0
+
+    @staticmethod
+    def _parse_address(address: str) -> tuple[str, int]:
+        host, _, port = address.rpartition(':')
+        return (host, int(port)) if host else (address, CODE_RUNNER_PORT)
+
+    @property
+    def docker_runner(self) -> ExistingDockerRunner:
+        if self._docker_runner is None:
+            self._docker_runner = ExistingDockerRunner(self.container_name_or_id)
+        return self._docker_runner
+
+    @staticmethod
+    def _recv(sock: socket.socket) -> dict:
+        with sock.makefile('rb') as stream:
+            header = stream.read(4)
+            if len(header) < 4:
+                raise ConnectionError("Worker pool closed the connection")
+            size = struct.unpack('>I', header)[0]
+            data = stream.read(size)
+            if len(data) < size:
+                raise ConnectionError("Worker pool closed the connection")
+        return json.loads(data)
+
+    @staticmethod
+    def _job_id(job_id: str | None) -> str:
+        if job_id is None:
+            return uuid.uuid4().hex
+        if not _JOB_ID.fullmatch(job_id):
+            raise ValueError(f"Invalid job id {job_id!r}: use up to 64 letters, digits, '-' or '_'")
+        return job_id
+
+    def _request(self, code: str, timeout: float | None, job_id: str) -> bytes:
+        data = json.dumps({'code': code, 'timeout': timeout or self.timeout, 'job_id': job_id}).encode('utf-8')
+        return struct.pack('>I', len(data)) + data
+
+    def _pool_run(self, sock: socket.socket, code: str, timeout: float | None, job_id: str) -> dict:
+        with sock:
+            # the pool always answers: jobs are killed at their timeout
+            sock.settimeout(None)
+            sock.sendall(self._request(code, timeout, job_id))
+            return self._recv(sock)
+
+    async def _aconnect(self) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        return await asyncio.wait_for(asyncio.open_connection(*self.address), 5)
+
+    async def _apool_run(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                         code: str, timeout: float | None, job_id: str) -> dict:
+        # closing the connection (also on cancellation) makes the pool stop the job
+        try:
+            writer.write(self._request(code, timeout, job_id))
+            await writer.drain()
+            header = await reader.readexactly(4)
+            return json.loads(await reader.readexactly(struct.unpack('>I', header)[0]))
+        except asyncio.IncompleteReadError:
+            raise ConnectionError("Worker pool closed the connection") from None
+        finally:
+            writer.close()
+
+    def _pool_available(self) -> bool:
+        return time.monotonic() >= self._pool_down_until
+
+    def _pool_failed(self, error: Exception) -> None:
+        self._pool_down_until = time.monotonic() + RETRY_POOL_AFTER
+        print(f"Code worker pool unreachable ({error}), running with docker exec")
+
+    def run(self, code: str, timeout: float | None = None, job_id: str | None = None) -> dict:
+        """
+        Run a script in its own job directory in the code execution container.
+
+        Args:
+            code (str): Python source, executed as `python script.py` would in the job directory
+            timeout (float | None): Seconds before the job is killed (defaults to CODE_RUNNER_TIMEOUT)
+            job_id (str | None): Id for the job and its directory (a new one by default)
+
+        Returns:
+            dict: The job's bundle: 'job_id', 'work_dir', 'stdout', 'stderr', 'output' (both,
+                interleaved), 'exit_code', 'files' (produced in the job directory) and timings
+        """
+        job_id = self._job_id(job_id)
+        if self._pool_available():
+            # only a pool that cannot be reached falls back: once the job is sent it may
+            # already be running, and errors after that are raised instead of running it twice
+            try:
+                sock = socket.create_connection(self.address, timeout=5)
+            except OSError as e:
+                self._pool_failed(e)
+            else:
+                return self._pool_run(sock, code, timeout, job_id)
+        return self.docker_runner.run(code, job_id, timeout or self.timeout)
+
+    def _limiter(self) -> _JobLimiter:
+        loop = asyncio.get_running_loop()
+        limiter = self._limiters.get(loop)
+        if limiter is None:
+            limiter = self._limiters[loop] = _JobLimiter(self.max_concurrent, self.max_queued, self.queue_timeout)
+        return limiter
+
+    async def arun(self, code: str, timeout: float | None = None, job_id: str | None = None) -> dict:
+        """Async version of `run`, limited to `max_concurrent` jobs at once; cancelling it stops the job."""
+        job_id = self._job_id(job_id)
+        async with self._limiter():
+            if self._pool_available():
+                try:
+                    reader, writer = await self._aconnect()
+                except (OSError, asyncio.TimeoutError) as e:
+                    self._pool_failed(e)
+                else:
+                    return await self._apool_run(reader, writer, code, timeout, job_id)
+
+            docker_runner = await asyncio.to_thread(lambda: self.docker_runner)
+            try:
+                return await asyncio.to_thread(docker_runner.run, code, job_id, timeout or self.timeout)
+            except asyncio.CancelledError:
+                # the thread cannot be interrupted, so stop the script itself
+                asyncio.get_running_loop().run_in_executor(None, docker_runner.kill, job_id)
+                raise
+
+    def run_python_code(self, code: str) -> str:
+        """Run a script and return its combined output."""
+        return self.run(code)['output']
+
+    async def arun_python_code(self, code: str) -> str:
+        """Async version of `run_python_code`."""
+        return (await self.arun(code))['output']
+
+    @staticmethod
+    def _parse_handle(handle: str) -> tuple[str, str]:
+        job_id, _, path = handle.partition('/')
+        if not _JOB_ID.fullmatch(job_id) or not path:
+            raise ValueError(f"Invalid artifact handle {handle!r}: expected '<job_id>/<path>'")
+        return job_id, path
+
+    def fetch(self, handle: str) -> bytes:
+        """
+        Download a file a job produced.
+
+        Args:
+            handle (str): '<job_id>/<path>', as listed under 'handle' in `summarize_result`
+
+        Returns:
+            bytes: The file's content
+        """
+        job_id, path = self._parse_handle(handle)
+        if not self._pool_available():
+            return self.docker_runner.fetch(job_id, path)
+        chunks, offset = [], 0
+        while True:
+            with socket.create_connection(self.address, timeout=5) as sock:
+                sock.settimeout(60)
+                data = json.dumps({'op': 'fetch', 'job_id': job_id, 'path': path, 'offset': offset}).encode('utf-8')
+                sock.sendall(struct.pack('>I', len(data)) + data)
+                response = self._recv(sock)
+            if 'error' in response:
+                raise FileNotFoundError(f"{handle}: {response['error']}")
+            chunk = base64.b64decode(response['data'])
+            chunks.append(chunk)
+            offset += len(chunk)
+            if response['eof'] or not chunk:
+                return b"".join(chunks)
+
+    async def afetch(self, handle: str) -> bytes:
+        return await asyncio.to_thread(self.fetch, handle)
+
+    def read_table(self, handle: str):
+        """Load a table a script reported with `emit` as a pandas DataFrame."""
+        import pandas as pd
+
+        data = io.BytesIO(self.fetch(handle))
+        return pd.read_csv(data, index_col=0) if handle.endswith('.csv') else pd.read_parquet(data)
+
+
+def _clip(text: str, max_chars: int) -> str:
+    """Keep the beginning and the end, where headers, errors and final results usually are."""
+    if len(text) <= max_chars:
+        return text
+    half = max_chars // 2
+    return f"{text[:half]}\n[... {len(text) - 2 * half} characters clipped ...]\n{text[-half:]}"
+
+
+def summarize_result(bundle: dict, max_output_chars: int = MAX_OUTPUT_CHARS) -> dict:
+    """
+    Compact view of a job bundle for the model: what it needs to judge the run, with
+    large data replaced by previews and handles.
+
+    Args:
+        bundle (dict): Result of `CodeRunner.run`/`arun`
+        max_output_chars (int): Characters of stdout (and of stderr) kept, head and tail
+
+    Returns:
+        dict: exit_code, clipped stdout/stderr, the reported results (values inline,
+            tables as shape, dtypes, preview rows and stats, files as handles) and the
+            other produced files as handles for `CodeRunner.fetch`
+    """
+    job_id = bundle.get('job_id')
+    summary = {'job_id': job_id, 'exit_code': bundle.get('exit_code')}
+    for flag in ('timed_out', 'out_of_memory'):
+        if bundle.get(flag):
+            summary[flag] = True
+    if bundle.get('stdout', bundle.get('output')):
+        summary['stdout'] = _clip(bundle.get('stdout', bundle.get('output', "")), max_output_chars)
+    if bundle.get('stderr'):
+        summary['stderr'] = _clip(bundle['stderr'], max_output_chars)
+
+    results, referenced = [], {MANIFEST}
+    for entry in bundle.get('results', [])[:MAX_SUMMARY_RESULTS]:
+        entry = {key: value for key, value in entry.items() if value is not None}
+        path = entry.pop('path', None)
+        if path:
+            referenced.add(path)
+            entry['handle'] = f"{job_id}/{path}"
+        results.append(entry)
+    if results:
+        summary['results'] = results
+    if len(bundle.get('results', [])) > MAX_SUMMARY_RESULTS:
+        summary['results_omitted'] = len(bundle['results']) - MAX_SUMMARY_RESULTS
+
+    artifacts = [{'handle': f"{job_id}/{f['path']}", 'size': f['size']}
+                 for f in bundle.get('files', []) if f['path'] not in referenced]
+    if artifacts:
+        summary['artifacts'] = artifacts[:MAX_SUMMARY_RESULTS]
+    return summary
+
+
+# Shared by the agents' code tools
+runner = CodeRunner()
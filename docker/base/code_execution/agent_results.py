@@ -0,0 +1,155 @@
+"""
+Typed results for scripts run by the agents' code execution tool.
+
+Instead of printing whole DataFrames, a script hands its results to `emit`:
+
+    from agent_results import emit
+
+    emit("max_temperature", df["temperature"].max(), unit="degC")
+    emit("hourly_means", hourly)          # DataFrame -> Parquet file + preview
+    emit("trend", fig)                    # figure -> image file, by reference
+
+Each call appends one JSON line to results/manifest.jsonl in the job directory.
+The runner returns the manifest with the job, and the agent's tool turns it into a
+compact summary: values inline, tables as shape, dtypes, a few preview rows and
+per-column statistics, figures and large values as handles to files that can be
+fetched in full.
+"""
+import os
+import json
+import math
+import shutil
+
+RESULTS_DIR = 'results'
+MANIFEST = os.path.join(RESULTS_DIR, 'manifest.jsonl')
+
+# values whose JSON is longer than this are stored in a file and previewed
+MAX_INLINE_CHARS = 2000
+PREVIEW_ROWS = 5
+MAX_PREVIEW_COLUMNS = 20
+
+
+def _json_safe(value):
+    """Plain JSON types for numpy/pandas scalars and containers."""
+    if hasattr(value, 'item') and not hasattr(value, '__len__'):
+        value = value.item()  # numpy scalar
+    if isinstance(value, float) and not math.isfinite(value):
+        return str(value)
+    if isinstance(value, dict):
+        return {str(k): _json_safe(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, set)):
+        return [_json_safe(v) for v in value]
+    if hasattr(value, 'tolist'):
+        return _json_safe(value.tolist())  # numpy array
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
+def _file_name(name: str, extension: str) -> str:
+    safe = "".join(c if c.isalnum() or c in '-_' else '_' for c in name)[:64] or 'result'
+    return os.path.join(RESULTS_DIR, f"{safe}{extension}")
+
+
+def _record(entry: dict) -> dict:
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    with open(MANIFEST, 'a') as f:
+        f.write(json.dumps(entry) + "\n")
+    return entry
+
+
+def _table(name: str, frame, description: str | None) -> dict:
+    import pandas as pd
+
+    if isinstance(frame, pd.Series):
+        frame = frame.to_frame()
+    path = _file_name(name, '.parquet')
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    try:
+        frame.to_parquet(path)
+        fmt = 'parquet'
+    except Exception:
+        # e.g. object columns Arrow cannot encode
+        path = _file_name(name, '.csv')
+        frame.to_csv(path)
+        fmt = 'csv'
+
+    entry = {
+        'name': name,
+        'kind': 'table',
+        'description': description,
+        'rows': int(len(frame)),
+        'columns': {str(c): str(t) for c, t in frame.dtypes.items()},
+        'path': path,
+        'format': fmt,
+        'size': os.path.getsize(path),
+    }
+
+    shown = frame.iloc[:, :MAX_PREVIEW_COLUMNS]
+    preview = shown.head(PREVIEW_ROWS)
+    if not isinstance(frame.index, pd.RangeIndex):
+        entry['index'] = frame.index.name or 'index'
+        if entry['index'] not in preview.columns:
+            preview = preview.reset_index()
+    try:
+        entry['preview'] = json.loads(preview.to_json(orient='records', date_format='iso'))
+        numeric = shown.select_dtypes('number')
+        if not numeric.empty and len(frame):
+            entry['stats'] = json.loads(numeric.agg(['min', 'max', 'mean']).to_json(date_format='iso'))
+    except ValueError:
+        # e.g. duplicate or multi-level column names
+        entry['preview'] = preview.to_string(max_colwidth=50)
+    return entry
+
+
+def _figure(name: str, figure, description: str | None) -> dict:
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    if isinstance(figure, (str, os.PathLike)):
+        extension = os.path.splitext(str(figure))[1] or '.png'
+        path = _file_name(name, extension)
+        shutil.copyfile(figure, path)
+    elif hasattr(figure, 'savefig'):
+        path = _file_name(name, '.png')
+        figure.savefig(path, dpi=100, bbox_inches='tight')
+    else:
+        path = _file_name(name, '.html')
+        figure.write_html(path)
+    return {'name': name, 'kind': 'figure', 'description': description, 'path': path, 'size': os.path.getsize(path)}
+
+
+def emit(name: str, value, description: str | None = None, unit: str | None = None) -> dict:
+    """
+    Report a result of the script.
+
+    Args:
+        name (str): Short identifier for the result
+        value: A scalar or small JSON-like value, a pandas DataFrame/Series, a figure
+            (anything with `savefig` or `write_html`) or the path of an image file
+        description (str | None): What the value is, for the reader of the summary
+        unit (str | None): Unit of a scalar value
+
+    Returns:
+        dict: The manifest entry
+    """
+    kind = type(value).__name__
+    if kind in ('DataFrame', 'Series'):
+        return _record(_table(name, value, description))
+    if hasattr(value, 'savefig') or hasattr(value, 'write_html') or (
+            isinstance(value, (str, os.PathLike)) and os.path.isfile(value)
+            and str(value).lower().endswith(('.png', '.jpg', '.jpeg', '.svg', '.html'))):
+        return _record(_figure(name, value, description))
+
+    value = _json_safe(value)
+    entry = {'name': name, 'kind': 'value', 'description': description, 'unit': unit}
+    text = json.dumps(value)
+    if len(text) <= MAX_INLINE_CHARS:
+        entry['value'] = value
+    else:
+        path = _file_name(name, '.json')
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(text)
+        entry.update(preview=text[:MAX_INLINE_CHARS // 4] + "...", path=path, size=len(text))
+    return _record(entry)
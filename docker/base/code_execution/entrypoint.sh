@@ -10,5 +10,5 @@ if ! python /app/db_health_check.py; then
     exit 1
 fi
 
-echo "Health check passed - keeping container running"
-exec tail -f /dev/null
\ No newline at end of file
+echo "Health check passed - starting code worker pool"
+exec python /app/worker_pool.py
\ No newline at end of file
@@ -0,0 +1,468 @@
+"""
+Pool of warm Python workers for the agents' code execution tool.
+
+The agents send a script over TCP (a 4-byte big-endian length followed by a JSON
+body) and get its output back the same way. Workers are long-lived processes
+forked from a forkserver that has already imported pandas, numpy, scipy and
+SQLAlchemy, so a job only pays for its own code, and SQLAlchemy engines are
+reused across jobs so database connections stay pooled. A job that runs past its
+timeout, or whose client disconnects (cancellation), is killed together with its
+worker; workers run under an address-space limit and are replaced after MAX_JOBS
+jobs or once their resident memory grows past RECYCLE_RSS_MB.
+
+Jobs from concurrent sessions never share files: each runs in its own directory
+(JOBS_DIR/<job_id>) with its own script, and returns a bundle of stdout, stderr,
+exit code and the files it produced there. Results a script reports through
+agent_results.emit come back with the job, and files can be fetched by job id
+and path (op 'fetch').
+"""
+import io
+import os
+import sys
+import re
+import json
+import base64
+import time
+import uuid
+import shutil
+import queue
+import signal
+import socket
+import struct
+import logging
+import linecache
+import resource
+import threading
+import traceback
+import socketserver
+import multiprocessing
+from multiprocessing.connection import wait
+from contextlib import redirect_stdout, redirect_stderr
+
+logger = logging.getLogger("worker_pool")
+
+HOST = os.getenv('CODE_RUNNER_HOST', '0.0.0.0')
+PORT = int(os.getenv('CODE_RUNNER_PORT', 8765))
+WORKERS = int(os.getenv('CODE_RUNNER_WORKERS', 4))
+DEFAULT_TIMEOUT = float(os.getenv('CODE_RUNNER_TIMEOUT', 120))
+
+# a worker is replaced after this many jobs, or when its resident memory exceeds RECYCLE_RSS_MB
+MAX_JOBS = int(os.getenv('CODE_RUNNER_MAX_JOBS', 100))
+RECYCLE_RSS_MB = int(os.getenv('CODE_RUNNER_RECYCLE_RSS_MB', 1024))
+
+# hard address-space limit per worker (0 disables it); allocations past it raise MemoryError in the job
+MEMORY_LIMIT_MB = int(os.getenv('CODE_RUNNER_MEMORY_MB', 4096))
+
+# imported once in the forkserver and inherited by every worker
+PRELOAD = ['worker_pool', 'agent_results', 'numpy', 'pandas', 'pyarrow', 'pyarrow.parquet', 'scipy', 'sqlalchemy',
+           'psycopg2']
+
+# every job runs in its own directory, JOBS_DIR/<job_id>, kept for JOB_RETENTION seconds for artifact retrieval
+JOBS_DIR = os.getenv('CODE_RUNNER_JOBS_DIR', '/tmp/jobs')
+JOB_RETENTION = int(os.getenv('CODE_RUNNER_JOB_RETENTION', 3600))
+SCRIPT_NAME = 'script.py'
+
+# results reported with agent_results.emit (see agent_results.py)
+MANIFEST = 'results/manifest.jsonl'
+MAX_RESULTS = 50
+
+# largest chunk returned by one 'fetch' request
+MAX_FETCH_BYTES = 8 << 20
+
+_JOB_ID = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+
+# ---------------------------------------------------------------- wire protocol
+
+def send_message(sock: socket.socket, message: dict) -> None:
+    data = json.dumps(message).encode('utf-8')
+    sock.sendall(struct.pack('>I', len(data)) + data)
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes | None:
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def recv_message(sock: socket.socket) -> dict | None:
+    header = _recv_exact(sock, 4)
+    if header is None:
+        return None
+    data = _recv_exact(sock, struct.unpack('>I', header)[0])
+    return json.loads(data) if data is not None else None
+
+
+# ---------------------------------------------------------------- worker process
+
+def _rss_mb() -> float:
+    with open('/proc/self/statm') as f:
+        resident_pages = int(f.read().split()[1])
+    return resident_pages * os.sysconf('SC_PAGE_SIZE') / (1 << 20)
+
+
+def _share_engines() -> None:
+    """Make sqlalchemy.create_engine return the same engine for the same URL and options."""
+    import sqlalchemy
+
+    create_engine = sqlalchemy.create_engine
+    engines = {}
+
+    def shared_create_engine(url, *args, **kwargs):
+        rendered = url.render_as_string(hide_password=False) if hasattr(url, 'render_as_string') else str(url)
+        key = (rendered, args, repr(sorted(kwargs.items())))
+        if key not in engines:
+            kwargs.setdefault('pool_pre_ping', True)
+            engines[key] = create_engine(url, *args, **kwargs)
+        return engines[key]
+
+    sqlalchemy.create_engine = shared_create_engine
+    sqlalchemy.engine.create_engine = shared_create_engine
+
+
+def _warm_database() -> None:
+    """Open a pooled connection with the URL the generated scripts use."""
+    if 'DB_HOST' not in os.environ:
+        return
+    import sqlalchemy
+
+    url = (f"postgresql://{os.environ['DB_USER']}:{os.environ['DB_PASSWORD']}@"
+           f"{os.environ['DB_HOST']}:{os.environ['DB_PORT']}/{os.environ['DB_NAME']}")
+    try:
+        with sqlalchemy.create_engine(url).connect() as connection:
+            connection.execute(sqlalchemy.text("SELECT 1"))
+    except Exception as e:
+        logger.warning(f"Worker {os.getpid()}: database warm-up failed: {e}")
+
+
+class _Tee(io.TextIOBase):
+    """Writes to one stream's buffer and to the combined output, keeping the interleaving."""
+
+    def __init__(self, stream: io.StringIO, combined: io.StringIO) -> None:
+        self.stream = stream
+        self.combined = combined
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        self.stream.write(text)
+        return self.combined.write(text)
+
+
+def run_job(code: str, work_dir: str) -> dict:
+    """Execute a script in a fresh namespace inside `work_dir`, as `python script.py` would there."""
+    stdout, stderr, output = io.StringIO(), io.StringIO(), io.StringIO()
+    exit_code = 0
+    start = time.perf_counter()
+    script_path = os.path.join(work_dir, SCRIPT_NAME)
+    with open(script_path, 'w') as f:
+        f.write(code)
+    # tracebacks show the script's source lines
+    linecache.cache[script_path] = (len(code), None, code.splitlines(True), script_path)
+    namespace = {'__name__': '__main__', '__file__': script_path, '__builtins__': __builtins__}
+    cwd, environ, path = os.getcwd(), dict(os.environ), list(sys.path)
+
+    os.chdir(work_dir)
+    sys.path.insert(0, work_dir)
+    with redirect_stdout(_Tee(stdout, output)), redirect_stderr(_Tee(stderr, output)):
+        try:
+            exec(compile(code, script_path, 'exec'), namespace)
+        except SystemExit as e:
+            if isinstance(e.code, int):
+                exit_code = e.code
+            elif e.code is not None:
+                print(e.code, file=sys.stderr)
+                exit_code = 1
+        except BaseException as e:
+            # skip this function's frame, like the interpreter's own traceback would
+            traceback.print_exception(type(e), e, e.__traceback__.tb_next)
+            exit_code = 1
+        finally:
+            # undo what the job changed in the worker's process state
+            os.chdir(cwd)
+            os.environ.clear()
+            os.environ.update(environ)
+            sys.path[:] = path
+            linecache.cache.pop(script_path, None)
+    sys.stdout.flush()
+
+    return {
+        'stdout': stdout.getvalue(),
+        'stderr': stderr.getvalue(),
+        'output': output.getvalue(),
+        'exit_code': exit_code,
+        'duration': time.perf_counter() - start,
+        'rss_mb': _rss_mb(),
+        'out_of_memory': exit_code == 1 and 'MemoryError' in stderr.getvalue()[-2000:],
+    }
+
+
+def worker_main(conn, memory_limit_mb: int) -> None:
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if memory_limit_mb:
+        limit = memory_limit_mb << 20
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    _share_engines()
+    _warm_database()
+
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, OSError):
+            break
+        conn.send(run_job(job['code'], job['work_dir']))
+
+
+# ---------------------------------------------------------------- pool
+
+def _failure(message: str, exit_code: int, **flags) -> dict:
+    """Result for a job that did not finish normally."""
+    return {'stdout': "", 'stderr': message, 'output': message, 'exit_code': exit_code, **flags}
+
+
+def _disconnected(sock: socket.socket) -> bool:
+    try:
+        return sock.recv(1, socket.MSG_PEEK) == b""
+    except OSError:
+        return True
+
+
+class Worker:
+    def __init__(self, context) -> None:
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=worker_main, args=(child_conn, MEMORY_LIMIT_MB), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.jobs = 0
+
+    def run(self, code: str, work_dir: str, timeout: float, client: socket.socket | None = None) -> dict:
+        """Run a job; it is killed at its timeout or when `client` disconnects (cancellation)."""
+        self.jobs += 1
+        self.conn.send({'code': code, 'work_dir': work_dir})
+        deadline = time.monotonic() + timeout
+        watched = [self.conn] if client is None else [self.conn, client]
+        while True:
+            remaining = deadline - time.monotonic()
+            ready = wait(watched, remaining) if remaining > 0 else []
+            if self.conn in ready:
+                break
+            if not ready:
+                self.stop()
+                return _failure(f"Execution timed out after {timeout:g} seconds", -signal.SIGKILL, timed_out=True)
+            if _disconnected(client):
+                self.stop()
+                return _failure("Execution cancelled by the client", -signal.SIGKILL, cancelled=True)
+            watched = [self.conn]  # unexpected bytes from the client: stop watching it
+        try:
+            return self.conn.recv()
+        except EOFError:
+            # killed by the OS (e.g. OOM killer) or crashed in native code
+            self.process.join(1)
+            return _failure(f"Worker process died (exit code {self.process.exitcode})", self.process.exitcode or 1)
+
+    def stop(self) -> None:
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(5)
+        self.conn.close()
+
+
+class WorkerPool:
+    """Fixed number of warm workers; jobs wait for an idle worker."""
+
+    def __init__(self, size: int = WORKERS, max_jobs: int = MAX_JOBS, recycle_rss_mb: int = RECYCLE_RSS_MB) -> None:
+        self.context = multiprocessing.get_context('forkserver')
+        self.context.set_forkserver_preload(PRELOAD)
+        self.max_jobs = max_jobs
+        self.recycle_rss_mb = recycle_rss_mb
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._last_clean = 0.0
+        self.stats = {'jobs': 0, 'timeouts': 0, 'cancelled': 0, 'recycled': 0, 'busy': 0}
+        for _ in range(size):
+            self._idle.put(Worker(self.context))
+
+    def _replace(self, worker: Worker) -> None:
+        worker.stop()
+        self._idle.put(Worker(self.context))
+
+    def _clean_jobs(self) -> None:
+        """Remove job directories older than JOB_RETENTION (at most once a minute)."""
+        now = time.time()
+        with self._lock:
+            if now - self._last_clean < 60:
+                return
+            self._last_clean = now
+        with os.scandir(JOBS_DIR) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir() and now - entry.stat().st_mtime > JOB_RETENTION:
+                        shutil.rmtree(entry.path, ignore_errors=True)
+                except FileNotFoundError:
+                    pass
+
+    @staticmethod
+    def _produced_files(work_dir: str) -> list[dict]:
+        files = []
+        for root, _, names in os.walk(work_dir):
+            for name in names:
+                path = os.path.join(root, name)
+                relative = os.path.relpath(path, work_dir)
+                if relative != SCRIPT_NAME:
+                    files.append({'path': relative, 'size': os.path.getsize(path)})
+        return sorted(files, key=lambda f: f['path'])
+
+    @staticmethod
+    def _results(work_dir: str) -> list[dict]:
+        try:
+            with open(os.path.join(work_dir, MANIFEST)) as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return []
+        results = []
+        for line in lines[:MAX_RESULTS]:
+            try:
+                results.append(json.loads(line))
+            except json.JSONDecodeError:
+                pass  # partial line from a job killed mid-write
+        return results
+
+    def run(self, code: str, timeout: float = DEFAULT_TIMEOUT, client: socket.socket | None = None,
+            job_id: str | None = None) -> dict:
+        """
+        Run one job in its own directory.
+
+        Args:
+            code (str): Python source
+            timeout (float): Seconds before the job is killed
+            client (socket.socket | None): Connection whose disconnect cancels the job
+            job_id (str | None): Caller's id for the job (a new one is generated if missing or invalid)
+
+        Returns:
+            dict: The job's bundle: job_id, work_dir, stdout, stderr, output (both, interleaved),
+                exit_code, files (produced in work_dir, with sizes), results (reported with
+                agent_results.emit) and timings
+        """
+        if not job_id or not _JOB_ID.fullmatch(job_id):
+            job_id = uuid.uuid4().hex
+        work_dir = os.path.join(JOBS_DIR, job_id)
+        os.makedirs(work_dir, exist_ok=True)
+        self._clean_jobs()
+
+        worker = self._idle.get()
+        if client is not None and wait([client], 0) and _disconnected(client):
+            # cancelled while queued: the worker was never used
+            self._idle.put(worker)
+            shutil.rmtree(work_dir, ignore_errors=True)
+            with self._lock:
+                self.stats['cancelled'] += 1
+            return _failure("Execution cancelled by the client", -signal.SIGKILL, cancelled=True)
+        with self._lock:
+            self.stats['busy'] += 1
+        start = time.perf_counter()
+        result = _failure("Internal error in the code runner", 1)
+        try:
+            result = worker.run(code, work_dir, timeout, client)
+        except Exception as e:
+            logger.exception("Job failed in the worker pool")
+            result = _failure(f"Internal error in the code runner: {e}", 1)
+        finally:
+            recycle = (not worker.process.is_alive() or result.get('timed_out') or result.get('out_of_memory')
+                       or worker.jobs >= self.max_jobs or result.get('rss_mb', 0) > self.recycle_rss_mb)
+            if recycle:
+                # replaced off the request path; the next job waits on the queue if no worker is idle
+                threading.Thread(target=self._replace, args=(worker,), daemon=True).start()
+            else:
+                self._idle.put(worker)
+            with self._lock:
+                self.stats['busy'] -= 1
+                self.stats['jobs'] += 1
+                self.stats['timeouts'] += int(bool(result.get('timed_out')))
+                self.stats['cancelled'] += int(bool(result.get('cancelled')))
+                self.stats['recycled'] += int(bool(recycle))
+
+        if result.get('cancelled'):
+            shutil.rmtree(work_dir, ignore_errors=True)
+            return result
+        result['job_id'] = job_id
+        result['work_dir'] = work_dir
+        result['files'] = self._produced_files(work_dir)
+        result['results'] = self._results(work_dir)
+        result['worker_pid'] = worker.process.pid
+        result['total_duration'] = time.perf_counter() - start
+        return result
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+        stats['idle'] = self._idle.qsize()
+        return stats
+
+
+def fetch(job_id: str, path: str, offset: int = 0, limit: int = MAX_FETCH_BYTES) -> dict:
+    """Read (part of) a file a job produced; paths outside the job directory are refused."""
+    if not _JOB_ID.fullmatch(job_id or ""):
+        return {'error': f"Invalid job id {job_id!r}"}
+    work_dir = os.path.realpath(os.path.join(JOBS_DIR, job_id))
+    full_path = os.path.realpath(os.path.join(work_dir, path))
+    if not full_path.startswith(work_dir + os.sep):
+        return {'error': f"Path {path!r} is outside the job directory"}
+    try:
+        size = os.path.getsize(full_path)
+        with open(full_path, 'rb') as f:
+            f.seek(offset)
+            data = f.read(min(limit, MAX_FETCH_BYTES))
+    except OSError as e:
+        return {'error': str(e)}
+    return {'data': base64.b64encode(data).decode('ascii'), 'size': size, 'offset': offset,
+            'eof': offset + len(data) >= size}
+
+
+# ---------------------------------------------------------------- server
+
+class JobHandler(socketserver.BaseRequestHandler):
+    def handle(self) -> None:
+        request = recv_message(self.request)
+        if request is None:
+            return
+        if request.get('op') == 'stats':
+            send_message(self.request, self.server.pool.snapshot())
+            return
+        if request.get('op') == 'fetch':
+            send_message(self.request, fetch(request.get('job_id'), request.get('path', ''),
+                                             int(request.get('offset', 0)), int(request.get('limit', MAX_FETCH_BYTES))))
+            return
+        timeout = float(request.get('timeout') or DEFAULT_TIMEOUT)
+        result = self.server.pool.run(request['code'], timeout, client=self.request, job_id=request.get('job_id'))
+        if not result.get('cancelled'):
+            send_message(self.request, result)
+
+
+class JobServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, pool: WorkerPool) -> None:
+        self.pool = pool
+        super().__init__(address, JobHandler)
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    pool = WorkerPool()
+    with JobServer((HOST, PORT), pool) as server:
+        logger.info(f"Serving {WORKERS} warm Python workers on {HOST}:{PORT}")
+        server.serve_forever()
+
+
+if __name__ == "__main__":
+    # run through the module so workers unpickle `worker_pool.worker_main`, not `__main__.worker_main`
+    import worker_pool
+    worker_pool.main()
@@ -0,0 +1,71 @@
+"""
+Ingestion markers: a version per collection that changes on every write.
+
+Ingestion runs in its own process (embed.ingest_manuals), so the serving
+processes cannot be told directly that a collection changed. Instead every
+rebuild or incremental sync stores a new random version for the collection in a
+small payload-only Qdrant collection, and readers compare it with the version
+they saw before (e.g. the answer cache drops answers of an older version).
+"""
+import os
+import time
+import uuid
+
+from qdrant_client import QdrantClient
+from qdrant_client.http import models as qdrant_models
+
+INGESTION_MARKERS_COLLECTION = os.getenv('INGESTION_MARKERS_COLLECTION', "ingestion_markers")
+
+# one marker point per collection, with an id derived from the collection name
+MARKER_ID_NAMESPACE = uuid.UUID("0c6f4f3e-2a8b-4d6e-9f1a-7b3c5d9e2f10")
+
+
+def _marker_id(collection_name: str) -> str:
+    return str(uuid.uuid5(MARKER_ID_NAMESPACE, collection_name))
+
+
+def _ensure_markers_collection(client: QdrantClient) -> None:
+    if client.collection_exists(collection_name=INGESTION_MARKERS_COLLECTION):
+        return
+    try:
+        client.create_collection(collection_name=INGESTION_MARKERS_COLLECTION, vectors_config={})
+    except Exception:
+        # another ingestion worker created it first
+        if not client.collection_exists(collection_name=INGESTION_MARKERS_COLLECTION):
+            raise
+
+
+def bump_collection_version(client: QdrantClient, collection_name: str) -> str:
+    """
+    Record that a collection's content changed.
+
+    Args:
+        client (QdrantClient): Client of the Qdrant instance holding the collection
+        collection_name (str): The collection that was written
+
+    Returns:
+        str: The new version
+    """
+    _ensure_markers_collection(client)
+    version = uuid.uuid4().hex
+    client.upsert(
+        collection_name=INGESTION_MARKERS_COLLECTION,
+        points=[qdrant_models.PointStruct(
+            id=_marker_id(collection_name),
+            vector={},
+            payload={'collection': collection_name, 'version': version, 'updated_at': time.time()}
+        )]
+    )
+    return version
+
+
+def get_collection_version(client: QdrantClient, collection_name: str) -> str | None:
+    """
+    Current version of a collection, or None if it was never written with a marker.
+    """
+    if not client.collection_exists(collection_name=INGESTION_MARKERS_COLLECTION):
+        return None
+    points = client.retrieve(collection_name=INGESTION_MARKERS_COLLECTION,
+                             ids=[_marker_id(collection_name)],
+                             with_payload=True)
+    return points[0].payload.get('version') if points else None
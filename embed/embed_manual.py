@@ -1,100 +1,73 @@
-import json
 import os
 import time
+import uuid
+import hashlib
 from pathlib import Path
-from llama_index.core import Settings, Document, VectorStoreIndex, StorageContext
-from llama_index.vector_stores.qdrant import QdrantVectorStore
+from typing import Iterable, Iterator
+from llama_index.core import Document
 from llama_index.embeddings.nvidia import NVIDIAEmbedding
-from llama_index.embeddings.openai import OpenAIEmbedding
-
-from llama_index.core.node_parser import SentenceSplitter
 
 from qdrant_client import QdrantClient
+from qdrant_client.http import models as qdrant_models
 
-def load_manual_pages(json_path):
-    """
-    Load manual pages from JSON file and return a dictionary mapping page numbers to page content.
-    
-    Args:
-        json_path (str): Path to the JSON file containing manual data
-        
-    Returns:
-        dict: Dictionary with page numbers as keys and page content as values
-    """
-    import json
-    
-    # Initialize pages dictionary
-    pages_dict = {}
-    
-    try:
-        # Load JSON file
-        with open(json_path, 'r') as f:
-            data = json.load(f)
-            
-        # Extract pages from first document
-        if data and isinstance(data, list) and len(data) > 0:
-            document = data[0]
-            
-            # Process each page
-            for page in document.get('pages', []):
-                page_number = page.get('page')
-                if page_number is not None:
-                    # Create page content dictionary with relevant fields
-                    page_content = {
-                        'text': page.get('text', ''),
-                        'markdown': page.get('md', ''),
-                        'images': page.get('images', []),
-                        'charts': page.get('charts', []),
-                        'items': page.get('items', []),
-                        'links': page.get('links', []),
-                        'width': page.get('width'),
-                        'height': page.get('height'),
-                        'status': page.get('status')
-                    }
-                    pages_dict[page_number] = page_content
-                    
-        return pages_dict
-        
-    except Exception as e:
-        print(f"Error loading manual pages: {str(e)}")
-        return {}
+from embed.ingestion_pipeline import ManualIngestionPipeline
+from embed.embedding_backends import build_embed_model, embed_backend_name
+from embed.quantization import apply_quantization, wait_for_optimizer, quantization_report, print_quantization_report
+from retrievers.local_index import LocalIndexWriter
+from embed.manual_stream import iter_manual_pages
+from embed.collection_version import bump_collection_version
 
-def create_documents_from_manual(json_path: str) -> list[Document]:
+QDRANT_URL = os.getenv(
+    'QDRANT_URL',
+    "https://6eefc541-3b11-47b5-8274-bdc84e60b5b9.us-east-1-0.aws.cloud.qdrant.io:6333"
+)
+
+# Namespace for deterministic chunk point ids used by incremental ingestion
+CHUNK_ID_NAMESPACE = uuid.UUID("6b1f1f0e-3c55-4d0c-9a57-6a1e0c2d7f41")
+
+def create_documents_from_manual(json_path: str,
+                                 manual_id: str | None = None,
+                                 skip_pages: Iterable[int] = ()) -> Iterator[Document]:
     """
     Create LlamaIndex Documents from manual pages JSON data.
+
+    Pages are streamed from the file one at a time (see embed.manual_stream), and
+    Documents are yielded lazily, so peak memory stays flat regardless of manual size.
     
     Args:
         json_path (str): Path to the JSON file containing manual data
+        manual_id (str | None): Stored as a 'manual_id' payload field so several manuals
+            can share one collection
+        skip_pages (Iterable[int]): Page numbers to leave out (cover, table of contents, ...)
         
-    Returns:
-        list[Document]: List of LlamaIndex Document objects
+    Yields:
+        Document: LlamaIndex Document objects, one per page
     """
     print(f"\nAttempting to create documents from manual pages at {json_path}")
-    documents = []
-    
-    # Load the manual pages
-    pages_dict = load_manual_pages(json_path)
+    document_count = 0
+    skip_pages = set(skip_pages)
     
     try:
-        for page_number, page_content in pages_dict.items():
-            if page_number in [1,2,3,4,5,6,7,8,9,10,11,12,13]:
+        for page in iter_manual_pages(json_path):
+            page_number = page['page_number']
+            if page_number in skip_pages:
                 continue
             
             print(f"\nProcessing page {page_number}")
-            
-            image_paths = [image['path'] for image in page_content.get('images', []) if image.get('type') != 'full_page_screenshot']
 
             # Create metadata dictionary
             metadata = {
                 'page_number': page_number,
-                'image_paths': image_paths,
-                'links': page_content.get('links', []),
+                'image_paths': page['image_paths'],
+                'links': page['links'],
                 # 'charts': page_content.get('charts', []),
                 # 'items': page_content.get('items', []),
             }
+            if manual_id is not None:
+                metadata['manual_id'] = manual_id
             
             # Combine text and markdown content
-            content = page_content.get('markdown', '')
+            content = page['markdown']
             
             # Create Document object
             document = Document(
@@ -104,20 +77,110 @@ def create_documents_from_manual(json_path: str) -> list[Document]:
                 excluded_embed_metadata_keys=list(metadata.keys()),  # Exclude metadata from embeddings
                 metadata_separator="\n",
                 metadata_template="{key}: {value}",
-                text_template="Page {page_number} Content:\n{content}"
+                # default text_template: every metadata key is excluded, so the content is used as-is
+                # (a "{page_number}" placeholder here raises KeyError whenever the text is rendered)
             )
-            documents.append(document)
+            document_count += 1
+            yield document
             
-        print(f"\nSuccessfully created {len(documents)} documents")
-        return documents
+        print(f"\nSuccessfully created {document_count} documents")
         
     except Exception as e:
+        # re-raise: a silently truncated stream would make incremental sync delete the missing pages
         print(f"Error creating documents: {str(e)}")
-        return []
+        raise
 
-def embed_documents(documents: list[Document], query_collection_name: str) -> None:
+def page_content_hash(markdown: str, chunk_size: int, chunk_overlap: int) -> str:
     """
-    Embed the documents using Cohere embeddings with retry logic and batch processing.
+    Hash a page's markdown together with the chunking parameters.
+
+    Args:
+        markdown (str): Page markdown
+        chunk_size (int): Splitter chunk size
+        chunk_overlap (int): Splitter chunk overlap
+
+    Returns:
+        str: Hex digest that changes whenever the page's chunks would change
+    """
+    return hashlib.sha256(f"{chunk_size}:{chunk_overlap}:{markdown}".encode('utf-8')).hexdigest()
+
+def chunk_id_func(i: int, doc: Document) -> str:
+    """Deterministic point id for the i-th chunk of a page, derived from its content hash."""
+    name = f"{doc.metadata['page_number']}:{doc.metadata['content_hash']}:{i}"
+    if doc.metadata.get('manual_id') is not None:
+        # manuals sharing a collection have overlapping page numbers
+        name = f"{doc.metadata['manual_id']}:{name}"
+    return str(uuid.uuid5(CHUNK_ID_NAMESPACE, name))
+
+def manual_filter(manual_id: str) -> qdrant_models.Filter:
+    """Qdrant filter matching the points of one manual in a shared collection."""
+    return qdrant_models.Filter(
+        must=[qdrant_models.FieldCondition(key='manual_id', match=qdrant_models.MatchValue(value=manual_id))]
+    )
+
+def fetch_point_ids(client: QdrantClient, collection_name: str, manual_id: str | None = None) -> set[str]:
+    """
+    Return the ids of every point currently stored in a collection, or only those of
+    one manual when `manual_id` is given.
+    """
+    point_ids = set()
+    if not client.collection_exists(collection_name=collection_name):
+        return point_ids
+
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=collection_name,
+            scroll_filter=manual_filter(manual_id) if manual_id is not None else None,
+            limit=1000,
+            offset=offset,
+            with_payload=False,
+            with_vectors=False
+        )
+        point_ids.update(str(point.id) for point in points)
+        if offset is None:
+            return point_ids
+
+def stamp_content_hashes(documents, chunk_size: int, chunk_overlap: int):
+    """
+    Add a 'content_hash' metadata field (excluded from embeddings and LLM context) to each page.
+
+    Yields:
+        Document: The stamped documents
+    """
+    for document in documents:
+        document.metadata['content_hash'] = page_content_hash(document.text, chunk_size, chunk_overlap)
+        if 'content_hash' not in document.excluded_embed_metadata_keys:
+            document.excluded_embed_metadata_keys.append('content_hash')
+        if 'content_hash' not in document.excluded_llm_metadata_keys:
+            document.excluded_llm_metadata_keys.append('content_hash')
+        yield document
+
+def embed_documents(documents: Iterable[Document],
+                    query_collection_name: str,
+                    incremental: bool = False,
+                    manual_id: str | None = None,
+                    embed_model=None,
+                    quantization: str | None = None) -> dict:
+    """
+    Embed the documents with the pipelined ingestion engine and store them in Qdrant.
+
+    Args:
+        documents (Iterable[Document]): Page documents from create_documents_from_manual
+        query_collection_name (str): Target Qdrant collection
+        incremental (bool): Upsert only new or changed chunks and delete chunks of removed
+            pages instead of dropping and rebuilding the collection
+        manual_id (str | None): Set when the collection is shared by several manuals; the
+            rebuild and the incremental sync then only touch this manual's points, which
+            must carry the same 'manual_id' (see create_documents_from_manual)
+        embed_model (BaseEmbedding | None): Embedding backend; defaults to build_embed_model(),
+            i.e. the EMBED_BACKEND environment setting. Queries must use the same model.
+        quantization (str | None): 'scalar' (int8) or 'binary' to keep only quantized dense
+            vectors in RAM (originals on disk); a recall/latency/memory report is printed
+            and returned under 'quantization'
+
+    Returns:
+        dict: Ingestion stats
     """
 
     # NVIDIA_API_KEY = os.getenv('NVIDIA_API_KEY')
@@ -130,79 +193,183 @@ def embed_documents(documents: list[Document], query_collection_name: str) -> No
     #     model_name="nvidia/nv-embedqa-e5-v5",
     # )
 
-    OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
-    openai_api_key = OPENAI_API_KEY
-
-    embed_model = OpenAIEmbedding(
-        model="text-embedding-3-large",
-        api_key=openai_api_key,
-    )
-
-    Settings.embed_model = embed_model
-
     QDRANT_API_KEY = os.getenv('QDRANT_API_KEY')
     qdrant_api_key = QDRANT_API_KEY
 
     # creates a persistant index to disk
-    client = QdrantClient(url="https://6eefc541-3b11-47b5-8274-bdc84e60b5b9.us-east-1-0.aws.cloud.qdrant.io:6333",
+    client = QdrantClient(url=QDRANT_URL,
                           api_key=qdrant_api_key,
                           timeout=3600)
 
+    # Settings for LlamaIndex
+    chunk_size = 4096
+    chunk_overlap = 512
+
+    if embed_model is None:
+        embed_model = build_embed_model()
+
+    if incremental:
+        stats = sync_documents_incremental(documents, query_collection_name, client, chunk_size, chunk_overlap,
+                                           manual_id=manual_id, embed_model=embed_model)
+    else:
+        stats = rebuild_collection(documents, query_collection_name, client, chunk_size, chunk_overlap,
+                                   manual_id=manual_id, embed_model=embed_model)
+
+    if manual_id is not None:
+        ensure_manual_id_index(client, query_collection_name)
+    if quantization is not None and client.collection_exists(collection_name=query_collection_name):
+        apply_quantization(client, query_collection_name, quantization)
+        wait_for_optimizer(client, query_collection_name)
+        stats['quantization'] = quantization_report(client, query_collection_name, quantization)
+        print_quantization_report(query_collection_name, quantization, stats['quantization'])
+    return stats
+
+def rebuild_collection(documents: Iterable[Document],
+                       query_collection_name: str,
+                       client: QdrantClient,
+                       chunk_size: int,
+                       chunk_overlap: int,
+                       manual_id: str | None = None,
+                       embed_model=None) -> dict:
+    """
+    Drop the collection (or, in a shared collection, this manual's points) and embed everything again.
+    """
     if client.collection_exists(collection_name=query_collection_name):
-        print(f"Collection {query_collection_name} already exists. Deleting...")
-        client.delete_collection(collection_name=query_collection_name)
+        if manual_id is not None:
+            print(f"Deleting existing points of manual {manual_id} from {query_collection_name}...")
+            client.delete(
+                collection_name=query_collection_name,
+                points_selector=qdrant_models.FilterSelector(filter=manual_filter(manual_id))
+            )
+        else:
+            print(f"Collection {query_collection_name} already exists. Deleting...")
+            client.delete_collection(collection_name=query_collection_name)
 
     print('Starting embedding')
-    start = time.time()
+    pipeline = ManualIngestionPipeline(
+        query_collection_name,
+        client,
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        embed_model=embed_model
+    )
+    stats = pipeline.run(documents)
+    # serving processes drop answers cached for the old content (see agents.answer_cache)
+    stats['collection_version'] = bump_collection_version(client, query_collection_name)
+    print(f"Embedded {stats['upserted']} chunks ({stats['tokens']} tokens, {stats['embed_batches']} requests) "
+          f"in {stats['seconds']:.1f} seconds")
+    return stats
 
-    # Settings for LlamaIndex
+def build_local_index(documents: Iterable[Document],
+                      index_dir: str,
+                      embed_model=None,
+                      n_lists: int | None = None) -> dict:
+    """
+    Embed the documents into an on-disk index for offline retrieval (see retrievers.local_index).
+
+    Uses the same chunking and ingestion pipeline as embed_documents, but writes to
+    `index_dir` instead of Qdrant. The directory is served by LocalRetrievalEngine
+    when LOCAL_INDEX_DIR points at its parent and the directory is named after the
+    collection.
+
+    Args:
+        documents (Iterable[Document]): Page documents from create_documents_from_manual
+        index_dir (str): Output directory
+        embed_model (BaseEmbedding | None): Embedding backend; a local fastembed model keeps
+            query time fully offline
+        n_lists (int | None): IVF lists; by default exact search for small manuals and
+            about sqrt(chunks) lists for large ones
+
+    Returns:
+        dict: Ingestion stats plus the written index manifest
+    """
     chunk_size = 4096
     chunk_overlap = 512
-    Settings.chunk_size = chunk_size
-    Settings.chunk_overlap = chunk_overlap
-    Settings.text_splitter = SentenceSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
-
-    # Add batch processing
-    batch_size = 50  # Adjust this number based on your needs
-    max_retries = 5
-    base_delay = 60  # 60 seconds wait between retries
-
-    # Process documents in batches
-    for i in range(0, len(documents), batch_size):
-        batch = documents[i:i + batch_size]
-        
-        for attempt in range(max_retries):
-            try:
-                vector_store = QdrantVectorStore(
-                    query_collection_name, 
-                    client=client, 
-                    enable_hybrid=True, 
-                    batch_size=20
-                )
-                
-                storage_context = StorageContext.from_defaults(vector_store=vector_store)
-
-                index = VectorStoreIndex.from_documents(
-                    batch,
-                    storage_context=storage_context,
-                    transformations=[SentenceSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)]
-                )
-                
-                print(f"Successfully processed batch {i//batch_size + 1}")
-                break  # Success, move to next batch
-                
-            except Exception as e:
-                if "rate limit exceeded" in str(e).lower():
-                    if attempt < max_retries - 1:  # Don't sleep on the last attempt
-                        wait_time = base_delay * (2 ** attempt)  # Exponential backoff
-                        print(f"Rate limit hit. Waiting {wait_time} seconds before retry...")
-                        time.sleep(wait_time)
-                    else:
-                        print(f"Failed to process batch after {max_retries} attempts")
-                        raise
-                else:
-                    print(f"Unexpected error: {str(e)}")
-                    raise
+
+    if embed_model is None:
+        embed_model = build_embed_model()
+
+    writer = LocalIndexWriter(index_dir, n_lists=n_lists, manifest={
+        'embed_backend': embed_backend_name(embed_model),
+        'embed_model': embed_model.model_name,
+        'chunk_size': chunk_size,
+        'chunk_overlap': chunk_overlap,
+        # a rebuilt index is new content for answers cached against the old one
+        'version': uuid.uuid4().hex,
+    })
+    pipeline = ManualIngestionPipeline(
+        os.path.basename(os.path.normpath(index_dir)),
+        None,
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        embed_model=embed_model,
+        vector_store=writer
+    )
+    stats = pipeline.run(documents)
+    stats['manifest'] = writer.finalize()
+    print(f"Wrote local index {index_dir}: {stats['manifest']['count']} chunks in "
+          f"{stats['manifest']['n_lists']} lists ({stats['seconds']:.1f} seconds)")
+    return stats
+
+def ensure_manual_id_index(client: QdrantClient, query_collection_name: str) -> None:
+    """Index the 'manual_id' payload field so per-manual filters stay fast in shared collections."""
+    if not client.collection_exists(collection_name=query_collection_name):
+        return
+    client.create_payload_index(
+        collection_name=query_collection_name,
+        field_name='manual_id',
+        field_schema=qdrant_models.PayloadSchemaType.KEYWORD
+    )
+
+def sync_documents_incremental(documents: Iterable[Document],
+                               query_collection_name: str,
+                               client: QdrantClient,
+                               chunk_size: int,
+                               chunk_overlap: int,
+                               manual_id: str | None = None,
+                               embed_model=None) -> dict:
+    """
+    Idempotently bring a collection in line with the given page documents.
+
+    Every chunk gets a point id derived from its page number, the page content hash
+    and its position, so unchanged pages map to points that already exist. New and
+    changed chunks are embedded and upserted first; points that no longer correspond
+    to any chunk (changed or removed pages, or legacy random ids) are deleted last,
+    so the collection stays queryable throughout. With `manual_id`, only that
+    manual's points are considered, so other manuals in a shared collection are
+    left alone.
+
+    Returns:
+        dict: Ingestion stats plus counts of unchanged, upserted and deleted chunks
+    """
+    existing_ids = fetch_point_ids(client, query_collection_name, manual_id=manual_id)
+
+    pipeline = ManualIngestionPipeline(
+        query_collection_name,
+        client,
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        id_func=chunk_id_func,
+        embed_model=embed_model
+    )
+    stats = pipeline.run(stamp_content_hashes(documents, chunk_size, chunk_overlap), skip_ids=existing_ids)
+
+    stale_ids = sorted(existing_ids - stats['node_ids'])
+    for i in range(0, len(stale_ids), 1000):
+        client.delete(
+            collection_name=query_collection_name,
+            points_selector=qdrant_models.PointIdsList(points=stale_ids[i:i + 1000])
+        )
+
+    stats['unchanged'] = stats['skipped']
+    stats['deleted'] = len(stale_ids)
+    if stats['upserted'] or stats['deleted']:
+        # serving processes drop answers cached for the old content (see agents.answer_cache)
+        stats['collection_version'] = bump_collection_version(client, query_collection_name)
+    target = query_collection_name if manual_id is None else f"{query_collection_name} ({manual_id})"
+    print(f"Incremental sync of {target}: {stats['unchanged']} unchanged, "
+          f"{stats['upserted']} upserted, {stats['deleted']} deleted in {stats['seconds']:.1f} seconds")
+    return stats
 
 
 def main():
@@ -212,25 +379,20 @@ def main():
     # Define the paths to your JSON files
     json_path = Path("/Users/delonsaks/Documents/virfold/data/manuals/parsed_manual.json")
     
-    # Create Documents from manual
+    # Create Documents from manual (streamed lazily into the ingestion pipeline)
     print("\nStarting document creation...")
-    documents = create_documents_from_manual(str(json_path))  # Pass the path string directly
-    print(f"Created {len(documents)} Documents")
-    
-    if documents:
-        print("\nFirst document:")
-        print(f"Text: {documents[0].text[:200]}...")
-        print(f"Metadata: {documents[0].metadata}")
-        
-        query_collection_name = "danfos_service_manual_2024_v1"
-        
-        # Start embedding process
-        print("\nStarting embedding process...")
-        try:
-            embed_documents(documents, query_collection_name)
-            print("Successfully completed embedding process!")
-        except Exception as e:
-            print(f"Error during embedding: {str(e)}")
+    # pages 1-13 are the cover, table of contents and safety notices
+    documents = create_documents_from_manual(str(json_path), skip_pages=range(1, 14))  # Pass the path string directly
+
+    query_collection_name = "danfos_service_manual_2024_v1"
+
+    # Start embedding process
+    print("\nStarting embedding process...")
+    try:
+        embed_documents(documents, query_collection_name, incremental=True)
+        print("Successfully completed embedding process!")
+    except Exception as e:
+        print(f"Error during embedding: {str(e)}")
 
     # Calculate and print execution time
     execution_time = time.time() - start_time
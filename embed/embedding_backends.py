@@ -0,0 +1,123 @@
+import os
+import asyncio
+from typing import Any
+
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+from llama_index.embeddings.openai import OpenAIEmbedding
+
+OPENAI_EMBED_MODEL = "text-embedding-3-large"
+FASTEMBED_EMBED_MODEL = "BAAI/bge-base-en-v1.5"
+
+EMBED_BACKENDS = ("openai", "fastembed")
+
+
+class FastEmbedEmbedding(BaseEmbedding):
+    """
+    Local ONNX embedding model run on CPU through fastembed.
+
+    No network round trip per batch: documents are embedded in batches of
+    `embed_batch_size` with `threads` ONNX threads, and a query costs a few
+    milliseconds. Queries and passages go through fastembed's `query_embed` /
+    `passage_embed`, which add the prefixes models such as BGE or E5 expect.
+
+    Vectors from different models are not comparable, so a collection must be
+    queried with the backend and model it was ingested with.
+    """
+
+    threads: int | None = Field(default=None, description="ONNX Runtime threads (None = all cores)")
+    cache_dir: str | None = Field(default=None, description="Where downloaded models are stored")
+
+    _model: Any = PrivateAttr()
+
+    def __init__(self,
+                 model_name: str = FASTEMBED_EMBED_MODEL,
+                 threads: int | None = None,
+                 embed_batch_size: int = 64,
+                 cache_dir: str | None = None,
+                 **kwargs: Any) -> None:
+        super().__init__(model_name=model_name,
+                         threads=threads,
+                         embed_batch_size=embed_batch_size,
+                         cache_dir=cache_dir,
+                         **kwargs)
+        from fastembed import TextEmbedding
+
+        self._model = TextEmbedding(model_name=model_name, threads=threads, cache_dir=cache_dir)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "FastEmbedEmbedding"
+
+    def _get_query_embedding(self, query: str) -> list[float]:
+        return next(iter(self._model.query_embed([query]))).tolist()
+
+    def _get_text_embedding(self, text: str) -> list[float]:
+        return self._get_text_embeddings([text])[0]
+
+    def _get_text_embeddings(self, texts: list[str]) -> list[list[float]]:
+        return [vector.tolist() for vector in self._model.passage_embed(texts, batch_size=self.embed_batch_size)]
+
+    # ONNX Runtime releases the GIL, so threads keep the event loop free during inference
+    async def _aget_query_embedding(self, query: str) -> list[float]:
+        return await asyncio.to_thread(self._get_query_embedding, query)
+
+    async def _aget_text_embedding(self, text: str) -> list[float]:
+        return await asyncio.to_thread(self._get_text_embedding, text)
+
+    async def _aget_text_embeddings(self, texts: list[str]) -> list[list[float]]:
+        return await asyncio.to_thread(self._get_text_embeddings, texts)
+
+
+def build_embed_model(backend: str | None = None,
+                      model_name: str | None = None,
+                      threads: int | None = None,
+                      batch_size: int | None = None) -> BaseEmbedding:
+    """
+    Build the embedding model used both at ingestion and at query time.
+
+    Unset arguments fall back to the EMBED_BACKEND, EMBED_MODEL, EMBED_THREADS and
+    EMBED_BATCH_SIZE environment variables, then to OpenAI text-embedding-3-large.
+
+    Args:
+        backend (str | None): 'openai' or 'fastembed'
+        model_name (str | None): Model name for the backend
+        threads (int | None): CPU threads for local inference (fastembed only)
+        batch_size (int | None): Texts per inference / request batch
+
+    Returns:
+        BaseEmbedding: A LlamaIndex embedding model
+    """
+    backend = (backend or os.getenv('EMBED_BACKEND') or "openai").lower()
+    model_name = model_name or os.getenv('EMBED_MODEL')
+    if threads is None and os.getenv('EMBED_THREADS'):
+        threads = int(os.getenv('EMBED_THREADS'))
+    if batch_size is None and os.getenv('EMBED_BATCH_SIZE'):
+        batch_size = int(os.getenv('EMBED_BATCH_SIZE'))
+
+    if backend == "openai":
+        kwargs = {'embed_batch_size': batch_size} if batch_size else {}
+        return OpenAIEmbedding(
+            model=model_name or OPENAI_EMBED_MODEL,
+            api_key=os.getenv('OPENAI_API_KEY'),
+            **kwargs
+        )
+    if backend == "fastembed":
+        return FastEmbedEmbedding(
+            model_name=model_name or FASTEMBED_EMBED_MODEL,
+            threads=threads,
+            embed_batch_size=batch_size or 64,
+        )
+    raise ValueError(f"Unknown embedding backend '{backend}', expected one of {EMBED_BACKENDS}")
+
+
+def embed_backend_name(embed_model: BaseEmbedding) -> str:
+    """The build_embed_model backend name of a model instance."""
+    return "fastembed" if isinstance(embed_model, FastEmbedEmbedding) else "openai"
+
+
+def embed_model_id(embed_model: BaseEmbedding) -> str:
+    """Stable identifier of a model's vector space, e.g. for cache keys."""
+    if isinstance(embed_model, OpenAIEmbedding):
+        return embed_model.model_name
+    return f"{embed_model.class_name()}:{embed_model.model_name}"
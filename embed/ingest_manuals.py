@@ -0,0 +1,233 @@
+"""
+Ingest many parsed equipment manuals in parallel.
+
+Each manual is ingested in its own worker process, either into its own collection
+or into one shared collection where every point carries a 'manual_id' payload field.
+
+    python -m embed.ingest_manuals \\
+        --manual compressor=data/manuals/compressor.json:1-13 \\
+        --manual htf_pump=data/manuals/htf_pump.json \\
+        --manual evaporator_fan_motor=data/manuals/evaporator_fan_motor.json \\
+        --collection virfold_manuals_2024_v1 --workers 3
+
+or with a manifest file (`--manifest manuals.json`):
+
+    [
+        {"manual_id": "compressor", "json_path": "data/manuals/compressor.json", "skip_pages": "1-13"},
+        {"manual_id": "htf_pump", "json_path": "data/manuals/htf_pump.json", "collection": "htf_pump_2024_v1"}
+    ]
+"""
+
+import os
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from embed.embed_manual import create_documents_from_manual, embed_documents, build_local_index
+from embed.embedding_backends import EMBED_BACKENDS, build_embed_model
+from embed.quantization import QUANTIZATION_MODES
+
+DEFAULT_COLLECTION_TEMPLATE = "{manual_id}_service_manual_2024_v1"
+
+
+def parse_page_ranges(value) -> list[int]:
+    """
+    Parse page selections such as '1-13', '1-13,20,22-24' or a list of ints.
+    """
+    if not value:
+        return []
+    if isinstance(value, list):
+        return [int(page) for page in value]
+
+    pages = []
+    for part in str(value).split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '-' in part:
+            start, end = part.split('-', 1)
+            pages.extend(range(int(start), int(end) + 1))
+        else:
+            pages.append(int(part))
+    return pages
+
+
+def parse_manual_arg(value: str) -> dict:
+    """
+    Parse a --manual argument of the form ID=PATH[:SKIP_PAGES].
+    """
+    manual_id, sep, rest = value.partition('=')
+    if not sep or not manual_id or not rest:
+        raise argparse.ArgumentTypeError(f"Expected ID=PATH[:SKIP_PAGES], got '{value}'")
+
+    json_path, skip_pages = rest, None
+    head, sep, tail = rest.rpartition(':')
+    if sep and tail and all(c.isdigit() or c in ',-' for c in tail):
+        json_path, skip_pages = head, tail
+    return {'manual_id': manual_id, 'json_path': json_path, 'skip_pages': skip_pages}
+
+
+def load_manifest(manifest_path: str) -> list[dict]:
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manuals = json.load(f)
+    for manual in manuals:
+        if 'manual_id' not in manual or 'json_path' not in manual:
+            raise ValueError(f"Manifest entries need 'manual_id' and 'json_path': {manual}")
+    return manuals
+
+
+def ingest_manual(manual: dict) -> dict:
+    """
+    Ingest one manual; runs inside a worker process.
+
+    Args:
+        manual (dict): {'manual_id', 'json_path', 'collection', 'shared', 'skip_pages', 'incremental',
+            'embed_backend', 'embed_model', 'embed_threads', 'local_index_dir', 'quantization'}
+
+    Returns:
+        dict: Report row for the throughput summary
+    """
+    start = time.perf_counter()
+    report = {
+        'manual_id': manual['manual_id'],
+        'collection': manual['collection'],
+        'pages': 0,
+        'chunks': 0,
+        'upserted': 0,
+        'tokens': 0,
+        'seconds': 0.0,
+        'error': None,
+    }
+
+    try:
+        # in a shared collection the manual id separates the manuals' points
+        manual_id = manual['manual_id'] if manual['shared'] else None
+        documents = create_documents_from_manual(
+            manual['json_path'],
+            manual_id=manual_id,
+            skip_pages=parse_page_ranges(manual.get('skip_pages'))
+        )
+        # models are built in the worker: local ONNX sessions cannot be pickled across processes
+        embed_model = build_embed_model(manual.get('embed_backend'),
+                                        model_name=manual.get('embed_model'),
+                                        threads=manual.get('embed_threads'))
+        if manual.get('local_index_dir'):
+            stats = build_local_index(documents, os.path.join(manual['local_index_dir'], manual['collection']),
+                                      embed_model=embed_model)
+        else:
+            stats = embed_documents(documents, manual['collection'], incremental=manual['incremental'],
+                                    manual_id=manual_id, embed_model=embed_model,
+                                    quantization=manual.get('quantization'))
+        report.update({
+            'pages': stats['documents'],
+            'chunks': len(stats['node_ids']),
+            'upserted': stats['upserted'],
+            'tokens': stats['tokens'],
+        })
+    except Exception as e:
+        report['error'] = f"{e.__class__.__name__}: {e}"
+
+    report['seconds'] = time.perf_counter() - start
+    return report
+
+
+def print_report(reports: list[dict], wall_seconds: float) -> None:
+    header = f"{'manual':<24} {'collection':<36} {'pages':>6} {'chunks':>7} {'upserted':>8} " \
+             f"{'tokens':>10} {'seconds':>8} {'pages/s':>8} {'tokens/s':>9}"
+    print("\nIngestion report")
+    print(header)
+    print("-" * len(header))
+    for report in sorted(reports, key=lambda r: r['manual_id']):
+        if report['error']:
+            print(f"{report['manual_id']:<24} {report['collection']:<36} FAILED after "
+                  f"{report['seconds']:.1f}s: {report['error']}")
+            continue
+        seconds = report['seconds'] or 1e-9
+        print(f"{report['manual_id']:<24} {report['collection']:<36} {report['pages']:>6} {report['chunks']:>7} "
+              f"{report['upserted']:>8} {report['tokens']:>10} {report['seconds']:>8.1f} "
+              f"{report['pages'] / seconds:>8.2f} {report['tokens'] / seconds:>9.0f}")
+
+    succeeded = [report for report in reports if not report['error']]
+    total_pages = sum(report['pages'] for report in succeeded)
+    total_tokens = sum(report['tokens'] for report in succeeded)
+    print("-" * len(header))
+    print(f"{len(succeeded)}/{len(reports)} manuals, {total_pages} pages, {total_tokens} tokens in "
+          f"{wall_seconds:.1f}s wall ({total_pages / wall_seconds:.2f} pages/s, "
+          f"{total_tokens / wall_seconds:.0f} tokens/s)")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Ingest parsed equipment manuals into Qdrant.")
+    parser.add_argument('--manual', action='append', type=parse_manual_arg, default=[],
+                        help="Manual to ingest as ID=PATH[:SKIP_PAGES], e.g. compressor=compressor.json:1-13")
+    parser.add_argument('--manifest', help="JSON list of {manual_id, json_path, [collection], [skip_pages]}")
+    parser.add_argument('--collection',
+                        help="Shared collection for every manual; points are tagged with a 'manual_id' payload field")
+    parser.add_argument('--collection-template', default=DEFAULT_COLLECTION_TEMPLATE,
+                        help="Per-manual collection name when --collection is not given")
+    parser.add_argument('--skip-pages', default=None,
+                        help="Default pages to skip for manuals that do not set their own, e.g. '1-13'")
+    parser.add_argument('--workers', type=int, default=min(4, os.cpu_count() or 1),
+                        help="Number of manuals ingested in parallel")
+    parser.add_argument('--embed-backend', choices=EMBED_BACKENDS, default=None,
+                        help="Embedding backend (default: EMBED_BACKEND or openai); queries must use the same one")
+    parser.add_argument('--embed-model', default=None, help="Embedding model name for the backend")
+    parser.add_argument('--embed-threads', type=int, default=None,
+                        help="CPU threads per worker for local embedding (default: cores / workers)")
+    parser.add_argument('--local-index-dir', default=None,
+                        help="Write offline indexes to DIR/<collection> instead of Qdrant (served via LOCAL_INDEX_DIR)")
+    parser.add_argument('--quantization', choices=QUANTIZATION_MODES, default=None,
+                        help="Store quantized dense vectors in RAM (originals on disk) and report the recall trade-off")
+    parser.add_argument('--full-rebuild', action='store_true',
+                        help="Re-embed everything instead of syncing only new or changed pages")
+    args = parser.parse_args(argv)
+
+    manuals = list(args.manual)
+    if args.manifest:
+        manuals.extend(load_manifest(args.manifest))
+    if not manuals:
+        parser.error("Give at least one --manual or a --manifest")
+    if args.local_index_dir and args.collection:
+        parser.error("Local indexes are built per manual; use --collection-template instead of --collection")
+
+    workers = max(1, args.workers)
+    embed_threads = args.embed_threads or max(1, (os.cpu_count() or 1) // min(workers, len(manuals)))
+
+    seen = set()
+    for manual in manuals:
+        if manual['manual_id'] in seen:
+            parser.error(f"Duplicate manual id '{manual['manual_id']}'")
+        seen.add(manual['manual_id'])
+
+        shared = args.collection is not None and not manual.get('collection')
+        manual['shared'] = shared
+        manual['collection'] = args.collection if shared else \
+            manual.get('collection') or args.collection_template.format(manual_id=manual['manual_id'])
+        if manual.get('skip_pages') is None:
+            manual['skip_pages'] = args.skip_pages
+        manual['incremental'] = not args.full_rebuild
+        manual['embed_backend'] = args.embed_backend
+        manual['embed_model'] = args.embed_model
+        manual['embed_threads'] = embed_threads
+        manual['local_index_dir'] = args.local_index_dir
+        manual['quantization'] = args.quantization
+
+    print(f"Ingesting {len(manuals)} manuals with {workers} workers")
+    start = time.perf_counter()
+    reports = []
+    # separate processes: chunking, tokenization and sparse encoding are CPU bound
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(ingest_manual, manual): manual['manual_id'] for manual in manuals}
+        for future in as_completed(futures):
+            report = future.result()
+            status = "failed" if report['error'] else "done"
+            print(f"Manual {report['manual_id']} {status} in {report['seconds']:.1f}s")
+            reports.append(report)
+
+    print_report(reports, time.perf_counter() - start)
+    return 1 if any(report['error'] for report in reports) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
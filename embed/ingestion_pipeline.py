@@ -0,0 +1,301 @@
+import os
+import re
+import time
+import random
+import asyncio
+
+import tiktoken
+from openai import AsyncOpenAI, RateLimitError, APIConnectionError, APITimeoutError, InternalServerError
+
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.schema import MetadataMode
+from llama_index.vector_stores.qdrant import QdrantVectorStore
+from llama_index.embeddings.openai import OpenAIEmbedding
+
+from qdrant_client import QdrantClient
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_SECONDS = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+
+# OpenAI embeddings accept at most 2048 inputs and 300k tokens per request
+MAX_INPUTS_PER_REQUEST = 2048
+MAX_TOKENS_PER_REQUEST = 300_000
+
+_END = object()
+
+
+def parse_duration(value: str | None) -> float | None:
+    """
+    Parse OpenAI rate-limit durations such as '20ms', '1s' or '6m0s' into seconds.
+    """
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_SECONDS[unit] for amount, unit in parts)
+
+
+class ProviderRateLimiter:
+    """
+    Client-side limiter driven by the provider's own rate-limit headers.
+
+    Every response updates the remaining request/token budget and the time until it
+    resets (`x-ratelimit-*` headers). Callers reserve tokens before sending a batch
+    and wait for the reset only when the budget would be exceeded, instead of
+    sleeping a fixed interval. 429 responses back off for exactly `retry-after` when
+    the provider sends it.
+    """
+
+    def __init__(self) -> None:
+        self.remaining_requests = None
+        self.remaining_tokens = None
+        self.requests_reset_at = 0.0
+        self.tokens_reset_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens: int) -> None:
+        async with self._lock:
+            now = time.monotonic()
+            wait = 0.0
+            if self.remaining_requests is not None and self.remaining_requests < 1:
+                wait = max(wait, self.requests_reset_at - now)
+            if self.remaining_tokens is not None and self.remaining_tokens < tokens:
+                wait = max(wait, self.tokens_reset_at - now)
+            if wait > 0:
+                print(f"Provider budget exhausted, waiting {wait:.1f}s for the rate-limit window to reset")
+                await asyncio.sleep(wait)
+                # the window has reset; the next response will report the real budget
+                self.remaining_requests = None
+                self.remaining_tokens = None
+
+            # optimistically reserve the budget for this request
+            if self.remaining_requests is not None:
+                self.remaining_requests -= 1
+            if self.remaining_tokens is not None:
+                self.remaining_tokens -= tokens
+
+    def update(self, headers) -> None:
+        now = time.monotonic()
+        remaining_requests = headers.get('x-ratelimit-remaining-requests')
+        remaining_tokens = headers.get('x-ratelimit-remaining-tokens')
+        if remaining_requests is not None:
+            self.remaining_requests = int(remaining_requests)
+            self.requests_reset_at = now + (parse_duration(headers.get('x-ratelimit-reset-requests')) or 0.0)
+        if remaining_tokens is not None:
+            self.remaining_tokens = int(remaining_tokens)
+            self.tokens_reset_at = now + (parse_duration(headers.get('x-ratelimit-reset-tokens')) or 0.0)
+
+    def backoff_delay(self, headers, attempt: int) -> float:
+        """Seconds to wait after a 429: the provider's retry-after if given, else jittered exponential."""
+        if headers is not None:
+            retry_after_ms = headers.get('retry-after-ms')
+            if retry_after_ms:
+                return float(retry_after_ms) / 1000
+            for header in ('retry-after', 'x-ratelimit-reset-tokens', 'x-ratelimit-reset-requests'):
+                delay = parse_duration(headers.get(header))
+                if delay:
+                    return delay
+        return min(60.0, 2 ** attempt) * (0.5 + random.random())
+
+
+class ManualIngestionPipeline:
+    """
+    Pipelined chunk -> embed -> upsert ingestion into a Qdrant collection.
+
+    The three stages run concurrently and are connected by bounded queues, so
+    chunking of later pages, embedding requests and Qdrant upserts overlap while
+    memory stays bounded. Embedding batches are packed by token count (up to
+    `max_batch_tokens`) rather than by document count, and their pacing follows the
+    provider's rate-limit headers.
+
+    `embed_model` selects the backend (see embed.embedding_backends). OpenAI models
+    are called through the raw client so the rate-limit headers are visible; any
+    other LlamaIndex embedding model, e.g. a local fastembed one, is called
+    directly with the same batches.
+
+    Nodes are written to a hybrid QdrantVectorStore on `client` unless another
+    `vector_store` (anything with an `add(nodes)` method, such as a local index
+    writer) is given.
+    """
+
+    def __init__(self,
+                 collection_name: str,
+                 client: QdrantClient | None,
+                 embed_model_name: str = "text-embedding-3-large",
+                 chunk_size: int = 4096,
+                 chunk_overlap: int = 512,
+                 id_func=None,
+                 embed_model: BaseEmbedding | None = None,
+                 vector_store=None,
+                 max_batch_tokens: int = 100_000,
+                 max_batch_inputs: int = 512,
+                 embed_concurrency: int = 4,
+                 upsert_concurrency: int = 2,
+                 queue_size: int = 8,
+                 max_retries: int = 8) -> None:
+        self.collection_name = collection_name
+        if isinstance(embed_model, OpenAIEmbedding):
+            embed_model_name, embed_model = embed_model.model_name, None
+        self.embed_model = embed_model
+        self.embed_model_name = embed_model.model_name if embed_model is not None else embed_model_name
+        self.max_batch_tokens = min(max_batch_tokens, MAX_TOKENS_PER_REQUEST)
+        self.max_batch_inputs = min(max_batch_inputs, MAX_INPUTS_PER_REQUEST)
+        # a local model already uses every core it is given; parallel batches only contend
+        self.embed_concurrency = embed_concurrency if embed_model is None else 1
+        self.upsert_concurrency = upsert_concurrency
+        self.queue_size = queue_size
+        self.max_retries = max_retries
+
+        splitter_kwargs = {'id_func': id_func} if id_func is not None else {}
+        self.splitter = SentenceSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap, **splitter_kwargs)
+        try:
+            self.tokenizer = tiktoken.encoding_for_model(self.embed_model_name)
+        except KeyError:
+            # non-OpenAI models: tokens only size the batches and the report
+            self.tokenizer = tiktoken.get_encoding("cl100k_base")
+
+        if embed_model is None:
+            self.openai_client = AsyncOpenAI(api_key=os.getenv('OPENAI_API_KEY'), max_retries=0)
+            self.rate_limiter = ProviderRateLimiter()
+
+        if vector_store is None:
+            vector_store = QdrantVectorStore(
+                collection_name,
+                client=client,
+                enable_hybrid=True,
+                batch_size=64
+            )
+        self.vector_store = vector_store
+
+    async def _chunk_stage(self, documents, skip_ids, embed_queue: asyncio.Queue, stats: dict) -> None:
+        batch, batch_tokens = [], 0
+        # documents usually stream parsed manual pages from JSON (embed.manual_stream),
+        # so advance the generator off the event loop
+        documents = iter(documents)
+        while (document := await asyncio.to_thread(next, documents, _END)) is not _END:
+            stats['documents'] += 1
+            nodes = await asyncio.to_thread(self.splitter.get_nodes_from_documents, [document])
+            for node in nodes:
+                stats['node_ids'].add(node.node_id)
+                if node.node_id in skip_ids:
+                    stats['skipped'] += 1
+                    continue
+
+                text = node.get_content(metadata_mode=MetadataMode.EMBED)
+                tokens = len(self.tokenizer.encode(text, disallowed_special=()))
+                if batch and (batch_tokens + tokens > self.max_batch_tokens or len(batch) >= self.max_batch_inputs):
+                    await embed_queue.put((batch, batch_tokens))
+                    batch, batch_tokens = [], 0
+                batch.append((node, text))
+                batch_tokens += tokens
+
+        if batch:
+            await embed_queue.put((batch, batch_tokens))
+        for _ in range(self.embed_concurrency):
+            await embed_queue.put(None)
+
+    async def _embed_batch(self, texts: list[str], tokens: int) -> list[list[float]]:
+        if self.embed_model is not None:
+            # the whole batch in one call: aget_text_embedding_batch would run its sub-batches concurrently
+            return await self.embed_model._aget_text_embeddings(texts)
+
+        for attempt in range(self.max_retries):
+            await self.rate_limiter.acquire(tokens)
+            try:
+                response = await self.openai_client.embeddings.with_raw_response.create(
+                    model=self.embed_model_name,
+                    input=texts
+                )
+            except RateLimitError as e:
+                delay = self.rate_limiter.backoff_delay(e.response.headers, attempt)
+                print(f"Rate limit hit. Waiting {delay:.1f} seconds before retry...")
+                await asyncio.sleep(delay)
+                continue
+            except (APIConnectionError, APITimeoutError, InternalServerError) as e:
+                delay = self.rate_limiter.backoff_delay(None, attempt)
+                print(f"Embedding request failed ({e.__class__.__name__}). Retrying in {delay:.1f} seconds...")
+                await asyncio.sleep(delay)
+                continue
+
+            self.rate_limiter.update(response.headers)
+            result = response.parse()
+            return [item.embedding for item in sorted(result.data, key=lambda item: item.index)]
+
+        raise RuntimeError(f"Failed to embed batch after {self.max_retries} attempts")
+
+    async def _embed_worker(self, embed_queue: asyncio.Queue, upsert_queue: asyncio.Queue, stats: dict) -> None:
+        while True:
+            item = await embed_queue.get()
+            if item is None:
+                return
+
+            batch, batch_tokens = item
+            embeddings = await self._embed_batch([text for _, text in batch], batch_tokens)
+            nodes = []
+            for (node, _), embedding in zip(batch, embeddings):
+                node.embedding = embedding
+                nodes.append(node)
+
+            stats['embed_batches'] += 1
+            stats['tokens'] += batch_tokens
+            await upsert_queue.put(nodes)
+
+    async def _upsert_worker(self, upsert_queue: asyncio.Queue, stats: dict) -> None:
+        while True:
+            nodes = await upsert_queue.get()
+            if nodes is None:
+                return
+
+            # sparse encoding and the upload are blocking, keep them off the event loop
+            await asyncio.to_thread(self.vector_store.add, nodes)
+            stats['upserted'] += len(nodes)
+            print(f"Upserted {stats['upserted']} chunks into {self.collection_name}")
+
+    async def arun(self, documents, skip_ids=frozenset()) -> dict:
+        """
+        Ingest documents, skipping chunks whose ids are already indexed.
+
+        Args:
+            documents (Iterable[Document]): Page documents to ingest
+            skip_ids (set[str]): Chunk ids to leave untouched (incremental mode)
+
+        Returns:
+            dict: Ingestion stats, including 'node_ids' of every chunk produced
+        """
+        stats = {
+            'node_ids': set(),
+            'documents': 0,
+            'skipped': 0,
+            'upserted': 0,
+            'embed_batches': 0,
+            'tokens': 0,
+        }
+        start = time.perf_counter()
+
+        embed_queue = asyncio.Queue(maxsize=self.queue_size)
+        upsert_queue = asyncio.Queue(maxsize=self.queue_size)
+
+        # any failing stage cancels the others via the task group
+        async with asyncio.TaskGroup() as group:
+            for _ in range(self.upsert_concurrency):
+                group.create_task(self._upsert_worker(upsert_queue, stats))
+            group.create_task(self._chunk_stage(documents, skip_ids, embed_queue, stats))
+            embedders = [group.create_task(self._embed_worker(embed_queue, upsert_queue, stats))
+                         for _ in range(self.embed_concurrency)]
+
+            await asyncio.gather(*embedders)
+            for _ in range(self.upsert_concurrency):
+                await upsert_queue.put(None)
+
+        stats['seconds'] = time.perf_counter() - start
+        return stats
+
+    def run(self, documents, skip_ids=frozenset()) -> dict:
+        """Synchronous wrapper around `arun`."""
+        return asyncio.run(self.arun(documents, skip_ids=skip_ids))
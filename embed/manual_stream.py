@@ -0,0 +1,139 @@
+import json
+from json.decoder import scanstring
+
+_WHITESPACE = " \t\n\r"
+
+
+class JsonStream:
+    """
+    Minimal pull parser over a JSON text file.
+
+    Structural characters and object keys are consumed one at a time; whole values
+    are decoded with the stdlib decoder only when asked for, so only the value being
+    decoded (e.g. a single page) is ever held in memory.
+    """
+
+    def __init__(self, f, read_size: int = 1 << 16) -> None:
+        self._f = f
+        self._read_size = read_size
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+        self._decoder = json.JSONDecoder()
+
+    def _fill(self, min_size: int = 0) -> bool:
+        if self._eof:
+            return False
+        chunk = self._f.read(max(self._read_size, min_size))
+        if not chunk:
+            self._eof = True
+            return False
+        self._buf = self._buf[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Return the next non-whitespace character without consuming it ('' at EOF)."""
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                return ""
+
+    def next(self) -> str:
+        """Consume and return the next non-whitespace character."""
+        char = self.peek()
+        self._pos += 1
+        return char
+
+    def expect(self, char: str) -> None:
+        found = self.next()
+        if found != char:
+            raise ValueError(f"Expected '{char}' in JSON stream, found '{found}'")
+
+    def read_string(self) -> str:
+        self.expect('"')
+        while True:
+            try:
+                value, end = scanstring(self._buf, self._pos)
+                self._pos = end
+                return value
+            except json.JSONDecodeError:
+                # unterminated string: keep the opening quote position and read more
+                self._pos -= 1
+                if not self._fill(min_size=len(self._buf)):
+                    raise
+                self._pos += 1
+
+    def read_value(self):
+        """Decode the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+                # a value ending exactly at the buffer edge may be a truncated number
+                if end < len(self._buf) or self._eof or not self._fill(min_size=len(self._buf)):
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError:
+                # grow reads geometrically so large values stay linear overall
+                if not self._fill(min_size=len(self._buf)):
+                    raise
+
+
+def iter_raw_pages(f):
+    """
+    Yield the page objects of the first document in a LlamaParse JSON result, one at a time.
+
+    The expected layout is `[{"pages": [{...}, {...}], ...}, ...]`; other keys of the
+    document are skipped and later documents are ignored.
+    """
+    stream = JsonStream(f)
+    if stream.next() != '[' or stream.peek() == ']':
+        return
+    stream.expect('{')
+    if stream.peek() == '}':
+        return
+
+    while True:
+        key = stream.read_string()
+        stream.expect(':')
+        if key == 'pages':
+            stream.expect('[')
+            if stream.peek() == ']':
+                stream.next()
+            else:
+                while True:
+                    yield stream.read_value()
+                    if stream.next() == ']':
+                        break
+        else:
+            stream.read_value()
+
+        if stream.next() == '}':
+            return
+
+
+def iter_manual_pages(json_path):
+    """
+    Stream the pages of a parsed manual, keeping only the fields ingestion needs.
+
+    Args:
+        json_path (str): Path to the JSON file containing manual data
+
+    Yields:
+        dict: {'page_number', 'markdown', 'image_paths', 'links'} for each page
+    """
+    with open(json_path, 'r', encoding='utf-8') as f:
+        for page in iter_raw_pages(f):
+            page_number = page.get('page')
+            if page_number is None:
+                continue
+            yield {
+                'page_number': page_number,
+                'markdown': page.get('md', ''),
+                'image_paths': [image['path'] for image in page.get('images', []) if image.get('type') != 'full_page_screenshot'],
+                'links': page.get('links', []),
+            }
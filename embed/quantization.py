@@ -0,0 +1,181 @@
+import time
+
+import numpy as np
+
+from llama_index.vector_stores.qdrant.base import DENSE_VECTOR_NAME
+
+from qdrant_client import QdrantClient
+from qdrant_client.http import models as qdrant_models
+
+QUANTIZATION_MODES = ("scalar", "binary")
+
+# bytes per dimension of the stored representation
+_BYTES_PER_DIM = {None: 4.0, 'scalar': 1.0, 'binary': 1 / 8}
+
+
+def build_quantization_config(mode: str):
+    """
+    Qdrant quantization config for the dense vectors.
+
+    'scalar' stores int8 codes (4x smaller); 'binary' stores one bit per dimension
+    (32x smaller), which works well for high-dimensional OpenAI embeddings when
+    results are rescored. Quantized codes are kept in RAM, originals may live on disk.
+    """
+    if mode == "scalar":
+        return qdrant_models.ScalarQuantization(
+            scalar=qdrant_models.ScalarQuantizationConfig(
+                type=qdrant_models.ScalarType.INT8,
+                quantile=0.99,
+                always_ram=True
+            )
+        )
+    if mode == "binary":
+        return qdrant_models.BinaryQuantization(
+            binary=qdrant_models.BinaryQuantizationConfig(always_ram=True)
+        )
+    raise ValueError(f"Unknown quantization '{mode}', expected one of {QUANTIZATION_MODES}")
+
+
+def quantized_search_params(oversampling: float = 2.0, rescore: bool = True) -> qdrant_models.SearchParams:
+    """
+    Search on the quantized codes, fetching `oversampling` x limit candidates and
+    rescoring them with the full-precision vectors.
+    """
+    return qdrant_models.SearchParams(
+        quantization=qdrant_models.QuantizationSearchParams(
+            ignore=False,
+            rescore=rescore,
+            oversampling=oversampling
+        )
+    )
+
+
+def apply_quantization(client: QdrantClient, collection_name: str, mode: str, on_disk: bool = True) -> None:
+    """
+    Enable quantization of the collection's dense vectors (idempotent).
+
+    Args:
+        client (QdrantClient): Qdrant client
+        collection_name (str): Collection written by embed_documents
+        mode (str): 'scalar' or 'binary'
+        on_disk (bool): Move the full-precision vectors to disk; only the quantized
+            codes stay in RAM and rescoring reads the few oversampled candidates
+    """
+    client.update_collection(
+        collection_name=collection_name,
+        vectors_config={
+            DENSE_VECTOR_NAME: qdrant_models.VectorParamsDiff(
+                quantization_config=build_quantization_config(mode),
+                on_disk=on_disk
+            )
+        }
+    )
+
+
+def wait_for_optimizer(client: QdrantClient, collection_name: str, timeout: float = 600.0) -> bool:
+    """Wait until Qdrant has finished (re)building segments, e.g. the quantized codes."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = client.get_collection(collection_name=collection_name).status
+        if status == qdrant_models.CollectionStatus.GREEN:
+            return True
+        time.sleep(1.0)
+    return False
+
+
+def _search_ids(client: QdrantClient, collection_name: str, vector, top_k: int, params,
+                exclude_id=None) -> tuple[list, float]:
+    # the sample query is itself a stored vector: leave it out so it cannot trivially match itself
+    query_filter = None
+    if exclude_id is not None:
+        query_filter = qdrant_models.Filter(must_not=[qdrant_models.HasIdCondition(has_id=[exclude_id])])
+    start = time.perf_counter()
+    response = client.query_points(
+        collection_name=collection_name,
+        query=vector,
+        using=DENSE_VECTOR_NAME,
+        query_filter=query_filter,
+        limit=top_k,
+        search_params=params,
+        with_payload=False
+    )
+    return [point.id for point in response.points], (time.perf_counter() - start) * 1000
+
+
+def quantization_report(client: QdrantClient,
+                        collection_name: str,
+                        mode: str | None,
+                        top_k: int = 10,
+                        samples: int = 50,
+                        oversampling: tuple = (1.0, 2.0, 4.0)) -> dict:
+    """
+    Measure the recall/latency/memory trade-off of the collection's quantization.
+
+    Stored chunk vectors are used as sample queries, each excluded from its own
+    results. Exact full-precision search (quantization ignored) is the ground truth;
+    quantized search is measured without rescoring and with rescoring at each
+    oversampling factor. Qdrant only quantizes optimized segments,
+    so on very small collections every mode may behave like exact search.
+
+    Returns:
+        dict: {'memory': {...}, 'modes': {name: {'recall', 'mean_ms', 'p95_ms'}}}
+    """
+    points, _ = client.scroll(
+        collection_name=collection_name,
+        limit=samples,
+        with_payload=False,
+        with_vectors=[DENSE_VECTOR_NAME]
+    )
+    queries = [(point.id, point.vector[DENSE_VECTOR_NAME]) for point in points if point.vector]
+    count = client.count(collection_name=collection_name, exact=True).count
+    dim = len(queries[0][1]) if queries else 0
+
+    full_bytes = count * dim * _BYTES_PER_DIM[None]
+    ram_bytes = count * dim * _BYTES_PER_DIM[mode]
+    report = {
+        'memory': {
+            'points': count,
+            'dim': dim,
+            'full_precision_mib': full_bytes / 2**20,
+            'ram_vectors_mib': ram_bytes / 2**20,
+            'ratio': full_bytes / ram_bytes if ram_bytes else 1.0,
+        },
+        'modes': {},
+    }
+
+    # without ignore=True, exact search still scores the quantized codes
+    modes = {'exact': qdrant_models.SearchParams(
+        exact=True,
+        quantization=qdrant_models.QuantizationSearchParams(ignore=True)
+    )}
+    if mode is not None:
+        modes['quantized'] = quantized_search_params(oversampling=1.0, rescore=False)
+        for factor in oversampling:
+            modes[f'rescore_x{factor:g}'] = quantized_search_params(oversampling=factor, rescore=True)
+
+    truth = {}
+    for name, params in modes.items():
+        recalls, latencies = [], []
+        for i, (point_id, vector) in enumerate(queries):
+            ids, elapsed_ms = _search_ids(client, collection_name, vector, top_k, params, exclude_id=point_id)
+            latencies.append(elapsed_ms)
+            if name == 'exact':
+                truth[i] = set(ids)
+            recalls.append(len(truth[i] & set(ids)) / max(1, len(truth[i])))
+        latencies.sort()
+        report['modes'][name] = {
+            'recall': float(np.mean(recalls)) if recalls else 0.0,
+            'mean_ms': float(np.mean(latencies)) if latencies else 0.0,
+            'p95_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else 0.0,
+        }
+    return report
+
+
+def print_quantization_report(collection_name: str, mode: str | None, report: dict, top_k: int = 10) -> None:
+    memory = report['memory']
+    print(f"\nQuantization report for {collection_name} ({mode or 'none'}): {memory['points']} x {memory['dim']} vectors, "
+          f"{memory['full_precision_mib']:.1f} MiB full precision -> {memory['ram_vectors_mib']:.1f} MiB in RAM "
+          f"({memory['ratio']:.0f}x)")
+    print(f"{'mode':<14} {'recall@' + str(top_k):>10} {'mean ms':>9} {'p95 ms':>9}")
+    for name, stats in report['modes'].items():
+        print(f"{name:<14} {stats['recall']:>10.3f} {stats['mean_ms']:>9.1f} {stats['p95_ms']:>9.1f}")
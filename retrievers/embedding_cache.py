@@ -0,0 +1,145 @@
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+def normalize_query(query: str) -> str:
+    """Case-fold and collapse whitespace so trivially different phrasings share a cache entry."""
+    return re.sub(r"\s+", " ", query).strip().casefold()
+
+
+class QueryEmbeddingCache:
+    """
+    Bounded query-embedding cache keyed by (embedding model, normalized query).
+
+    The in-memory tier is an LRU with a TTL. An optional SQLite file acts as a
+    second tier so embeddings survive process restarts; entries found on disk are
+    promoted back into memory.
+    """
+
+    def __init__(self,
+                 max_entries: int = 4096,
+                 ttl_seconds: float = 7 * 24 * 3600,
+                 disk_path: str | None = None) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_path = disk_path
+
+        self._entries = OrderedDict()  # key -> (created_at, embedding)
+        self._lock = threading.Lock()
+        self._counters = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'expirations': 0,
+        }
+
+        self._db = None
+        if disk_path:
+            self._db = sqlite3.connect(disk_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS query_embeddings ("
+                "key TEXT PRIMARY KEY, created_at REAL NOT NULL, embedding BLOB NOT NULL)"
+            )
+            self._db.execute("DELETE FROM query_embeddings WHERE created_at < ?",
+                             (time.time() - ttl_seconds,))
+            self._db.commit()
+
+    @staticmethod
+    def make_key(query: str, model_name: str) -> str:
+        return hashlib.sha256(f"{model_name}\x00{normalize_query(query)}".encode('utf-8')).hexdigest()
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return now - created_at > self.ttl_seconds
+
+    def get(self, query: str, model_name: str) -> list[float] | None:
+        """
+        Look up a cached embedding.
+
+        Args:
+            query (str): Raw query text
+            model_name (str): Embedding model that produced the vector
+
+        Returns:
+            list[float] | None: The embedding, or None on a miss
+        """
+        key = self.make_key(query, model_name)
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                created_at, embedding = entry
+                if not self._expired(created_at, now):
+                    self._entries.move_to_end(key)
+                    self._counters['memory_hits'] += 1
+                    return embedding
+                del self._entries[key]
+                self._counters['expirations'] += 1
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT created_at, embedding FROM query_embeddings WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and not self._expired(row[0], now):
+                    embedding = np.frombuffer(row[1], dtype=np.float32).tolist()
+                    self._insert(key, row[0], embedding)
+                    self._counters['disk_hits'] += 1
+                    return embedding
+
+            self._counters['misses'] += 1
+            return None
+
+    def put(self, query: str, model_name: str, embedding: list[float]) -> None:
+        """
+        Store an embedding in memory and, if configured, on disk.
+
+        Args:
+            query (str): Raw query text
+            model_name (str): Embedding model that produced the vector
+            embedding (list[float]): The query embedding
+        """
+        key = self.make_key(query, model_name)
+        created_at = time.time()
+
+        with self._lock:
+            self._insert(key, created_at, embedding)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO query_embeddings (key, created_at, embedding) VALUES (?, ?, ?)",
+                    (key, created_at, np.asarray(embedding, dtype=np.float32).tobytes()),
+                )
+                self._db.commit()
+
+    def _insert(self, key: str, created_at: float, embedding: list[float]) -> None:
+        self._entries[key] = (created_at, embedding)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._counters['evictions'] += 1
+
+    def clear(self) -> None:
+        """Drop every cached embedding, including the disk tier."""
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM query_embeddings")
+                self._db.commit()
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            dict: Hit/miss/eviction counters, current size and hit rate
+        """
+        with self._lock:
+            stats = dict(self._counters)
+            stats['size'] = len(self._entries)
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['memory_hits'] + stats['disk_hits']) / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,111 @@
+from typing import Any
+
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.vector_stores.types import VectorStoreQuery, VectorStoreQueryMode, VectorStoreQueryResult
+from llama_index.vector_stores.qdrant import QdrantVectorStore
+from llama_index.vector_stores.qdrant.base import DENSE_VECTOR_NAME
+from llama_index.vector_stores.qdrant.utils import relative_score_fusion
+
+from qdrant_client.http import models as qdrant_models
+
+# k in 1 / (k + rank); 60 is the usual constant from the original RRF paper
+RRF_K = 60
+
+
+def reciprocal_rank_fusion(dense_result: VectorStoreQueryResult,
+                           sparse_result: VectorStoreQueryResult,
+                           alpha: float = 0.5,
+                           top_k: int = 2,
+                           k: int = RRF_K) -> VectorStoreQueryResult:
+    """
+    Fuse dense and sparse results by (weighted) reciprocal rank.
+
+    Only ranks are used, so the very different scales of cosine and SPLADE scores
+    do not matter. `alpha` weights the dense ranking and `1 - alpha` the sparse one,
+    as in relative score fusion (0.5 = plain RRF).
+
+    Returns:
+        VectorStoreQueryResult: The `top_k` fused nodes, scored by their RRF score
+    """
+    scores, nodes = {}, {}
+    for weight, result in ((alpha, dense_result), (1 - alpha, sparse_result)):
+        if not result.nodes:
+            continue
+        ranked = sorted(zip(result.similarities, result.nodes), key=lambda pair: pair[0], reverse=True)
+        for rank, (_, node) in enumerate(ranked, start=1):
+            nodes.setdefault(node.node_id, node)
+            scores[node.node_id] = scores.get(node.node_id, 0.0) + weight / (k + rank)
+
+    if not scores:
+        return VectorStoreQueryResult(nodes=None, similarities=None, ids=None)
+
+    top_ids = sorted(scores, key=scores.get, reverse=True)[:top_k]
+    return VectorStoreQueryResult(
+        nodes=[nodes[node_id] for node_id in top_ids],
+        similarities=[scores[node_id] for node_id in top_ids],
+        ids=top_ids,
+    )
+
+
+HYBRID_FUSIONS = {
+    'rrf': reciprocal_rank_fusion,
+    'alpha': relative_score_fusion,
+}
+
+
+class HybridQdrantVectorStore(QdrantVectorStore):
+    """
+    QdrantVectorStore that resolves the collection's sparse vector name once.
+
+    The stock store looks the name up (collection exists + get collection, two
+    round trips) on every hybrid query; the name never changes for a collection.
+
+    `search_params` (e.g. quantized search with oversampling and rescoring, see
+    embed.quantization) are applied to dense queries, which the stock store has no
+    way to pass; hybrid queries use the collection defaults.
+    """
+
+    _sparse_name: str | None = PrivateAttr(default=None)
+    _search_params: qdrant_models.SearchParams | None = PrivateAttr(default=None)
+
+    def __init__(self, *args: Any, search_params: qdrant_models.SearchParams | None = None, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self._search_params = search_params
+
+    def sparse_vector_name(self) -> str:
+        if self._sparse_name is None:
+            self._sparse_name = super().sparse_vector_name()
+        return self._sparse_name
+
+    async def asparse_vector_name(self) -> str:
+        if self._sparse_name is None:
+            self._sparse_name = await super().asparse_vector_name()
+        return self._sparse_name
+
+    def _dense_request(self, query: VectorStoreQuery, **kwargs: Any) -> qdrant_models.SearchRequest:
+        query_filter = kwargs.get("qdrant_filters") or self._build_query_filter(query)
+        return qdrant_models.SearchRequest(
+            vector=qdrant_models.NamedVector(name=DENSE_VECTOR_NAME, vector=query.query_embedding),
+            limit=query.similarity_top_k,
+            filter=query_filter,
+            params=self._search_params,
+            with_payload=True,
+        )
+
+    def _uses_search_params(self, query: VectorStoreQuery) -> bool:
+        return (self._search_params is not None and self.enable_hybrid
+                and query.mode == VectorStoreQueryMode.DEFAULT)
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        if not self._uses_search_params(query):
+            return super().query(query, **kwargs)
+        response = self._client.search_batch(collection_name=self.collection_name,
+                                             requests=[self._dense_request(query, **kwargs)])
+        return self.parse_to_query_result(response[0])
+
+    async def aquery(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        if not self._uses_search_params(query):
+            return await super().aquery(query, **kwargs)
+        response = await self._aclient.search_batch(collection_name=self.collection_name,
+                                                    requests=[self._dense_request(query, **kwargs)])
+        return self.parse_to_query_result(response[0])
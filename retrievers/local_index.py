@@ -0,0 +1,224 @@
+import os
+import json
+import threading
+
+import numpy as np
+
+from llama_index.core.retrievers import BaseRetriever
+from llama_index.core.schema import BaseNode, NodeWithScore, QueryBundle, TextNode
+
+VECTORS_FILE = "vectors.npy"
+CENTROIDS_FILE = "ivf_centroids.npy"
+OFFSETS_FILE = "ivf_offsets.npy"
+NODES_FILE = "nodes.jsonl"
+MANIFEST_FILE = "manifest.json"
+
+# below this many chunks a single list (exact search) is both faster and exact
+MIN_VECTORS_FOR_IVF = 4096
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def spherical_kmeans(vectors: np.ndarray, n_lists: int, iterations: int = 15, seed: int = 0,
+                     max_training_points: int = 256) -> np.ndarray:
+    """
+    Cluster unit vectors by cosine similarity.
+
+    Args:
+        vectors (np.ndarray): (n, dim) unit-normalized float32 vectors
+        n_lists (int): Number of clusters
+        iterations (int): Lloyd iterations
+        seed (int): RNG seed, so rebuilding the same manual gives the same index
+        max_training_points (int): Points sampled per cluster for training
+
+    Returns:
+        np.ndarray: (n_lists, dim) unit-normalized centroids
+    """
+    rng = np.random.default_rng(seed)
+    sample_size = min(len(vectors), n_lists * max_training_points)
+    sample = vectors[rng.choice(len(vectors), size=sample_size, replace=False)]
+    centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignments = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, sample)
+        empty = ~np.any(sums, axis=1)
+        # re-seed empty clusters from random points
+        sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()), replace=False)]
+        centroids = _normalize_rows(sums)
+    return centroids.astype(np.float32)
+
+
+class LocalIndexWriter:
+    """
+    Collects embedded nodes and writes an on-disk IVF index.
+
+    Exposes `add(nodes)` like a LlamaIndex vector store, so ManualIngestionPipeline
+    can write into it instead of Qdrant. Call `finalize()` once all nodes are added.
+
+    Layout of `index_dir`:
+        vectors.npy        (n, dim) float32 unit vectors, grouped by IVF list
+        ivf_centroids.npy  (n_lists, dim) float32 list centroids
+        ivf_offsets.npy    (n_lists + 1,) int64 row range of each list
+        nodes.jsonl        one serialized node (text + page metadata) per row
+        manifest.json      embedding model, dimension, counts, chunking settings
+    """
+
+    def __init__(self, index_dir: str, n_lists: int | None = None, manifest: dict | None = None) -> None:
+        self.index_dir = index_dir
+        self.n_lists = n_lists
+        self.manifest = dict(manifest or {})
+        self._embeddings = []
+        self._nodes = []
+        self._lock = threading.Lock()
+
+    def add(self, nodes: list[BaseNode], **kwargs) -> list[str]:
+        with self._lock:
+            for node in nodes:
+                self._embeddings.append(np.asarray(node.embedding, dtype=np.float32))
+                # the vector lives in vectors.npy, not in the metadata file
+                node_dict = node.to_dict()
+                node_dict['embedding'] = None
+                self._nodes.append(node_dict)
+        return [node.node_id for node in nodes]
+
+    def finalize(self) -> dict:
+        """
+        Cluster the vectors and write the index files.
+
+        Returns:
+            dict: The manifest that was written
+        """
+        if not self._embeddings:
+            raise ValueError("No nodes were added to the local index")
+
+        vectors = _normalize_rows(np.stack(self._embeddings))
+        n_lists = self.n_lists
+        if n_lists is None:
+            n_lists = 1 if len(vectors) < MIN_VECTORS_FOR_IVF else int(np.sqrt(len(vectors)))
+        n_lists = max(1, min(n_lists, len(vectors)))
+
+        if n_lists == 1:
+            centroids = _normalize_rows(vectors.mean(axis=0, keepdims=True)).astype(np.float32)
+            assignments = np.zeros(len(vectors), dtype=np.int64)
+        else:
+            centroids = spherical_kmeans(vectors, n_lists)
+            assignments = np.argmax(vectors @ centroids.T, axis=1)
+
+        # store each list contiguously so a probe reads one slice of the memory map
+        order = np.argsort(assignments, kind='stable')
+        offsets = np.zeros(n_lists + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(assignments, minlength=n_lists))
+
+        os.makedirs(self.index_dir, exist_ok=True)
+        self._write(VECTORS_FILE, lambda f: np.save(f, vectors[order]))
+        self._write(CENTROIDS_FILE, lambda f: np.save(f, centroids))
+        self._write(OFFSETS_FILE, lambda f: np.save(f, offsets))
+
+        def write_nodes(f):
+            for row in order:
+                f.write(json.dumps(self._nodes[row]).encode('utf-8') + b"\n")
+        self._write(NODES_FILE, write_nodes)
+
+        manifest = dict(self.manifest, count=len(vectors), dim=int(vectors.shape[1]), n_lists=n_lists)
+        # manifest last: a reader never sees a manifest that does not match the files
+        self._write(MANIFEST_FILE, lambda f: f.write(json.dumps(manifest, indent=2).encode('utf-8')))
+        return manifest
+
+    def _write(self, name: str, write) -> None:
+        path = os.path.join(self.index_dir, name)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            write(f)
+        os.replace(tmp_path, path)
+
+
+class LocalVectorIndex:
+    """
+    Read-only IVF index over a memory-mapped vector matrix.
+
+    A query is scored against the list centroids, then exactly against the rows of
+    the `n_probe` closest lists; with a single list this is exact search. Only the
+    probed slices of vectors.npy are paged in. By default a quarter of the lists
+    (at least 8) is probed.
+    """
+
+    def __init__(self, index_dir: str, n_probe: int | None = None) -> None:
+        self.index_dir = index_dir
+        with open(os.path.join(index_dir, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+            self.manifest = json.load(f)
+
+        self.vectors = np.load(os.path.join(index_dir, VECTORS_FILE), mmap_mode='r')
+        self.centroids = np.load(os.path.join(index_dir, CENTROIDS_FILE))
+        self.offsets = np.load(os.path.join(index_dir, OFFSETS_FILE))
+        if n_probe is None:
+            n_probe = max(8, -(-len(self.centroids) // 4))
+        self.n_probe = min(n_probe, len(self.centroids))
+
+        with open(os.path.join(index_dir, NODES_FILE), 'r', encoding='utf-8') as f:
+            self.nodes = [TextNode.from_dict(json.loads(line)) for line in f]
+
+        if len(self.nodes) != len(self.vectors):
+            raise ValueError(f"Local index at {index_dir} is inconsistent: "
+                             f"{len(self.nodes)} nodes for {len(self.vectors)} vectors")
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def search(self, query_embedding, top_k: int = 10, n_probe: int | None = None) -> list[NodeWithScore]:
+        """
+        Args:
+            query_embedding (list[float]): Query vector from the index's embedding model
+            top_k (int): Number of nodes to return
+            n_probe (int | None): Lists to scan (defaults to the index's n_probe)
+
+        Returns:
+            list[NodeWithScore]: Best nodes first, scored by cosine similarity
+        """
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+
+        n_probe = min(n_probe or self.n_probe, len(self.centroids))
+        if n_probe >= len(self.centroids):
+            probed = range(len(self.centroids))
+        else:
+            centroid_scores = self.centroids @ query
+            probed = np.argpartition(-centroid_scores, n_probe - 1)[:n_probe]
+
+        rows, scores = [], []
+        for list_id in probed:
+            start, end = int(self.offsets[list_id]), int(self.offsets[list_id + 1])
+            if start == end:
+                continue
+            scores.append(self.vectors[start:end] @ query)
+            rows.append(np.arange(start, end))
+        if not scores:
+            return []
+
+        rows, scores = np.concatenate(rows), np.concatenate(scores)
+        top_k = min(top_k, len(scores))
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        best = best[np.argsort(-scores[best])]
+        return [NodeWithScore(node=self.nodes[rows[i]], score=float(scores[i])) for i in best]
+
+
+class LocalIndexRetriever(BaseRetriever):
+    """LlamaIndex retriever over a LocalVectorIndex; expects queries with a precomputed embedding."""
+
+    def __init__(self, index: LocalVectorIndex, embed_model, similarity_top_k: int = 100, **kwargs) -> None:
+        self._index = index
+        self._embed_model = embed_model
+        self._similarity_top_k = similarity_top_k
+        super().__init__(**kwargs)
+
+    def _retrieve(self, query_bundle: QueryBundle) -> list[NodeWithScore]:
+        if query_bundle.embedding is None:
+            query_bundle.embedding = self._embed_model.get_query_embedding(query_bundle.query_str)
+        return self._index.search(query_bundle.embedding, top_k=self._similarity_top_k)
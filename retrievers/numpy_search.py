@@ -0,0 +1,193 @@
+import threading
+
+import numpy as np
+
+from llama_index.core.retrievers import BaseRetriever
+from llama_index.core.schema import BaseNode, NodeWithScore, QueryBundle
+from llama_index.core.vector_stores.utils import metadata_dict_to_node
+from llama_index.vector_stores.qdrant.base import DENSE_VECTOR_NAME
+
+from qdrant_client import QdrantClient
+from qdrant_client.http import models as qdrant_models
+
+SEARCH_DTYPES = ("float32", "int8")
+
+# rows converted to float32 at a time when scoring an int8 matrix
+INT8_BLOCK_ROWS = 2048
+
+
+class NumpyVectorSearch:
+    """
+    Exact in-process cosine search over one contiguous matrix of chunk embeddings.
+
+    Vectors are unit-normalized once, so a query is a single matrix-vector product
+    and a batch of queries a single matrix-matrix product; the top k rows are
+    picked with `argpartition` and only those are sorted. For a manual of a few
+    thousand chunks this takes a few milliseconds, far below a network round trip.
+
+    With `dtype="int8"` each row is stored as int8 with its own scale (4x less
+    memory, scores within ~1% of float32); rows are widened block by block into a
+    reused per-thread buffer while scoring, so it is about 2x slower than float32.
+    """
+
+    def __init__(self, vectors, nodes: list[BaseNode], dtype: str = "float32") -> None:
+        if dtype not in SEARCH_DTYPES:
+            raise ValueError(f"Unknown dtype '{dtype}', expected one of {SEARCH_DTYPES}")
+
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or len(vectors) != len(nodes):
+            raise ValueError(f"Expected one vector per node, got {vectors.shape} for {len(nodes)} nodes")
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        vectors = vectors / norms
+
+        self.dtype = dtype
+        self.nodes = nodes
+        self.dim = vectors.shape[1] if len(vectors) else 0
+        if dtype == "int8":
+            scales = np.abs(vectors).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            self.matrix = np.ascontiguousarray(np.round(vectors / scales[:, None]).astype(np.int8))
+            self.scales = scales.astype(np.float32)
+        else:
+            self.matrix = np.ascontiguousarray(vectors)
+            self.scales = None
+        self._buffers = threading.local()
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    @property
+    def nbytes(self) -> int:
+        return self.matrix.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    @classmethod
+    def from_nodes(cls, nodes: list[BaseNode], dtype: str = "float32") -> "NumpyVectorSearch":
+        """Build from nodes that carry their embedding; the embeddings are moved into the matrix."""
+        vectors = np.array([node.embedding for node in nodes], dtype=np.float32)
+        for node in nodes:
+            node.embedding = None
+        return cls(vectors, nodes, dtype=dtype)
+
+    @classmethod
+    def from_qdrant(cls,
+                    client: QdrantClient,
+                    collection_name: str,
+                    dtype: str = "float32",
+                    manual_id: str | None = None,
+                    batch_size: int = 256) -> "NumpyVectorSearch":
+        """
+        Snapshot the dense vectors and nodes of a Qdrant collection into memory.
+
+        Args:
+            client (QdrantClient): Client for the collection
+            collection_name (str): Collection written by embed_documents
+            dtype (str): 'float32' or 'int8'
+            manual_id (str | None): Only load this manual's points from a shared collection
+            batch_size (int): Points fetched per scroll request
+
+        Returns:
+            NumpyVectorSearch: The in-memory index
+        """
+        scroll_filter = None
+        if manual_id is not None:
+            scroll_filter = qdrant_models.Filter(
+                must=[qdrant_models.FieldCondition(key='manual_id', match=qdrant_models.MatchValue(value=manual_id))]
+            )
+
+        vectors, nodes = [], []
+        offset = None
+        while True:
+            points, offset = client.scroll(
+                collection_name=collection_name,
+                scroll_filter=scroll_filter,
+                limit=batch_size,
+                offset=offset,
+                with_payload=True,
+                with_vectors=[DENSE_VECTOR_NAME]
+            )
+            for point in points:
+                vector = point.vector.get(DENSE_VECTOR_NAME) if isinstance(point.vector, dict) else point.vector
+                if vector is None:
+                    continue
+                vectors.append(vector)
+                nodes.append(metadata_dict_to_node(point.payload))
+            if offset is None:
+                break
+
+        return cls(np.array(vectors, dtype=np.float32).reshape(len(vectors), -1), nodes, dtype=dtype)
+
+    def _scores(self, queries: np.ndarray) -> np.ndarray:
+        """(n_rows, n_queries) cosine scores for unit-normalized queries."""
+        if self.scales is None:
+            return self.matrix @ queries.T
+
+        buffer = getattr(self._buffers, 'block', None)
+        if buffer is None:
+            buffer = self._buffers.block = np.empty((min(INT8_BLOCK_ROWS, len(self.matrix)), self.dim), dtype=np.float32)
+
+        scores = np.empty((len(self.matrix), len(queries)), dtype=np.float32)
+        for start in range(0, len(self.matrix), INT8_BLOCK_ROWS):
+            block = self.matrix[start:start + INT8_BLOCK_ROWS]
+            rows = len(block)
+            buffer[:rows] = block
+            scores[start:start + rows] = (buffer[:rows] @ queries.T) * self.scales[start:start + rows, None]
+        return scores
+
+    def _top_k(self, scores: np.ndarray, top_k: int) -> list[NodeWithScore]:
+        top_k = min(top_k, len(scores))
+        if top_k <= 0:
+            return []
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        best = best[np.argsort(-scores[best])]
+        return [NodeWithScore(node=self.nodes[i], score=float(scores[i])) for i in best]
+
+    @staticmethod
+    def _normalize_queries(queries) -> np.ndarray:
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return queries / norms
+
+    def search(self, query_embedding, top_k: int = 10) -> list[NodeWithScore]:
+        """
+        Args:
+            query_embedding (list[float]): Query vector from the collection's embedding model
+            top_k (int): Number of nodes to return
+
+        Returns:
+            list[NodeWithScore]: Best nodes first, scored by cosine similarity
+        """
+        return self.search_batch([query_embedding], top_k=top_k)[0]
+
+    def search_batch(self, query_embeddings, top_k: int = 10) -> list[list[NodeWithScore]]:
+        """
+        Score several queries with one matrix-matrix product.
+
+        Args:
+            query_embeddings (list[list[float]]): One vector per query
+            top_k (int): Number of nodes to return per query
+
+        Returns:
+            list[list[NodeWithScore]]: Results per query, in query order
+        """
+        if not len(self.nodes):
+            return [[] for _ in query_embeddings]
+        scores = self._scores(self._normalize_queries(query_embeddings))
+        return [self._top_k(scores[:, i], top_k) for i in range(scores.shape[1])]
+
+
+class NumpySearchRetriever(BaseRetriever):
+    """LlamaIndex retriever over a NumpyVectorSearch; expects queries with a precomputed embedding."""
+
+    def __init__(self, search: NumpyVectorSearch, embed_model, similarity_top_k: int = 100, **kwargs) -> None:
+        self._search = search
+        self._embed_model = embed_model
+        self._similarity_top_k = similarity_top_k
+        super().__init__(**kwargs)
+
+    def _retrieve(self, query_bundle: QueryBundle) -> list[NodeWithScore]:
+        if query_bundle.embedding is None:
+            query_bundle.embedding = self._embed_model.get_query_embedding(query_bundle.query_str)
+        return self._search.search(query_bundle.embedding, top_k=self._similarity_top_k)
@@ -0,0 +1,151 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from llama_index.core.llms import LLM
+
+# small, fast model: decomposition sits in front of retrieval
+DECOMPOSITION_MODEL = os.getenv('QUERY_DECOMPOSITION_MODEL', 'claude-3-5-haiku-latest')
+MAX_SUBQUERIES = 4
+
+# cheap gate so only questions that may be compound pay for an LLM call: a plain "and"/"or"
+# is in most single-topic questions ("check the oil level and pressure"), so a conjunction
+# only counts when it opens a second noun phrase or a second question
+_COMPOUND = re.compile(
+    r"\b(?:vs\.?|versus|compar(?:e[sd]?|ing|ison)|differ(?:s|ence|ences)?|respectively|as well as)\b"
+    r"|\b(?:between|both)\s+(?!\d)[^?]*?\band\b"
+    r"|\b(?:and|or)\s+(?:the|its|their|what|which|how|when|where|why)\b"
+    r"|\?.*\S.*\?",
+    re.IGNORECASE
+)
+_LIST_MARKER = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s*")
+
+DECOMPOSITION_PROMPT = """You prepare search queries for a retrieval system over industrial equipment service manuals.
+
+If the question below asks about several things (several components, a comparison, several sub-questions),
+rewrite it as at most {max_subqueries} self-contained search queries, one per line, each about one thing and
+keeping the details that matter (component names, part numbers, fault codes, the kind of information asked for).
+If it asks about one thing, reply with the question unchanged on a single line. Reply with the queries only.
+
+Question: {question}"""
+
+
+def looks_compound(question: str) -> bool:
+    """
+    Whether a question may ask about several things (comparisons, "between/both X and Y",
+    a conjunction joining two noun phrases or questions, several '?').
+
+    >>> looks_compound("Compare the compressor and HTF pump maintenance intervals")
+    True
+    >>> looks_compound("What is the oil capacity of the compressor and how often is it changed?")
+    True
+    >>> looks_compound("Torque values for the fan motor and the pump coupling?")
+    True
+    >>> looks_compound("How do I check the oil level and pressure?")
+    False
+    >>> looks_compound("Is a suction pressure between 2 and 4 bar normal?")
+    False
+    >>> looks_compound("What does alarm A17 mean on each compressor?")
+    False
+    """
+    return bool(_COMPOUND.search(question))
+
+
+def parse_subqueries(text: str, question: str, max_subqueries: int = MAX_SUBQUERIES) -> list[str]:
+    """Sub-queries from the model's reply, one per line; empty if the question is not compound."""
+    queries = []
+    for line in text.splitlines():
+        line = _LIST_MARKER.sub("", line).strip().strip('"')
+        if line and line.lower() != question.strip().lower() and line not in queries:
+            queries.append(line)
+    queries = queries[:max_subqueries]
+    return queries if len(queries) > 1 else []
+
+
+class QueryDecomposer:
+    """
+    Split compound questions into self-contained sub-queries with a small LLM.
+
+    Only questions that pass the `looks_compound` gate are sent to the model, and
+    results are kept in an LRU, so single-topic and repeated questions cost nothing.
+    Failures are not fatal: the question is then retrieved as a single query.
+    """
+
+    def __init__(self, llm: LLM | None = None, max_subqueries: int = MAX_SUBQUERIES, max_entries: int = 1024) -> None:
+        self._llm = llm
+        self.max_subqueries = max_subqueries
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def build_llm() -> LLM:
+        from llama_index.llms.anthropic import Anthropic
+        return Anthropic(model=DECOMPOSITION_MODEL, max_tokens=256, temperature=0.0,
+                         api_key=os.getenv("ANTHROPIC_API_KEY"))
+
+    @property
+    def llm(self) -> LLM:
+        if self._llm is None:
+            self._llm = self.build_llm()
+        return self._llm
+
+    def _prompt(self, question: str) -> str:
+        return DECOMPOSITION_PROMPT.format(max_subqueries=self.max_subqueries, question=question)
+
+    def _cached(self, question: str) -> list[str] | None:
+        with self._lock:
+            queries = self._entries.get(question)
+            if queries is not None:
+                self._entries.move_to_end(question)
+            return queries
+
+    def _store(self, question: str, queries: list[str]) -> list[str]:
+        with self._lock:
+            self._entries[question] = queries
+            self._entries.move_to_end(question)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return queries
+
+    def decompose(self, question: str) -> list[str]:
+        """
+        Args:
+            question (str): The user's question
+
+        Returns:
+            list[str]: Sub-queries, or an empty list if the question is not compound
+        """
+        if not looks_compound(question):
+            return []
+        queries = self._cached(question)
+        if queries is None:
+            try:
+                text = self.llm.complete(self._prompt(question)).text
+            except Exception as e:
+                print(f"Query decomposition failed, retrieving as a single query: {e}")
+                return []
+            queries = self._store(question, parse_subqueries(text, question, self.max_subqueries))
+        return queries
+
+    async def adecompose(self, question: str, llm: LLM | None = None) -> list[str]:
+        """
+        Async version of `decompose`.
+
+        Args:
+            question (str): The user's question
+            llm (LLM | None): LLM whose async client belongs to the running event loop
+                (defaults to the decomposer's own)
+        """
+        if not looks_compound(question):
+            return []
+        queries = self._cached(question)
+        if queries is None:
+            try:
+                text = (await (llm or self.llm).acomplete(self._prompt(question))).text
+            except Exception as e:
+                print(f"Query decomposition failed, retrieving as a single query: {e}")
+                return []
+            queries = self._store(question, parse_subqueries(text, question, self.max_subqueries))
+        return queries
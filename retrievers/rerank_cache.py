@@ -0,0 +1,75 @@
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+from llama_index.core.schema import NodeWithScore
+
+from retrievers.embedding_cache import normalize_query
+
+
+class RerankCache:
+    """
+    LRU/TTL cache of rerank results keyed by (model, top_n, query, candidate node ids).
+
+    Only node ids and relevance scores are stored; hits are rebuilt into
+    NodeWithScore objects from the candidates of the current request, so cached
+    results always carry the current node content.
+    """
+
+    def __init__(self, max_entries: int = 2048, ttl_seconds: float = 24 * 3600) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+        self._entries = OrderedDict()  # key -> (created_at, [(node_id, score), ...])
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    @staticmethod
+    def make_key(query: str, candidates: list[NodeWithScore], model_name: str, top_n: int) -> str:
+        node_ids = ",".join(candidate.node.node_id for candidate in candidates)
+        raw = f"{model_name}\x00{top_n}\x00{normalize_query(query)}\x00{node_ids}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get(self, query: str, candidates: list[NodeWithScore], model_name: str, top_n: int) -> list[NodeWithScore] | None:
+        """
+        Args:
+            query (str): Query text sent to the reranker
+            candidates (list[NodeWithScore]): Candidates that would be reranked, in order
+            model_name (str): Rerank model name
+            top_n (int): Number of results the reranker keeps
+
+        Returns:
+            list[NodeWithScore] | None: Reranked nodes, or None on a miss
+        """
+        key = self.make_key(query, candidates, model_name, top_n)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.time() - entry[0] > self.ttl_seconds:
+                if entry is not None:
+                    del self._entries[key]
+                self._counters['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters['hits'] += 1
+            ranked = entry[1]
+
+        nodes_by_id = {candidate.node.node_id: candidate.node for candidate in candidates}
+        return [NodeWithScore(node=nodes_by_id[node_id], score=score) for node_id, score in ranked]
+
+    def put(self, query: str, candidates: list[NodeWithScore], model_name: str, top_n: int,
+            reranked: list[NodeWithScore]) -> None:
+        key = self.make_key(query, candidates, model_name, top_n)
+        ranked = [(node.node.node_id, node.score) for node in reranked]
+        with self._lock:
+            self._entries[key] = (time.time(), ranked)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters['evictions'] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._counters)
+            stats['size'] = len(self._entries)
+        return stats
@@ -0,0 +1,678 @@
+import os
+import time
+import asyncio
+import threading
+import statistics
+import weakref
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import numpy as np
+
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.embeddings.openai import OpenAIEmbedding
+from llama_index.core import VectorStoreIndex
+from llama_index.postprocessor.cohere_rerank import CohereRerank
+from llama_index.core.schema import QueryBundle, NodeWithScore, TextNode
+from llama_index.vector_stores.qdrant.utils import fastembed_sparse_encoder
+
+from qdrant_client import QdrantClient, AsyncQdrantClient
+
+from embed.embedding_backends import build_embed_model, embed_model_id
+from retrievers.embedding_cache import QueryEmbeddingCache
+from retrievers.rerank_cache import RerankCache
+from retrievers.hybrid import HybridQdrantVectorStore, HYBRID_FUSIONS
+from retrievers.local_index import LocalVectorIndex, LocalIndexRetriever
+from retrievers.numpy_search import NumpyVectorSearch, NumpySearchRetriever
+from retrievers.query_decomposition import QueryDecomposer, MAX_SUBQUERIES
+from embed.quantization import quantized_search_params
+from embed.collection_version import get_collection_version
+
+QDRANT_URL = os.getenv(
+    'QDRANT_URL',
+    "https://6eefc541-3b11-47b5-8274-bdc84e60b5b9.us-east-1-0.aws.cloud.qdrant.io:6333"
+)
+DEFAULT_COLLECTION_NAME = "danfos_service_manual_2024_v1"
+RERANK_MODEL_NAME = "rerank-v3.5"
+
+# the collection's ingestion marker is re-read at most this often (seconds), see `collection_version`
+COLLECTION_VERSION_REFRESH = float(os.getenv('COLLECTION_VERSION_REFRESH', 10))
+
+RETRIEVAL_STAGES = ("decompose", "embed", "search", "rerank", "total")
+QUERY_MODES = ("dense", "hybrid")
+
+
+class _AsyncPipeline:
+    """Async clients bound to a single event loop (httpx async pools cannot cross loops)."""
+
+    def __init__(self, embed_model, aclient, vector_store, retriever, decomposition_llm=None) -> None:
+        self.embed_model = embed_model
+        self.aclient = aclient
+        self.vector_store = vector_store
+        self.retriever = retriever
+        self.decomposition_llm = decomposition_llm
+
+
+class RetrievalEngine:
+    """
+    Long-lived retrieval pipeline (query embedding -> Qdrant search -> Cohere rerank).
+
+    All clients are built once and reused, so the underlying HTTP connection pools
+    stay open between questions and no request pays for TLS handshakes or object setup.
+    Use `get_retrieval_engine` rather than constructing this directly.
+
+    In "hybrid" query mode the dense (top `similarity_top_k`) and sparse SPLADE
+    (top `sparse_top_k`) hits are fused, by reciprocal rank ("rrf") or by
+    alpha-weighted relative score ("alpha"), and only the best `hybrid_top_k` fused
+    candidates go to the reranker. Sparse matching catches part numbers and fault
+    codes ("A17 alarm") that dense embeddings blur.
+
+    With `multi_query`, compound questions ("compare the compressor and HTF pump
+    maintenance intervals") are split into sub-queries by a small LLM while the
+    question itself is being embedded; the sub-queries are embedded in one batch,
+    all searches run concurrently, and the union of the hits (interleaved by rank,
+    deduplicated) is reranked once against the original question.
+    """
+
+    def __init__(self,
+                 collection_name: str = DEFAULT_COLLECTION_NAME,
+                 similarity_top_k: int = 100,
+                 rerank_top_n: int = 10,
+                 adaptive_rerank: bool = True,
+                 min_rerank_candidates: int = 25,
+                 rerank_ambiguity_margin: float = 0.05,
+                 timings_window: int = 512,
+                 embed_backend: str | None = None,
+                 embed_model_name: str | None = None,
+                 rerank: bool = True,
+                 query_mode: str | None = None,
+                 sparse_top_k: int = 100,
+                 hybrid_top_k: int = 30,
+                 fusion: str | None = None,
+                 alpha: float = 0.5,
+                 oversampling: float | None = None,
+                 multi_query: bool | None = None) -> None:
+        self.collection_name = collection_name
+        self.similarity_top_k = similarity_top_k
+
+        self.query_mode = query_mode or os.getenv('RETRIEVAL_QUERY_MODE', "dense")
+        if self.query_mode not in QUERY_MODES:
+            raise ValueError(f"Unknown query mode '{self.query_mode}', expected one of {QUERY_MODES}")
+        self.fusion = fusion or os.getenv('RETRIEVAL_FUSION', "rrf")
+        if self.fusion not in HYBRID_FUSIONS:
+            raise ValueError(f"Unknown fusion '{self.fusion}', expected one of {tuple(HYBRID_FUSIONS)}")
+        self.sparse_top_k = sparse_top_k
+        self.hybrid_top_k = max(hybrid_top_k, rerank_top_n)
+        # weight of the dense ranking (1 = dense only); Qdrant treats alpha=0 as unset
+        self.alpha = alpha
+
+        # quantized collections (embed_documents(quantization=...)): search the quantized
+        # codes for `oversampling` x top-k candidates and rescore them at full precision
+        if oversampling is None and os.getenv('RETRIEVAL_OVERSAMPLING'):
+            oversampling = float(os.getenv('RETRIEVAL_OVERSAMPLING'))
+        self.search_params = quantized_search_params(oversampling=oversampling) if oversampling else None
+
+        # query decomposition for compound questions (RETRIEVAL_MULTI_QUERY=1)
+        if multi_query is None:
+            multi_query = os.getenv('RETRIEVAL_MULTI_QUERY', "0") == "1"
+        self.decomposer = QueryDecomposer() if multi_query else None
+        self._search_executor = ThreadPoolExecutor(max_workers=MAX_SUBQUERIES + 1,
+                                                   thread_name_prefix='retrieval-search') if multi_query else None
+
+        # adaptive rerank: start with the top `min_rerank_candidates` dense hits and only
+        # widen (doubling) while the dense score at the cut-off is within
+        # `rerank_ambiguity_margin` of the best score, i.e. the cut-off is arbitrary
+        self.adaptive_rerank = adaptive_rerank
+        self.min_rerank_candidates = max(min_rerank_candidates, rerank_top_n)
+        self.rerank_ambiguity_margin = rerank_ambiguity_margin
+
+        # embed model, the same backend the collection was ingested with (EMBED_BACKEND by default)
+        self.embed_backend = embed_backend
+        self.embed_model_name = embed_model_name
+        self.embed_model = self._build_embed_model()
+        self.embed_model_id = embed_model_id(self.embed_model)
+
+        # repeat questions skip the embedding round trip entirely
+        self.embedding_cache = QueryEmbeddingCache(disk_path=os.getenv('QUERY_EMBEDDING_CACHE_PATH'))
+
+        # without a reranker (e.g. offline) the best `rerank_top_n` search hits are returned
+        self.rerank_top_n = rerank_top_n
+        self.reranker = CohereRerank(
+            top_n=rerank_top_n,
+            model=RERANK_MODEL_NAME,
+            api_key=os.getenv('COHERE_API_KEY'),
+        ) if rerank else None
+        self.rerank_cache = RerankCache()
+
+        self._collection_version = (float('-inf'), None)  # (monotonic time read, version)
+        self._init_search()
+
+        # async clients, one set per running event loop
+        self._async_pipelines = weakref.WeakKeyDictionary()
+
+        # rolling per-stage timings in milliseconds
+        self._timings = {stage: deque(maxlen=timings_window) for stage in RETRIEVAL_STAGES}
+        self._timings_lock = threading.Lock()
+        self.last_timings = {}
+        self.last_report = {}
+
+    def _build_embed_model(self) -> BaseEmbedding:
+        return build_embed_model(self.embed_backend, model_name=self.embed_model_name)
+
+    def _loop_embed_model(self) -> BaseEmbedding:
+        # API clients hold loop-bound connection pools; a local model is safe to share
+        return self._build_embed_model() if isinstance(self.embed_model, OpenAIEmbedding) else self.embed_model
+
+    def _init_search(self) -> None:
+        self.client = QdrantClient(url=QDRANT_URL,
+                                   api_key=os.getenv('QDRANT_API_KEY'),
+                                   timeout=3600)
+
+        # the sparse encoder loads a local model, so build it once and share it
+        self._sparse_fn = fastembed_sparse_encoder()
+
+        self.vector_store = self._build_vector_store()
+        self.retriever = self._build_retriever(self.vector_store, self.embed_model)
+
+    def _warm_search(self) -> None:
+        self.client.get_collection(collection_name=self.collection_name)
+
+    def _build_vector_store(self, aclient: AsyncQdrantClient | None = None) -> HybridQdrantVectorStore:
+        return HybridQdrantVectorStore(
+            self.collection_name,
+            client=self.client,
+            aclient=aclient,
+            enable_hybrid=True,
+            sparse_doc_fn=self._sparse_fn,
+            sparse_query_fn=self._sparse_fn,
+            hybrid_fusion_fn=HYBRID_FUSIONS[self.fusion],
+            search_params=self.search_params)
+
+    def _build_retriever(self, vector_store: HybridQdrantVectorStore, embed_model: BaseEmbedding):
+        index = VectorStoreIndex.from_vector_store(vector_store=vector_store,
+                                                   embed_model=embed_model)
+        if self.query_mode == "hybrid":
+            return index.as_retriever(similarity_top_k=self.similarity_top_k,
+                                      sparse_top_k=self.sparse_top_k,
+                                      hybrid_top_k=self.hybrid_top_k,
+                                      alpha=self.alpha,
+                                      vector_store_query_mode="hybrid")
+        return index.as_retriever(similarity_top_k=self.similarity_top_k)
+
+    def _build_async_pipeline(self) -> _AsyncPipeline:
+        embed_model = self._loop_embed_model()
+        aclient = AsyncQdrantClient(url=QDRANT_URL,
+                                    api_key=os.getenv('QDRANT_API_KEY'),
+                                    timeout=3600)
+        vector_store = self._build_vector_store(aclient=aclient)
+        retriever = self._build_retriever(vector_store, embed_model)
+        return _AsyncPipeline(embed_model, aclient, vector_store, retriever, self._loop_decomposition_llm())
+
+    def _loop_decomposition_llm(self):
+        return self.decomposer.build_llm() if self.decomposer is not None else None
+
+    async def _get_async_pipeline(self) -> _AsyncPipeline:
+        loop = asyncio.get_running_loop()
+        pipeline = self._async_pipelines.get(loop)
+        if pipeline is None:
+            # construction does a blocking collection check, keep it off the loop
+            pipeline = await asyncio.to_thread(self._build_async_pipeline)
+            pipeline = self._async_pipelines.setdefault(loop, pipeline)
+        return pipeline
+
+    def _embed_query(self, user_input: str) -> list[float]:
+        query_embedding = self.embedding_cache.get(user_input, self.embed_model_id)
+        if query_embedding is None:
+            query_embedding = self.embed_model.get_query_embedding(user_input)
+            self.embedding_cache.put(user_input, self.embed_model_id, query_embedding)
+        return query_embedding
+
+    async def _aembed_query(self, pipeline: _AsyncPipeline, user_input: str) -> list[float]:
+        query_embedding = self.embedding_cache.get(user_input, self.embed_model_id)
+        if query_embedding is None:
+            query_embedding = await pipeline.embed_model.aget_query_embedding(user_input)
+            self.embedding_cache.put(user_input, self.embed_model_id, query_embedding)
+        return query_embedding
+
+    def _embed_queries(self, queries: list[str]) -> list[list[float]]:
+        """Embed several queries, the ones not in the embedding cache in a single batch."""
+        embeddings = [self.embedding_cache.get(query, self.embed_model_id) for query in queries]
+        missing = [query for query, embedding in zip(queries, embeddings) if embedding is None]
+        if missing:
+            # OpenAI query and document embeddings are the same call, so one batched request
+            if isinstance(self.embed_model, OpenAIEmbedding):
+                computed = self.embed_model.get_text_embedding_batch(missing)
+            else:
+                computed = [self.embed_model.get_query_embedding(query) for query in missing]
+            computed = dict(zip(missing, computed))
+            for query, embedding in computed.items():
+                self.embedding_cache.put(query, self.embed_model_id, embedding)
+            embeddings = [embedding if embedding is not None else computed[query]
+                          for query, embedding in zip(queries, embeddings)]
+        return embeddings
+
+    async def _aembed_queries(self, pipeline: _AsyncPipeline, queries: list[str]) -> list[list[float]]:
+        """Async version of `_embed_queries`."""
+        embeddings = [self.embedding_cache.get(query, self.embed_model_id) for query in queries]
+        missing = [query for query, embedding in zip(queries, embeddings) if embedding is None]
+        if missing:
+            if isinstance(pipeline.embed_model, OpenAIEmbedding):
+                computed = await pipeline.embed_model.aget_text_embedding_batch(missing)
+            else:
+                computed = await asyncio.gather(*(pipeline.embed_model.aget_query_embedding(query)
+                                                  for query in missing))
+            computed = dict(zip(missing, computed))
+            for query, embedding in computed.items():
+                self.embedding_cache.put(query, self.embed_model_id, embedding)
+            embeddings = [embedding if embedding is not None else computed[query]
+                          for query, embedding in zip(queries, embeddings)]
+        return embeddings
+
+    def _search_many(self, query_bundles: list[QueryBundle]) -> list[list[NodeWithScore]]:
+        """Run the searches of several queries concurrently."""
+        return list(self._search_executor.map(self.retriever.retrieve, query_bundles))
+
+    async def _asearch_many(self, pipeline: _AsyncPipeline, query_bundles: list[QueryBundle]) -> list[list[NodeWithScore]]:
+        return list(await asyncio.gather(*(pipeline.retriever.aretrieve(bundle) for bundle in query_bundles)))
+
+    def _merge_results(self, results: list[list[NodeWithScore]]) -> list[NodeWithScore]:
+        """
+        Union of several queries' hits, deduplicated and interleaved by rank, so the
+        rerank candidates cover every sub-query rather than only the strongest one.
+        """
+        merged, seen = [], set()
+        for rank in range(max(len(nodes) for nodes in results)):
+            for nodes in results:
+                if rank < len(nodes) and nodes[rank].node.node_id not in seen:
+                    seen.add(nodes[rank].node.node_id)
+                    merged.append(nodes[rank])
+        limit = self.hybrid_top_k if self.query_mode == "hybrid" else self.min_rerank_candidates
+        return merged[:limit * len(results)]
+
+    def embed_query(self, user_input: str) -> list[float]:
+        """Embed a question with the engine's model (served from the embedding cache when possible)."""
+        return self._embed_query(user_input)
+
+    async def aembed_query(self, user_input: str) -> list[float]:
+        """Async version of `embed_query`."""
+        pipeline = await self._get_async_pipeline()
+        return await self._aembed_query(pipeline, user_input)
+
+    def _read_collection_version(self) -> str | None:
+        return get_collection_version(self.client, self.collection_name)
+
+    def collection_version(self) -> str | None:
+        """
+        Version of the content being searched, changed by every ingestion write
+        (embed.collection_version); re-read at most every COLLECTION_VERSION_REFRESH seconds.
+        """
+        read_at, version = self._collection_version
+        if time.monotonic() - read_at >= COLLECTION_VERSION_REFRESH:
+            version = self._read_collection_version()
+            self._collection_version = (time.monotonic(), version)
+        return version
+
+    async def acollection_version(self) -> str | None:
+        """Async version of `collection_version`."""
+        read_at, version = self._collection_version
+        if time.monotonic() - read_at < COLLECTION_VERSION_REFRESH:
+            return version
+        return await asyncio.to_thread(self.collection_version)
+
+    @contextmanager
+    def _stage(self, timings: dict, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            timings[stage] = (time.perf_counter() - start) * 1000
+
+    def _record_report(self, report: dict) -> None:
+        with self._timings_lock:
+            for stage, elapsed_ms in report['timings'].items():
+                if stage in self._timings:
+                    self._timings[stage].append(elapsed_ms)
+            self.last_timings = dict(report['timings'])
+            self.last_report = report
+
+    def _select_rerank_candidates(self, nodes_embed: list[NodeWithScore], adaptive: bool = True) -> list[NodeWithScore]:
+        # fused hybrid results are already cut to hybrid_top_k, and their scores are
+        # ranks rather than similarities, so the ambiguity margin does not apply;
+        # neither does it to merged multi-query results
+        if self.query_mode == "hybrid" or not adaptive:
+            return nodes_embed
+        if not self.adaptive_rerank or len(nodes_embed) <= self.min_rerank_candidates:
+            return nodes_embed
+
+        scores = [node.score or 0.0 for node in nodes_embed]
+        count = self.min_rerank_candidates
+        while count < len(nodes_embed) and scores[0] - scores[count - 1] < self.rerank_ambiguity_margin:
+            count = min(count * 2, len(nodes_embed))
+        return nodes_embed[:count]
+
+    def _rerank(self,
+                query_bundle: QueryBundle,
+                nodes_embed: list[NodeWithScore],
+                report: dict,
+                adaptive: bool = True) -> list[NodeWithScore]:
+        if self.reranker is None:
+            report['rerank_cache_hit'] = False
+            report['rerank_candidates'] = 0
+            return nodes_embed[:self.rerank_top_n]
+
+        candidates = self._select_rerank_candidates(nodes_embed, adaptive=adaptive)
+        model_name, top_n = self.reranker.model, self.reranker.top_n
+
+        nodes_reranked = self.rerank_cache.get(query_bundle.query_str, candidates, model_name, top_n)
+        report['rerank_cache_hit'] = nodes_reranked is not None
+        report['rerank_candidates'] = 0 if nodes_reranked is not None else len(candidates)
+
+        if nodes_reranked is None:
+            nodes_reranked = self.reranker.postprocess_nodes(nodes=candidates, query_bundle=query_bundle)
+            self.rerank_cache.put(query_bundle.query_str, candidates, model_name, top_n, nodes_reranked)
+        return nodes_reranked
+
+    def warm_up(self, embed: bool = True, rerank: bool = False) -> dict:
+        """
+        Open the connection pools before the first real question arrives.
+
+        Args:
+            embed (bool): Also send a short embedding request (opens the OpenAI pool or
+                loads the local model)
+            rerank (bool): Also send a one-document rerank request (billed by Cohere)
+
+        Returns:
+            dict: Milliseconds spent warming each client
+        """
+        timings = {}
+        with self._stage(timings, "search"):
+            self._warm_search()
+        if embed:
+            with self._stage(timings, "embed"):
+                self.embed_model.get_query_embedding("warm up")
+        if rerank and self.reranker is not None:
+            with self._stage(timings, "rerank"):
+                self.reranker.postprocess_nodes(nodes=[NodeWithScore(node=TextNode(text="warm up"))],
+                                                query_str="warm up")
+        print(f"Retrieval engine warmed up for {self.collection_name}: "
+              + ", ".join(f"{stage}={elapsed:.0f}ms" for stage, elapsed in timings.items()))
+        return timings
+
+    def retrieve(self, user_input: str, return_report: bool = False, on_candidates=None):
+        """
+        Run the full retrieval pipeline for a single question.
+
+        Args:
+            user_input (str): The user's question
+            return_report (bool): Also return the per-call report (stage timings,
+                number of candidates actually sent to the reranker, rerank cache hit)
+            on_candidates (callable | None): Called with the search results before the
+                rerank starts, e.g. to start loading page images in the background
+
+        Returns:
+            tuple: (nodes_reranked, nodes_embed) or (nodes_reranked, nodes_embed, report)
+        """
+        report = {'timings': {}, 'query_mode': self.query_mode}
+        timings = report['timings']
+        start = time.perf_counter()
+
+        sub_queries = []
+        if self.decomposer is not None:
+            with self._stage(timings, "decompose"):
+                sub_queries = self.decomposer.decompose(user_input)
+        report['sub_queries'] = sub_queries
+
+        with self._stage(timings, "embed"):
+            query_embedding, *sub_embeddings = self._embed_queries([user_input, *sub_queries])
+        query_bundle = QueryBundle(query_str=user_input, embedding=query_embedding)
+
+        with self._stage(timings, "search"):
+            if sub_queries:
+                nodes_embed = self._merge_results(self._search_many(
+                    [query_bundle, *(QueryBundle(query_str=query, embedding=embedding)
+                                     for query, embedding in zip(sub_queries, sub_embeddings))]))
+            else:
+                nodes_embed = self.retriever.retrieve(query_bundle)
+        if on_candidates is not None:
+            on_candidates(nodes_embed)
+
+        with self._stage(timings, "rerank"):
+            nodes_reranked = self._rerank(query_bundle, nodes_embed, report, adaptive=not sub_queries)
+
+        timings["total"] = (time.perf_counter() - start) * 1000
+        self._record_report(report)
+
+        if return_report:
+            return nodes_reranked, nodes_embed, report
+        return nodes_reranked, nodes_embed
+
+    async def aretrieve(self, user_input: str, return_report: bool = False, on_candidates=None):
+        """
+        Async version of `retrieve` that never blocks the event loop.
+
+        Embedding and Qdrant search are awaited on async clients; the Cohere rerank
+        call only has a sync client, so it runs in a worker thread.
+
+        Args:
+            user_input (str): The user's question
+            return_report (bool): Also return the per-call report
+            on_candidates (callable | None): See `retrieve`
+
+        Returns:
+            tuple: (nodes_reranked, nodes_embed) or (nodes_reranked, nodes_embed, report)
+        """
+        pipeline = await self._get_async_pipeline()
+
+        report = {'timings': {}, 'query_mode': self.query_mode}
+        timings = report['timings']
+        start = time.perf_counter()
+
+        # the question is embedded while the decomposer works out its sub-queries
+        embed_task = asyncio.create_task(self._aembed_query(pipeline, user_input))
+        sub_queries = []
+        if self.decomposer is not None:
+            with self._stage(timings, "decompose"):
+                try:
+                    sub_queries = await self.decomposer.adecompose(user_input, llm=pipeline.decomposition_llm)
+                except BaseException:
+                    embed_task.cancel()
+                    raise
+        report['sub_queries'] = sub_queries
+
+        with self._stage(timings, "embed"):
+            query_embedding = await embed_task
+            sub_embeddings = await self._aembed_queries(pipeline, sub_queries) if sub_queries else []
+        query_bundle = QueryBundle(query_str=user_input, embedding=query_embedding)
+
+        with self._stage(timings, "search"):
+            if sub_queries:
+                nodes_embed = self._merge_results(await self._asearch_many(
+                    pipeline,
+                    [query_bundle, *(QueryBundle(query_str=query, embedding=embedding)
+                                     for query, embedding in zip(sub_queries, sub_embeddings))]))
+            else:
+                nodes_embed = await pipeline.retriever.aretrieve(query_bundle)
+        if on_candidates is not None:
+            on_candidates(nodes_embed)
+
+        with self._stage(timings, "rerank"):
+            nodes_reranked = await asyncio.to_thread(self._rerank, query_bundle, nodes_embed, report,
+                                                     not sub_queries)
+
+        timings["total"] = (time.perf_counter() - start) * 1000
+        self._record_report(report)
+
+        if return_report:
+            return nodes_reranked, nodes_embed, report
+        return nodes_reranked, nodes_embed
+
+    def timing_stats(self) -> dict:
+        """
+        Summarise the rolling per-stage timings.
+
+        Returns:
+            dict: Stage name -> {'count', 'p50_ms', 'p95_ms'}
+        """
+        stats = {}
+        with self._timings_lock:
+            for stage, samples in self._timings.items():
+                if not samples:
+                    continue
+                ordered = sorted(samples)
+                stats[stage] = {
+                    'count': len(ordered),
+                    'p50_ms': statistics.median(ordered),
+                    'p95_ms': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+                }
+        return stats
+
+
+class LocalRetrievalEngine(RetrievalEngine):
+    """
+    RetrievalEngine over an on-disk LocalVectorIndex instead of Qdrant.
+
+    Same `retrieve` / `aretrieve` contract, no network needed for search. The
+    query embedding model is taken from the index manifest; pair the index with a
+    fastembed model and `rerank=False` for fully offline use.
+    """
+
+    def __init__(self,
+                 collection_name: str,
+                 index_dir: str,
+                 n_probe: int | None = None,
+                 **kwargs) -> None:
+        self.index_dir = index_dir
+        self.local_index = LocalVectorIndex(index_dir, n_probe=n_probe)
+        kwargs.setdefault('embed_backend', self.local_index.manifest.get('embed_backend'))
+        kwargs.setdefault('embed_model_name', self.local_index.manifest.get('embed_model'))
+        kwargs['query_mode'] = "dense"
+        super().__init__(collection_name=collection_name, **kwargs)
+
+    def _init_search(self) -> None:
+        self.client = None
+        self.vector_store = None
+        self.retriever = LocalIndexRetriever(self.local_index, self.embed_model,
+                                             similarity_top_k=self.similarity_top_k)
+
+    def _read_collection_version(self) -> str | None:
+        # the index this engine loaded; a rebuilt one is picked up by a new engine
+        return self.local_index.manifest.get('version')
+
+    def _warm_search(self) -> None:
+        # page the vector matrix in
+        self.local_index.search(self.local_index.centroids[0], top_k=1, n_probe=len(self.local_index.centroids))
+
+    def _build_async_pipeline(self) -> _AsyncPipeline:
+        # search is in-process, only the embedding model may be loop-bound
+        return _AsyncPipeline(self._loop_embed_model(), None, None, self.retriever, self._loop_decomposition_llm())
+
+
+class InProcessRetrievalEngine(RetrievalEngine):
+    """
+    RetrievalEngine that searches an in-memory snapshot of the Qdrant collection.
+
+    The collection's dense vectors and nodes are loaded once into a
+    NumpyVectorSearch (float32, or int8 for 4x less memory), so the search stage is
+    an exact in-process matrix-vector product instead of a network call. Call
+    `refresh` after re-ingesting the collection.
+    """
+
+    def __init__(self,
+                 collection_name: str = DEFAULT_COLLECTION_NAME,
+                 search_dtype: str = "float32",
+                 **kwargs) -> None:
+        self.search_dtype = search_dtype
+        kwargs['query_mode'] = "dense"
+        super().__init__(collection_name=collection_name, **kwargs)
+
+    def _init_search(self) -> None:
+        self.client = QdrantClient(url=QDRANT_URL,
+                                   api_key=os.getenv('QDRANT_API_KEY'),
+                                   timeout=3600)
+        self.vector_store = None
+        self.refresh()
+
+    def refresh(self) -> None:
+        """Reload the collection snapshot; searches in flight keep using the old one."""
+        start = time.perf_counter()
+        # read before loading: content written meanwhile counts as the older version
+        snapshot_version = get_collection_version(self.client, self.collection_name)
+        search_index = NumpyVectorSearch.from_qdrant(self.client, self.collection_name, dtype=self.search_dtype)
+        self.search_index = search_index
+        self._snapshot_version = snapshot_version
+        self._collection_version = (float('-inf'), None)
+        self.retriever = NumpySearchRetriever(search_index, self.embed_model,
+                                              similarity_top_k=self.similarity_top_k)
+        print(f"Loaded {len(search_index)} vectors of {self.collection_name} ({self.search_dtype}, "
+              f"{search_index.nbytes / 2**20:.1f} MiB) in {time.perf_counter() - start:.1f}s")
+
+    def _read_collection_version(self) -> str | None:
+        # answers are grounded in the snapshot, not in the live collection
+        return self._snapshot_version
+
+    def _warm_search(self) -> None:
+        self.search_index.search(np.ones(self.search_index.dim, dtype=np.float32), top_k=1)
+
+    def _search_many(self, query_bundles: list[QueryBundle]) -> list[list[NodeWithScore]]:
+        # one matrix-matrix product for all queries
+        return self.search_index.search_batch([bundle.embedding for bundle in query_bundles],
+                                              top_k=self.similarity_top_k)
+
+    async def _asearch_many(self, pipeline: _AsyncPipeline, query_bundles: list[QueryBundle]) -> list[list[NodeWithScore]]:
+        return self._search_many(query_bundles)
+
+    def _build_async_pipeline(self) -> _AsyncPipeline:
+        # search is in-process, only the embedding model may be loop-bound
+        return _AsyncPipeline(self._loop_embed_model(), None, None, self.retriever, self._loop_decomposition_llm())
+
+    async def _get_async_pipeline(self) -> _AsyncPipeline:
+        pipeline = await super()._get_async_pipeline()
+        # pick up the snapshot swapped in by `refresh`
+        pipeline.retriever = self.retriever
+        return pipeline
+
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_retrieval_engine(collection_name: str = DEFAULT_COLLECTION_NAME,
+                         warm_up: bool = False) -> RetrievalEngine:
+    """
+    Return the process-wide RetrievalEngine for a collection, creating it on first use.
+
+    When LOCAL_INDEX_DIR is set, the collection is served from the local index in
+    LOCAL_INDEX_DIR/<collection_name> (reranked only if COHERE_API_KEY is set).
+    With RETRIEVAL_BACKEND=numpy, the Qdrant collection is searched from an
+    in-memory snapshot (RETRIEVAL_SEARCH_DTYPE float32 or int8).
+    RETRIEVAL_MULTI_QUERY=1 splits compound questions into sub-queries.
+
+    Args:
+        collection_name (str): Qdrant collection to query
+        warm_up (bool): Warm the connection pools if the engine is created by this call
+
+    Returns:
+        RetrievalEngine: The shared engine
+    """
+    engine = _engines.get(collection_name)
+    if engine is not None:
+        return engine
+
+    with _engines_lock:
+        engine = _engines.get(collection_name)
+        if engine is None:
+            local_index_root = os.getenv('LOCAL_INDEX_DIR')
+            if local_index_root:
+                engine = LocalRetrievalEngine(collection_name,
+                                              os.path.join(local_index_root, collection_name),
+                                              rerank=bool(os.getenv('COHERE_API_KEY')))
+            elif os.getenv('RETRIEVAL_BACKEND', "qdrant") == "numpy":
+                engine = InProcessRetrievalEngine(collection_name,
+                                                  search_dtype=os.getenv('RETRIEVAL_SEARCH_DTYPE', "float32"))
+            else:
+                engine = RetrievalEngine(collection_name=collection_name)
+            if warm_up:
+                engine.warm_up()
+            _engines[collection_name] = engine
+    return engine
@@ -1,12 +1,6 @@
 import os
-from llama_index.embeddings.openai import OpenAIEmbedding
-from llama_index.vector_stores.qdrant import QdrantVectorStore
-from llama_index.core import Settings, Document, VectorStoreIndex, StorageContext
-from llama_index.postprocessor.cohere_rerank import CohereRerank
-from llama_index.core.schema import NodeWithScore
 
-from qdrant_client import QdrantClient
-from qdrant_client.http.models import Filter, FieldCondition, MatchValue, MatchAny
+from retrievers.retrieval_engine import get_retrieval_engine
 
 ### tracing ###
 
@@ -26,40 +20,36 @@ LlamaIndexInstrumentor().instrument(tracer_provider=tracer_provider)
 
 ### end tracing ###
 
-def retrieve_pages(user_input):
+def retrieve_pages(user_input, return_report=False):
+    """
+    Retrieve and rerank manual pages for a question.
 
-    # embed model
-    embed_model = OpenAIEmbedding(
-        model="text-embedding-3-large",
-        api_key=os.getenv('OPENAI_API_KEY'),
-    )
-    Settings.embed_model = embed_model
+    Delegates to the process-wide RetrievalEngine, so the embedding, rerank and
+    Qdrant clients (and their connection pools) are shared by every caller.
 
-    postprocessor = CohereRerank(
-        top_n=10,
-        model="rerank-v3.5",
-        api_key=os.getenv('COHERE_API_KEY'),
-    )
+    Args:
+        user_input (str): The user's question
+        return_report (bool): Also return the retrieval report, including
+            'rerank_candidates' (how many candidates were actually reranked)
 
-    client = QdrantClient(url="https://6eefc541-3b11-47b5-8274-bdc84e60b5b9.us-east-1-0.aws.cloud.qdrant.io:6333",
-                          api_key=os.getenv('QDRANT_API_KEY'),
-                          timeout=3600)
-    
-    query_collection_name = "danfos_service_manual_2024_v1"
-    vector_store = QdrantVectorStore(
-                query_collection_name, 
-                client=client, 
-                enable_hybrid=True)
+    Returns:
+        tuple: (nodes_reranked, nodes_embed) or (nodes_reranked, nodes_embed, report)
+    """
+    return get_retrieval_engine().retrieve(user_input, return_report=return_report)
 
-    index = VectorStoreIndex.from_vector_store(vector_store=vector_store)
 
-    retriever = index.as_retriever(similarity_top_k=100,
-                                #    vector_store_query_mode="hybrid"
-                                   )
-    nodes_embed = retriever.retrieve(user_input)
-    nodes_reranked = postprocessor.postprocess_nodes(nodes=nodes_embed, query_str=user_input)
+async def aretrieve_pages(user_input, return_report=False):
+    """
+    Async version of `retrieve_pages` for use inside workflow steps.
 
-    return nodes_reranked, nodes_embed
+    Args:
+        user_input (str): The user's question
+        return_report (bool): Also return the retrieval report
+
+    Returns:
+        tuple: (nodes_reranked, nodes_embed) or (nodes_reranked, nodes_embed, report)
+    """
+    return await get_retrieval_engine().aretrieve(user_input, return_report=return_report)
 
 
 if __name__ == "__main__":
@@ -69,4 +59,5 @@ if __name__ == "__main__":
     if not user_input:
         user_input = input("Please enter your subsidy query: ")
 
-    nodes_reranked, nodes_embed = retrieve_pages(user_input)
+    nodes_reranked, nodes_embed, report = retrieve_pages(user_input, return_report=True)
+    print(report)
@@ -26,7 +26,7 @@ from agents.agent_insulation_streaming import (
     ProvidedParametersEvent,
     RequiredParametersEvent,
     AssumptionsEvent,
-    CalculationPlanEvent,
+    CalculationPlanStreamlitEvent,
     ProgressEvent,
 )
 from llama_index.core.workflow import StopEvent
@@ -294,7 +294,7 @@ def main():
 
             async def process_events():
                 async for event in run_agent_with_stream(agent, user_input):
-                    if isinstance(event, CalculationPlanEvent):
+                    if isinstance(event, CalculationPlanStreamlitEvent):
                         st.session_state.calculation_plan = event.content
                         formatted_content = format_content(st.session_state.calculation_plan)
                         calc_container.markdown(f"""
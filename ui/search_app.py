@@ -9,6 +9,12 @@ project_root = str(Path(__file__).parent.parent)
 sys.path.append(project_root)
 
 from agents.agent_q_a import ManualQueryAgent
+from retrievers.retriever_baseline import get_retrieval_engine
+
+@st.cache_resource
+def warm_retrieval_engine():
+    """Build and warm the shared retrieval engine once per server process."""
+    return get_retrieval_engine(warm_up=True)
 
 # Create async function to run the agent
 async def run_agent_query(query: str):
@@ -31,6 +37,8 @@ def main():
         layout="wide"
     )
 
+    warm_retrieval_engine()
+
     st.title("🤖 AI Document Assistant")
     st.markdown("---")
 
@@ -10,6 +10,13 @@ project_root = str(Path(__file__).parent.parent)
 sys.path.append(project_root)
 
 from agents.agent_q_a_streaming import ManualQueryStreamingAgent, InitialProcessingEvent, RetrievalEvent, ProcessingEvent, ProgressEvent, StopEvent
+from retrievers.retriever_baseline import get_retrieval_engine
+from agents.tag_stream import StreamingTagParser, PARTIAL, TEXT
+
+@st.cache_resource
+def warm_retrieval_engine():
+    """Build and warm the shared retrieval engine once per server process."""
+    return get_retrieval_engine(warm_up=True)
 
 async def run_agent_with_stream(agent, query: str):
     """Run the agent and yield streaming events."""
@@ -48,6 +55,8 @@ def main():
         layout="wide"
     )
 
+    warm_retrieval_engine()
+
     st.title("🤖 System Component Documentation Assistant")
     st.markdown("---")
 
@@ -92,7 +101,6 @@ def main():
             
             full_response = ""
             status_placeholder = st.empty()  # Single status placeholder
-            in_technical_section = False
             
             # Create empty elements for each section
             with technical_container:
@@ -102,14 +110,24 @@ def main():
             with response_container:
                 st.markdown("#### Detailed Response")
                 resp_placeholder = st.empty()
-            
-            current_tech_content = ""
-            current_resp_content = ""
 
             try:
                 async def process_stream():
-                    nonlocal full_response, in_technical_section
-                    nonlocal current_tech_content, current_resp_content
+                    nonlocal full_response
+                    current_tech_content = ""
+                    current_resp_content = ""
+
+                    # the technical breakdown is split out as the tokens arrive, whatever the chunk boundaries
+                    parser = StreamingTagParser(["technical_breakdown"])
+
+                    def show(tag_event):
+                        nonlocal current_tech_content, current_resp_content
+                        if tag_event.kind == PARTIAL:
+                            current_tech_content += tag_event.content
+                            tech_placeholder.code(current_tech_content.strip(), language=None)
+                        elif tag_event.kind == TEXT:
+                            current_resp_content += tag_event.content
+                            resp_placeholder.markdown(current_resp_content.strip())
                     
                     # Set initial status
                     status_placeholder.info("Starting query processing...")
@@ -123,35 +141,15 @@ def main():
                             chunk = event.content
                             full_response += chunk
 
-                            # Handle section transitions and content
-                            if "<technical_breakdown>" in chunk:
-                                in_technical_section = True
-                                chunk = chunk.replace("<technical_breakdown>", "").strip()
-                            
-                            if "</technical_breakdown>" in chunk:
-                                parts = chunk.split("</technical_breakdown>")
-                                
-                                if parts[0].strip():
-                                    current_tech_content += parts[0].strip()
-                                    tech_placeholder.code(current_tech_content, language=None)
-                                
-                                in_technical_section = False
-                                
-                                if len(parts) > 1 and parts[1].strip():
-                                    current_resp_content += parts[1].strip()
-                                    resp_placeholder.markdown(current_resp_content)
-                            else:
-                                if chunk.strip():
-                                    if in_technical_section:
-                                        current_tech_content += chunk
-                                        tech_placeholder.code(current_tech_content, language=None)
-                                    else:
-                                        current_resp_content += chunk
-                                        resp_placeholder.markdown(current_resp_content)
+                            for tag_event in parser.feed(chunk):
+                                show(tag_event)
 
                         elif isinstance(event, StopEvent):
                             status_placeholder.empty()
 
+                    for tag_event in parser.close():
+                        show(tag_event)
+
                     return full_response
 
                 # Run the streaming process